@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""
+A local stand-in for the Outbrain Amplify API, serving synthetic (or
+recorded) campaigns, promoted links and periodic reports, including the
+publisher, section, geo and platform breakdowns, at a configurable
+scale and latency. Reporting endpoints are rate limited like the real API,
+answering 429 once the quota is used up, and can be made to answer 429 at
+random on top of that.
+
+    python benchmarks/fake_api.py --campaigns 1000 --port 8080
+
+Point the tap at it with `"base_url": "http://127.0.0.1:8080"`.
+"""
+
+import argparse
+import collections
+import datetime
+import hashlib
+import http.server
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+import urllib.parse
+
+REPORTING = 'reporting'
+ENTITY = 'entity'
+LOGIN = 'login'
+
+DEFAULT_LINKS_PER_CAMPAIGN = 3
+DEFAULT_LATENCY = 0.0
+DEFAULT_RATE_LIMIT = '2/60'
+
+ROUTES = [
+    (re.compile(r'^/login$'), LOGIN, 'login'),
+    (re.compile(r'^/marketers/([^/]+)/campaigns$'), ENTITY, 'campaigns'),
+    (re.compile(r'^/campaigns/([^/]+)/promotedLinks$'), ENTITY,
+     'promoted_links'),
+    (re.compile(r'^/reports/marketers/([^/]+)/periodic$'), REPORTING,
+     'periodic'),
+    (re.compile(r'^/reports/marketers/([^/]+)/campaigns/periodic$'),
+     REPORTING, 'campaigns_periodic'),
+    (re.compile(r'^/reports/marketers/([^/]+)/promotedLinks/periodic$'),
+     REPORTING, 'promoted_links_periodic'),
+    (re.compile(r'^/reports/marketers/([^/]+)/publishers/periodic$'),
+     REPORTING, 'publishers_periodic'),
+    (re.compile(r'^/reports/marketers/([^/]+)/sections/periodic$'),
+     REPORTING, 'sections_periodic'),
+    (re.compile(r'^/reports/marketers/([^/]+)/geo/periodic$'), REPORTING,
+     'geo_periodic'),
+    (re.compile(r'^/reports/marketers/([^/]+)/platforms/periodic$'),
+     REPORTING, 'platforms_periodic'),
+]
+
+DEFAULT_PUBLISHERS = 20
+DEFAULT_SECTIONS_PER_PUBLISHER = 5
+COUNTRIES = [('US', 'United States'), ('GB', 'United Kingdom'),
+             ('DE', 'Germany'), ('FR', 'France'), ('JP', 'Japan'),
+             ('AU', 'Australia'), ('CA', 'Canada'), ('IL', 'Israel')]
+PLATFORMS = ['Desktop', 'Mobile', 'Tablet']
+
+
+def parse_rate_limit(value):
+    """
+    Parse a `CALLS/SECONDS` rate limit, i.e. `2/60`.
+    """
+    calls, period = value.split('/')
+    return int(calls), float(period)
+
+
+def _seed(*parts):
+    digest = hashlib.md5(':'.join(str(part) for part in parts)
+                         .encode('utf-8')).hexdigest()
+    return int(digest[:8], 16)
+
+
+def _id(prefix, index):
+    return '{}{:030x}'.format(prefix, index)
+
+
+def _parse_date(value):
+    return datetime.datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+
+class FakeData(object):
+    """
+    The entities served by the fake API. Campaigns and links are generated
+    from their index, so any page can be served without holding every
+    entity in memory; a fixture file of recorded `campaigns` and
+    `promotedLinks` (by campaign ID) can be served instead.
+    """
+
+    def __init__(self, campaigns,
+                 links_per_campaign=DEFAULT_LINKS_PER_CAMPAIGN, fixture=None):
+        self.fixture = fixture
+        self.links_per_campaign = links_per_campaign
+
+        if fixture is not None:
+            self.campaign_count = len(fixture.get('campaigns', []))
+            self.campaign_ids = [campaign['id']
+                                 for campaign in fixture['campaigns']]
+        else:
+            self.campaign_count = campaigns
+            self.campaign_ids = [_id('c0', i) for i in range(campaigns)]
+
+        self.campaign_indexes = {campaign_id: i for i, campaign_id
+                                 in enumerate(self.campaign_ids)}
+
+    def campaign(self, index):
+        if self.fixture is not None:
+            return self.fixture['campaigns'][index]
+
+        return {
+            'id': self.campaign_ids[index],
+            'name': 'Campaign {}'.format(index),
+            'campaignOnAir': index % 5 != 0,
+            'onAirReason': 'RUNNING',
+            'enabled': index % 5 != 0,
+            'budget': {
+                'id': _id('b0', index),
+                'name': 'Budget {}'.format(index),
+                'shared': False,
+                'amount': 2000.0,
+                'currency': 'USD',
+                'amountRemaining': 150.0,
+                'amountSpent': 1850.0,
+                'creationTime': '2016-01-14 07:19:16',
+                'lastModified': '2017-01-15 12:24:01',
+                'startDate': '2016-01-15',
+                'runForever': True,
+                'type': 'MONTHLY',
+                'pacing': 'AUTOMATIC',
+            },
+            'cpc': 0.25,
+        }
+
+    def links(self, campaign_id):
+        if self.fixture is not None:
+            return self.fixture.get('promotedLinks', {}).get(campaign_id, [])
+
+        index = self.campaign_indexes.get(campaign_id)
+        if index is None:
+            return []
+
+        return [self.link(index, i) for i in range(self.links_per_campaign)]
+
+    def link(self, campaign_index, link_index):
+        index = campaign_index * self.links_per_campaign + link_index
+
+        return {
+            'id': _id('l0', index),
+            'campaignId': self.campaign_ids[campaign_index],
+            'text': 'Promoted link {}'.format(index),
+            'lastModified': '2017-03-16T10:32:31Z',
+            'creationTime': '2017-01-14T07:19:16Z',
+            'url': 'http://example.com/{}'.format(index),
+            'siteName': 'example.com',
+            'sectionName': 'News',
+            'status': 'APPROVED',
+            'cachedImageUrl': 'http://images.example.com/{}.jpg'
+                              .format(index),
+            'enabled': link_index % 4 != 3,
+            'archived': False,
+            'documentLanguage': 'EN',
+            'cpc': 0.25,
+        }
+
+    def link_ids(self, campaign_id=None):
+        campaign_ids = self.campaign_ids if campaign_id is None \
+            else [campaign_id]
+
+        return [(link['campaignId'], link['id'])
+                for campaign_id in campaign_ids
+                for link in self.links(campaign_id)]
+
+    def publishers(self):
+        return [{'publisherId': _id('p0', i),
+                 'publisherName': 'Publisher {}'.format(i)}
+                for i in range(DEFAULT_PUBLISHERS)]
+
+    def sections(self):
+        return [dict(publisher,
+                     sectionId=_id('s0', p * DEFAULT_SECTIONS_PER_PUBLISHER
+                                   + i),
+                     sectionName='Section {}'.format(i))
+                for p, publisher in enumerate(self.publishers())
+                for i in range(DEFAULT_SECTIONS_PER_PUBLISHER)]
+
+    def countries(self):
+        return [{'countryCode': code, 'countryName': name}
+                for code, name in COUNTRIES]
+
+    def platforms(self):
+        return [{'platform': platform} for platform in PLATFORMS]
+
+    def report_rows(self, entity_id, from_date, to_date):
+        rows = []
+        day = from_date
+
+        while day <= to_date:
+            rng = random.Random(_seed(entity_id, day))
+            impressions = rng.randint(0, 20000)
+            clicks = rng.randint(0, max(1, impressions // 100))
+            conversions = rng.randint(0, max(1, clicks // 10))
+            spend = round(clicks * rng.uniform(0.1, 0.5), 2)
+
+            rows.append({
+                'metadata': {
+                    'id': day.isoformat(),
+                    'fromDate': day.isoformat(),
+                    'toDate': day.isoformat(),
+                },
+                'metrics': {
+                    'impressions': float(impressions),
+                    'clicks': float(clicks),
+                    'conversions': float(conversions),
+                    'spend': spend,
+                    'ctr': clicks * 100.0 / impressions if impressions
+                    else 0.0,
+                    'ecpc': spend / clicks if clicks else 0.0,
+                    'conversionRate': conversions * 100.0 / clicks if clicks
+                    else 0.0,
+                    'cpa': spend / conversions if conversions else 0.0,
+                },
+            })
+
+            day = day + datetime.timedelta(days=1)
+
+        return rows
+
+
+class RateLimiter(object):
+    """
+    Sliding window of `calls` requests per `period` seconds.
+    """
+
+    def __init__(self, calls, period):
+        self.calls = calls
+        self.period = period
+        self.lock = threading.Lock()
+        self.history = collections.deque()
+
+    def try_acquire(self):
+        """
+        Return `(allowed, calls_left, seconds_until_reset)`.
+        """
+        with self.lock:
+            now = time.monotonic()
+
+            while self.history and now - self.history[0] >= self.period:
+                self.history.popleft()
+
+            if len(self.history) >= self.calls:
+                return (False, 0,
+                        self.period - (now - self.history[0]))
+
+            self.history.append(now)
+            reset = self.period - (now - self.history[0])
+
+            return True, self.calls - len(self.history), reset
+
+
+class FakeOutbrainServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, data, latency=DEFAULT_LATENCY,
+                 rate_limit=DEFAULT_RATE_LIMIT, error_rate=0.0, seed=0):
+        http.server.HTTPServer.__init__(self, address, FakeOutbrainHandler)
+        self.data = data
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.limiter = None
+
+        if rate_limit is not None:
+            self.limiter = RateLimiter(*parse_rate_limit(rate_limit))
+
+        self.stats_lock = threading.Lock()
+        self.stats = collections.Counter()
+
+    @property
+    def base_url(self):
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def count(self, name, value=1):
+        with self.stats_lock:
+            self.stats[name] += value
+
+    def inject_error(self):
+        with self.stats_lock:
+            return self.rng.random() < self.error_rate
+
+
+class FakeOutbrainHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+        self.server.count('bytes_sent', len(payload))
+        self.server.count('status_{}'.format(status))
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        params = {name: values[-1] for name, values
+                  in urllib.parse.parse_qs(url.query).items()}
+
+        for pattern, endpoint_class, name in ROUTES:
+            match = pattern.match(url.path)
+            if match is not None:
+                break
+        else:
+            self.send_json(404, {'message': 'Not found'})
+            return
+
+        self.server.count('{}_requests'.format(endpoint_class))
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        headers = {}
+
+        if endpoint_class == REPORTING:
+            if self.server.limiter is not None:
+                allowed, calls_left, reset = \
+                    self.server.limiter.try_acquire()
+                headers = {
+                    'rate-limit-calls-left': str(calls_left),
+                    'rate-limit-msec-left': str(int(reset * 1000)),
+                }
+
+                if not allowed:
+                    headers['Retry-After'] = str(int(reset) + 1)
+                    self.send_json(429, {'message': 'Rate limit exceeded'},
+                                   headers)
+                    return
+
+            if self.server.error_rate and self.server.inject_error():
+                self.send_json(429, {'message': 'Rate limit exceeded'},
+                               {'Retry-After': '1'})
+                return
+
+        self.send_json(200,
+                       getattr(self, 'get_' + name)(params, *match.groups()),
+                       headers)
+
+    def get_login(self, params):
+        return {'OB-TOKEN-V1': 'fake-token'}
+
+    def get_campaigns(self, params, marketer_id):
+        data = self.server.data
+        offset, limit = _page(params)
+
+        return {
+            'totalCount': data.campaign_count,
+            'campaigns': [data.campaign(i) for i in range(
+                offset, min(offset + limit, data.campaign_count))],
+        }
+
+    def get_promoted_links(self, params, campaign_id):
+        links = self.server.data.links(campaign_id)
+        offset, limit = _page(params)
+
+        return {
+            'totalCount': len(links),
+            'promotedLinks': links[offset:offset + limit],
+        }
+
+    def get_periodic(self, params, marketer_id):
+        entity_id = params.get('promotedLinkId') or params.get('campaignId')
+        rows = self.server.data.report_rows(entity_id,
+                                            _parse_date(params['from']),
+                                            _parse_date(params['to']))
+        offset, limit = _page(params)
+
+        return {
+            'totalResults': len(rows),
+            'results': rows[offset:offset + limit],
+        }
+
+    def get_campaigns_periodic(self, params, marketer_id):
+        data = self.server.data
+        campaign_ids = data.campaign_ids
+        offset, limit = _page(params)
+
+        return {
+            'totalCampaigns': len(campaign_ids),
+            'campaignResults': [
+                {'campaignId': campaign_id,
+                 'results': data.report_rows(campaign_id,
+                                             _parse_date(params['from']),
+                                             _parse_date(params['to']))}
+                for campaign_id in campaign_ids[offset:offset + limit]],
+        }
+
+    def get_promoted_links_periodic(self, params, marketer_id):
+        data = self.server.data
+        link_ids = data.link_ids(params.get('campaignId'))
+        offset, limit = _page(params)
+
+        return {
+            'totalPromotedLinks': len(link_ids),
+            'promotedLinkResults': [
+                {'promotedLinkId': link_id,
+                 'campaignId': campaign_id,
+                 'results': data.report_rows(link_id,
+                                             _parse_date(params['from']),
+                                             _parse_date(params['to']))}
+                for campaign_id, link_id in link_ids[offset:offset + limit]],
+        }
+
+    def get_dimension_periodic(self, params, dimensions, id_key,
+                               results_key, total_key):
+        data = self.server.data
+        offset, limit = _page(params)
+
+        return {
+            total_key: len(dimensions),
+            results_key: [
+                dict(dimension,
+                     results=data.report_rows(dimension[id_key],
+                                              _parse_date(params['from']),
+                                              _parse_date(params['to'])))
+                for dimension in dimensions[offset:offset + limit]],
+        }
+
+    def get_publishers_periodic(self, params, marketer_id):
+        return self.get_dimension_periodic(
+            params, self.server.data.publishers(), 'publisherId',
+            'publisherResults', 'totalPublishers')
+
+    def get_sections_periodic(self, params, marketer_id):
+        return self.get_dimension_periodic(
+            params, self.server.data.sections(), 'sectionId',
+            'sectionResults', 'totalSections')
+
+    def get_geo_periodic(self, params, marketer_id):
+        return self.get_dimension_periodic(
+            params, self.server.data.countries(), 'countryCode',
+            'geoResults', 'totalGeos')
+
+    def get_platforms_periodic(self, params, marketer_id):
+        return self.get_dimension_periodic(
+            params, self.server.data.platforms(), 'platform',
+            'platformResults', 'totalPlatforms')
+
+
+def _page(params):
+    return int(params.get('offset', 0)), int(params.get('limit', 100))
+
+
+def serve(campaigns=10, links_per_campaign=DEFAULT_LINKS_PER_CAMPAIGN,
+          fixture=None, latency=DEFAULT_LATENCY,
+          rate_limit=DEFAULT_RATE_LIMIT, error_rate=0.0, host='127.0.0.1',
+          port=0, seed=0):
+    """
+    Start a `FakeOutbrainServer` in a background thread and return it. Call
+    `shutdown()` on it when done.
+    """
+    server = FakeOutbrainServer(
+        (host, port),
+        FakeData(campaigns, links_per_campaign, fixture),
+        latency=latency,
+        rate_limit=rate_limit,
+        error_rate=error_rate,
+        seed=seed)
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server
+
+
+def add_server_arguments(parser):
+    parser.add_argument('--campaigns', type=int, default=10)
+    parser.add_argument('--links-per-campaign', type=int,
+                        default=DEFAULT_LINKS_PER_CAMPAIGN)
+    parser.add_argument('--fixture',
+                        help='JSON file of recorded `campaigns` and '
+                             '`promotedLinks` by campaign ID to serve '
+                             'instead of synthetic ones')
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY,
+                        help='seconds added to every response')
+    parser.add_argument('--rate-limit', default=DEFAULT_RATE_LIMIT,
+                        help='reporting quota as CALLS/SECONDS')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='share of reporting requests answered with a '
+                             '429 regardless of the quota')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def load_fixture(path):
+    if path is None:
+        return None
+
+    with open(path) as fixture_file:
+        return json.load(fixture_file)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_server_arguments(parser)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    server = serve(campaigns=args.campaigns,
+                   links_per_campaign=args.links_per_campaign,
+                   fixture=load_fixture(args.fixture),
+                   latency=args.latency,
+                   rate_limit=args.rate_limit,
+                   error_rate=args.error_rate,
+                   host=args.host,
+                   port=args.port,
+                   seed=args.seed)
+
+    print('Serving a fake Outbrain API at {}'.format(server.base_url))
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Count the reporting requests planned for typical state maps, comparing the
+original fixed 100-day chunking with the window planner, per campaign and
+batched across campaigns.
+
+    python benchmarks/plan_requests.py --campaigns 400
+"""
+
+import argparse
+import datetime
+import random
+
+import tap_outbrain
+import tap_outbrain.windows as windows
+
+DEFAULT_START_DATE = '2016-08-01'
+
+
+def legacy_request_count(bookmarks, entity_ids, end_date):
+    # fixed 100-day chunks from 2 days before the bookmark, as the tap
+    # used to do it
+    count = 0
+
+    for entity_id in entity_ids:
+        start = windows.get_start_date(bookmarks.get(entity_id),
+                                       DEFAULT_START_DATE, 2)
+
+        while start < end_date:
+            count = count + 1
+            start = start + datetime.timedelta(days=100)
+
+    return count
+
+
+def make_scenarios(campaign_count, end_date, seed):
+    rng = random.Random(seed)
+    entity_ids = ['campaign-{}'.format(i) for i in range(campaign_count)]
+
+    def days_ago(days):
+        return (end_date - datetime.timedelta(days=days)).isoformat()
+
+    return entity_ids, [
+        ('fresh backfill', {}),
+        ('daily incremental',
+         {entity_id: days_ago(1) for entity_id in entity_ids}),
+        ('weekly incremental',
+         {entity_id: days_ago(7) for entity_id in entity_ids}),
+        ('mixed', {entity_id: days_ago(rng.choice([1, 3, 30, 150, 400]))
+                   for entity_id in entity_ids
+                   if rng.random() > 0.1}),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--campaigns', type=int, default=400)
+    parser.add_argument('--end-date', default=datetime.date.today()
+                        .isoformat())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--page-limit', type=int,
+                        default=tap_outbrain.PERIODIC_PAGE_LIMIT)
+    args = parser.parse_args()
+
+    end_date = datetime.datetime.strptime(args.end_date, '%Y-%m-%d').date()
+    entity_ids, scenarios = make_scenarios(args.campaigns, end_date,
+                                           args.seed)
+
+    print('{:<20} {:>10} {:>12} {:>10}'.format(
+        'scenario', 'legacy', 'per-entity', 'batched'))
+
+    for name, bookmarks in scenarios:
+        print('{:<20} {:>10} {:>12} {:>10}'.format(
+            name,
+            legacy_request_count(bookmarks, entity_ids, end_date),
+            windows.count_planned_requests(
+                bookmarks, entity_ids, DEFAULT_START_DATE, end_date,
+                page_limit=args.page_limit),
+            windows.count_planned_requests(
+                bookmarks, entity_ids, DEFAULT_START_DATE, end_date,
+                page_limit=args.page_limit,
+                entities_per_page=tap_outbrain.CAMPAIGNS_PAGE_LIMIT)))
+
+
+if __name__ == '__main__':
+    main()
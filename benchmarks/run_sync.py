@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Run the tap end to end against the local fake Outbrain API and report
+wall-clock, throughput, request counts and peak memory per scenario.
+
+    python benchmarks/run_sync.py --scenario small --scenario medium
+    python benchmarks/run_sync.py --campaigns 200 --latency 0.05 \\
+        --tap-config '{"batch_reporting": true}'
+
+The fake API enforces `--rate-limit` on reporting requests, and the tap is
+configured with the same quota. It defaults to a time-compressed 120 calls
+per second so that large scenarios finish; use `--rate-limit 2/60` to run
+at the real API's pace.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import fake_api
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'small': 10,
+    'medium': 1000,
+    'large': 50000,
+}
+
+DEFAULT_RATE_LIMIT = '120/1'
+
+# runs the tap, reporting its peak resident memory on exit
+BOOTSTRAP = '''
+import atexit, resource, sys
+import tap_outbrain
+
+atexit.register(lambda: sys.stderr.write('PEAK_RSS_KB {}\\n'.format(
+    resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)))
+
+sys.argv[0] = 'tap-outbrain'
+tap_outbrain.main()
+'''
+
+
+def run_scenario(name, campaigns, args, directory):
+    server = fake_api.serve(campaigns=campaigns,
+                            links_per_campaign=args.links_per_campaign,
+                            fixture=fake_api.load_fixture(args.fixture),
+                            latency=args.latency,
+                            rate_limit=args.rate_limit,
+                            error_rate=args.error_rate,
+                            seed=args.seed)
+
+    calls, period = fake_api.parse_rate_limit(args.rate_limit)
+    start_date = datetime.date.today() - datetime.timedelta(days=args.days)
+
+    config = {
+        'account_id': 'fake-marketer',
+        'username': 'username',
+        'password': 'password',
+        'start_date': start_date.isoformat(),
+        'base_url': server.base_url,
+        'rate_limits': {'reporting': {'calls': calls, 'period': period}},
+        'metrics_summary_path': os.path.join(directory,
+                                             '{}-metrics.json'.format(name)),
+    }
+    config.update(json.loads(args.tap_config))
+
+    config_path = os.path.join(directory, '{}-config.json'.format(name))
+    with open(config_path, 'w') as config_file:
+        json.dump(config, config_file)
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [path for path in [env.get('PYTHONPATH')] if path])
+
+    records = {}
+    log_path = os.path.join(directory, '{}.log'.format(name))
+
+    start = time.time()
+
+    with open(log_path, 'w') as log_file:
+        process = subprocess.Popen(
+            [sys.executable, '-c', BOOTSTRAP, '-c', config_path],
+            stdout=subprocess.PIPE,
+            stderr=log_file,
+            env=env)
+
+        for line in process.stdout:
+            message = json.loads(line.decode('utf-8'))
+            if message['type'] == 'RECORD':
+                records[message['stream']] = \
+                    records.get(message['stream'], 0) + 1
+
+        process.wait()
+
+    elapsed = time.time() - start
+    server.shutdown()
+    server.server_close()
+
+    peak_rss_kb = None
+    with open(log_path) as log_file:
+        for line in log_file:
+            if line.startswith('PEAK_RSS_KB '):
+                peak_rss_kb = int(line.split()[1])
+
+    total_records = sum(records.values())
+
+    return {
+        'scenario': name,
+        'campaigns': campaigns,
+        'exit_code': process.returncode,
+        'wall_clock_seconds': elapsed,
+        'records': records,
+        'records_per_second': total_records / elapsed if elapsed else None,
+        'requests': {endpoint_class: server.stats['{}_requests'
+                                                  .format(endpoint_class)]
+                     for endpoint_class in (fake_api.REPORTING,
+                                            fake_api.ENTITY,
+                                            fake_api.LOGIN)},
+        'rate_limited': server.stats['status_429'],
+        'bytes_sent': server.stats['bytes_sent'],
+        'peak_rss_mb': peak_rss_kb / 1024.0 if peak_rss_kb else None,
+        'log': log_path,
+    }
+
+
+def print_results(results):
+    print('{:<10} {:>9} {:>9} {:>9} {:>8} {:>6} {:>9} {:>9} {:>8}'.format(
+        'scenario', 'campaigns', 'records', 'reporting', 'entity', '429s',
+        'seconds', 'records/s', 'peak MB'))
+
+    for result in results:
+        print('{:<10} {:>9} {:>9} {:>9} {:>8} {:>6} {:>9.1f} {:>9.0f} '
+              '{:>8.1f}{}'.format(
+                  result['scenario'],
+                  result['campaigns'],
+                  sum(result['records'].values()),
+                  result['requests'][fake_api.REPORTING],
+                  result['requests'][fake_api.ENTITY],
+                  result['rate_limited'],
+                  result['wall_clock_seconds'],
+                  result['records_per_second'] or 0,
+                  result['peak_rss_mb'] or 0,
+                  '' if result['exit_code'] == 0 else
+                  '  (failed, see {})'.format(result['log'])))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    fake_api.add_server_arguments(parser)
+    parser.set_defaults(rate_limit=DEFAULT_RATE_LIMIT, campaigns=None)
+    parser.add_argument('--scenario', action='append',
+                        choices=sorted(SCENARIOS),
+                        help='may be given more than once; defaults to '
+                             'small unless --campaigns is given')
+    parser.add_argument('--days', type=int, default=30,
+                        help='days of history to sync')
+    parser.add_argument('--tap-config', default='{}',
+                        help='JSON object merged into the tap config')
+    parser.add_argument('--output-dir',
+                        help='where configs, logs and metrics summaries '
+                             'are kept; a temporary directory by default')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    args = parser.parse_args()
+
+    scenarios = [(name, SCENARIOS[name]) for name in args.scenario or []]
+    if args.campaigns is not None:
+        scenarios.append(('custom', args.campaigns))
+    if not scenarios:
+        scenarios = [('small', SCENARIOS['small'])]
+
+    directory = args.output_dir or tempfile.mkdtemp(prefix='tap-outbrain-')
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    results = [run_scenario(name, campaigns, args, directory)
+               for name, campaigns in scenarios]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == '__main__':
+    main()
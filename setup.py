@@ -12,10 +12,13 @@ setup(name='tap-outbrain',
       py_modules=['tap_outbrain'],
       install_requires=[
           'singer-python==0.2.1',
-          'backoff==1.3.2',
           'requests==2.12.4',
           'python-dateutil==2.6.0'
       ],
+      extras_require={
+          'streaming': ['ijson>=3.1'],
+          'fast-json': ['orjson'],
+      },
       entry_points='''
           [console_scripts]
           tap-outbrain=tap_outbrain:main
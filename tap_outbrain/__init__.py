@@ -3,145 +3,337 @@
 from decimal import Decimal
 
 import argparse
-import base64
+import collections
+import concurrent.futures
 import copy
 import datetime
-import dateutil.parser
+import functools
 import json
+import math
 import os
 import sys
 import time
 
-import backoff
-import requests
 import singer
 
-import tap_outbrain.schemas as schemas
+import tap_outbrain.catalog as catalog
+import tap_outbrain.changes as changes
+from tap_outbrain.client import OutbrainClient
+from tap_outbrain.fetcher import AsyncFetcher
+from tap_outbrain.metrics import METRICS
+import tap_outbrain.planner as planner
+import tap_outbrain.rate_limit as rate_limit
+import tap_outbrain.scheduler as scheduler
+from tap_outbrain.state import BOOKMARK_TABLES, clear_checkpoint, \
+    get_bookmarks, get_checkpoint, get_entity_hashes, is_resumed, \
+    load_state
+from tap_outbrain.streaming import ResponseItems
+from tap_outbrain.transform import TRANSFORMERS, build_transformers
+import tap_outbrain.windows as windows
+import tap_outbrain.writer as writer
 
 logger = singer.get_logger()
 
-BASE_URL = 'https://api.outbrain.com/amplify/v0.1'
+DEFAULT_START_DATE = '2016-08-01'
 
-DEFAULT_STATE = {
-    'campaign_performance': {},
-    'link_performance': {}
+LOOKBACK_DAYS = windows.DEFAULT_LOOKBACK_DAYS
+
+# streams to sync, mapped to their selected fields (None for all of them)
+SELECTION = catalog.get_selection()
+
+# limits on how long a run may take and how many reporting requests it
+# may make; unlimited unless configured.
+RUN_BUDGET = scheduler.RunBudget()
+
+PERIODIC_PAGE_LIMIT = 100
+CAMPAIGNS_PAGE_LIMIT = 50
+CAMPAIGN_LIST_PAGE_LIMIT = 50
+LINKS_PAGE_LIMIT = 100
+DIMENSION_PAGE_LIMIT = 100
+
+LINKS_CAMPAIGN_BATCH_SIZE = 50
+
+# reports broken down by entity, used to fetch performance for many
+# campaigns or links in one paginated request.
+BREAKDOWN_REPORTS = {
+    'campaigns': {
+        'name': 'campaigns',
+        'path': 'campaigns/periodic',
+        'results_key': 'campaignResults',
+        'total_key': 'totalCampaigns',
+        'id_key': 'campaignId',
+        'limit': CAMPAIGNS_PAGE_LIMIT,
+    },
+    'promoted_links': {
+        'name': 'promoted links',
+        'path': 'promotedLinks/periodic',
+        'results_key': 'promotedLinkResults',
+        'total_key': 'totalPromotedLinks',
+        'id_key': 'promotedLinkId',
+        'limit': LINKS_PAGE_LIMIT,
+    },
 }
 
-DEFAULT_START_DATE = '2016-08-01'
+# streams synced by listing the account's campaigns
+CAMPAIGN_STREAMS = ('campaigns', 'campaign_performance', 'links',
+                    'link_performance')
+
+# marketer-level reports broken down by another dimension, each synced into
+# its own stream. They cover every campaign, in one paginated request per
+# date window, so each has a single bookmark per account.
+DIMENSION_REPORTS = collections.OrderedDict([
+    ('publisher_performance', {
+        'name': 'publishers',
+        'path': 'publishers/periodic',
+        'results_key': 'publisherResults',
+        'total_key': 'totalPublishers',
+        'dimensions': ('publisherId', 'publisherName'),
+        'limit': DIMENSION_PAGE_LIMIT,
+    }),
+    ('section_performance', {
+        'name': 'sections',
+        'path': 'sections/periodic',
+        'results_key': 'sectionResults',
+        'total_key': 'totalSections',
+        'dimensions': ('sectionId', 'sectionName', 'publisherId',
+                       'publisherName'),
+        'limit': DIMENSION_PAGE_LIMIT,
+    }),
+    ('geo_performance', {
+        'name': 'countries',
+        'path': 'geo/periodic',
+        'results_key': 'geoResults',
+        'total_key': 'totalGeos',
+        'dimensions': ('countryCode', 'countryName'),
+        'limit': DIMENSION_PAGE_LIMIT,
+    }),
+    ('platform_performance', {
+        'name': 'platforms',
+        'path': 'platforms/periodic',
+        'results_key': 'platformResults',
+        'total_key': 'totalPlatforms',
+        'dimensions': ('platform',),
+        'limit': DIMENSION_PAGE_LIMIT,
+    }),
+])
+
+LINK_PERFORMANCE_MARKETER = 'marketer'
+LINK_PERFORMANCE_CAMPAIGN = 'campaign'
+LINK_PERFORMANCE_LINK = 'link'
+
+DEFAULT_MAX_PARALLEL_ACCOUNTS = 4
+
+# links that have not been modified for this long, and whose performance
+# has been synced past their last modification, are not re-pulled.
+DEFAULT_LINK_INACTIVE_DAYS = 30
+# with incremental entities, the same goes for campaigns that have not
+# changed for this long.
+DEFAULT_CAMPAIGN_INACTIVE_DAYS = 30
+
+# checkpoint ID of performance pulled for every entity of an account at
+# once, i.e. in batch or with the marketer-level link breakdown.
+ALL_ENTITIES = '*'
+
+
+def parse_date(value):
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def plan_resumable_windows(checkpoint, checkpoint_id, from_date, to_date):
+    """
+    Plan the windows from `from_date` to `to_date`, and return them along
+    with the offset to start the first one at. If `checkpoint_id` was in
+    the middle of a window when the last run died, that window is resumed
+    from the first page not yet emitted instead, and if it was between
+    windows, from the first window not yet synced.
+    """
+    current = checkpoint.get('current')
 
+    if current is None or current.get('id') != checkpoint_id:
+        pending = checkpoint.get('pending', {}).get(checkpoint_id)
 
-def giveup(error):
-    logger.error(error.response.text)
-    response = error.response
-    return not (response.status_code == 429 or
-                response.status_code >= 500)
+        if pending is not None:
+            from_date = parse_date(pending)
 
+        return windows.plan_windows(from_date, to_date,
+                                    page_limit=PERIODIC_PAGE_LIMIT), 0
 
-@backoff.on_exception(backoff.constant,
-                      (requests.exceptions.RequestException),
-                      jitter=backoff.random_jitter,
-                      max_tries=5,
-                      giveup=giveup,
-                      interval=30)
-def request(url, access_token, params={}):
-    logger.info("Making request: GET {} {}".format(url, params))
+    window_start = parse_date(current['from'])
+    window_end = parse_date(current['to'])
 
-    try:
-        response = requests.get(
-            url,
-            headers={'OB-TOKEN-V1': access_token},
-            params=params)
-    except e:
-        logger.exception(e)
+    logger.info('Resuming {} from {} to {} at offset {}.'
+                .format(checkpoint_id, window_start, window_end,
+                        current['offset']))
 
-    logger.info("Got response code: {}".format(response.status_code))
+    return [(window_start, window_end)] + windows.plan_windows(
+        window_end + datetime.timedelta(days=1), to_date,
+        page_limit=PERIODIC_PAGE_LIMIT), current['offset']
 
-    response.raise_for_status()
-    return response
 
+def checkpoint_page(checkpoint, checkpoint_id, from_date, window_end,
+                    offset):
+    checkpoint['current'] = {
+        'id': checkpoint_id,
+        'from': from_date.isoformat(),
+        'to': window_end.isoformat(),
+        'offset': offset,
+    }
 
-def generate_token(username, password):
-    logger.info("Generating new token using basic auth.")
 
-    encoded = base64.b64encode(bytes('{}:{}'.format(username, password),
-                                     'utf-8')) \
-                    .decode('utf-8')
+def checkpoint_window(checkpoint, checkpoint_id, planned):
+    """
+    Record that a window of `checkpoint_id` was fully synced: the next
+    planned window is where it resumes, or if there is none it is done,
+    which its bookmarks tell from then on.
+    """
+    pending = checkpoint.setdefault('pending', {})
 
-    response = requests.get(
-        '{}/login'.format(BASE_URL),
-        headers={'Authorization': 'Basic {}'.format(encoded)})
-    response.raise_for_status()
+    if planned:
+        checkpoint_page(checkpoint, checkpoint_id, planned[0][0],
+                        planned[0][1], 0)
+        pending[checkpoint_id] = planned[0][0].isoformat()
+        return
 
-    logger.info("Got response code: {}".format(response.status_code))
+    pending.pop(checkpoint_id, None)
+    checkpoint.pop('current', None)
 
-    return response.json().get('OB-TOKEN-V1')
 
+def has_from_date(table_name, record):
+    # rows are keyed and bookmarked by their date, so one without is of no
+    # use, and would move the bookmark to nowhere.
+    if record.get('fromDate') is not None:
+        return True
 
-def parse_datetime(datetime):
-    dt = dateutil.parser.parse(datetime)
+    logger.warning('Skipping {} row without a fromDate: {}'
+                   .format(table_name, record))
+    return False
 
-    # TODO the assumption is that the timestamp comes in in UTC, but that
-    #      may not be true. verify w/ outbrain.
-    return dt.isoformat('T') + 'Z'
 
+def advance_bookmark(bookmarks, entity_id, value):
+    """
+    Move the bookmark of `entity_id` forward to the `YYYY-MM-DD` `value`.
+    Rows of lookback windows, or out of order, never move it back.
+    """
+    if value > bookmarks.get(entity_id, ''):
+        bookmarks[entity_id] = value
 
-def parse_performance(result, extra_fields):
-    metrics = result.get('metrics', {})
-    metadata = result.get('metadata', {})
 
-    to_return = {
-        'fromDate': metadata.get('fromDate'),
-        'impressions': int(metrics.get('impressions', 0)),
-        'clicks': int(metrics.get('clicks', 0)),
-        'ctr': float(metrics.get('ctr', 0.0)),
-        'spend': float(metrics.get('spend', 0.0)),
-        'ecpc': float(metrics.get('ecpc', 0.0)),
-        'conversions': int(metrics.get('conversions', 0)),
-        'conversionRate': float(metrics.get('conversionRate', 0.0)),
-        'cpa': float(metrics.get('cpa', 0.0)),
-    }
-    to_return.update(extra_fields)
+def cover_window(bookmarks, entity_ids, window_end):
+    """
+    Move the bookmarks of `entity_ids` up to `window_end` once a window of
+    them has been fully synced. Entities that had no rows in it have still
+    been covered, and must not hold back the windows of later runs.
+    """
+    window_end = window_end.isoformat()
+
+    for entity_id in entity_ids:
+        advance_bookmark(bookmarks, entity_id, window_end)
+
 
-    return to_return
+def get_group_bookmark(bookmarks, entity_ids):
+    """
+    Bookmark of entities synced together: that of the least synced one,
+    or None if any of them has none.
+    """
+    values = [bookmarks.get(entity_id) for entity_id in entity_ids]
+
+    if not values or None in values:
+        return None
+
+    return min(values)
+
+
+def is_checkpoint_done(checkpoint, checkpoint_id, bookmark, to_date):
+    """
+    Whether the interrupted run whose checkpoint is resumed already synced
+    `checkpoint_id` up to `to_date`: its `bookmark` has reached it, and it
+    has no window left part way. Nothing is done in a checkpoint this run
+    started, since bookmarks reach today in every run.
+    """
+    if not is_resumed(checkpoint) or bookmark is None or \
+       bookmark < to_date.isoformat():
+        return False
+
+    current = checkpoint.get('current')
+
+    if current is not None and current['id'] == checkpoint_id or \
+       checkpoint_id in checkpoint.get('pending', {}):
+        return False
+
+    logger.info('Skipping {}, already synced by the interrupted run.'
+                .format(checkpoint_id))
+    return True
+
+
+def replan_windows(to_date, row_count, from_date, window_end):
+    """
+    Re-plan the windows left after the one just synced, up to `to_date`,
+    from the row density observed in it: sparse data leads to larger
+    windows (fewer rate-limited requests), dense data to smaller ones.
+    """
+    days = (window_end - from_date).days + 1
 
+    return windows.plan_windows(window_end + datetime.timedelta(days=1),
+                                to_date,
+                                rows_per_day=float(row_count) / days,
+                                page_limit=PERIODIC_PAGE_LIMIT)
 
-def get_date_ranges(start, end, interval_in_days):
-    if start > end:
-        return []
 
-    to_return = []
-    interval_start = start
+def get_report_pages(client, url, params, results_key='results',
+                     total_key='totalResults', limit=PERIODIC_PAGE_LIMIT,
+                     offset=0):
+    """
+    Generator over the pages of a reporting API response, starting at
+    `offset`. Follows `offset` / total count pagination until every result
+    has been fetched, yielding a `ResponseItems` over the results of each
+    page. Each page must be fully iterated before the next one is
+    requested.
+    """
 
-    while interval_start < end:
-        to_return.append({
-            'from_date': interval_start,
-            'to_date': min(end,
-                           (interval_start + datetime.timedelta(
-                               days=interval_in_days-1)))
+    while True:
+        page_params = dict(params)
+        page_params.update({
+            'limit': limit,
+            'offset': offset,
         })
 
-        interval_start = interval_start + datetime.timedelta(
-            days=interval_in_days)
+        response = client.request_report(url, page_params)
+        results = ResponseItems(
+            response, results_key,
+            reopen=functools.partial(client.request_report, url,
+                                     page_params),
+            retry_policy=client.retry_policy,
+            endpoint_class=rate_limit.REPORTING)
 
-    return to_return
+        yield results
 
+        total_count = results.get(total_key, results.get('totalCount'))
+        offset = offset + results.count
+
+        if results.count == 0:
+            break
+
+        if total_count is None:
+            if results.count < limit:
+                break
+        elif offset >= total_count:
+            break
 
-def sync_campaign_performance(state, access_token, account_id, campaign_id):
-    return sync_performance(
-        state,
-        access_token,
-        account_id,
-        'campaign_performance',
-        campaign_id,
-        {'campaignId': campaign_id},
-        {'campaignId': campaign_id})
 
+def get_sync_start_date(state, account_id, table_name, state_sub_id):
+    # sync a few days (the attribution lookback) before last saved date, or
+    # DEFAULT_START_DATE
+    return windows.get_start_date(
+        get_bookmarks(state, account_id, table_name).get(state_sub_id),
+        DEFAULT_START_DATE,
+        windows.get_lookback_days(LOOKBACK_DAYS, table_name))
 
-def sync_link_performance(state, access_token, account_id, campaign_id,
+
+def sync_link_performance(state, client, account_id, campaign_id,
                           link_id):
     return sync_performance(
         state,
-        access_token,
+        client,
         account_id,
         'link_performance',
         link_id,
@@ -150,21 +342,22 @@ def sync_link_performance(state, access_token, account_id, campaign_id,
          'linkId': link_id})
 
 
-def sync_performance(state, access_token, account_id, table_name, state_sub_id,
+def sync_performance(state, client, account_id, table_name, state_sub_id,
                      extra_params, extra_persist_fields):
     """
     This function is heavily parameterized as it is used to sync performance
     both based on campaign ID alone, and by campaign ID and link ID.
 
     - `state`: state map
-    - `access_token`: access token for Outbrain Amplify API
+    - `client`: `OutbrainClient` for the Outbrain Amplify API
     - `account_id`: Outbrain marketer ID
     - `table_name`: the table name to use. At present, one of
                     `campaign_performance` or `link_performance`.
     - `state_sub_id`: the id to use within the state map to identify this
                       sub-object. For example,
 
-                        state['link_performance'][link_id]
+                        state['accounts'][account_id]
+                             ['link_performance'][link_id]
 
                       is used for the `link_performance` table.
     - `extra_params`: extra params sent to the Outbrain API
@@ -176,177 +369,881 @@ def sync_performance(state, access_token, account_id, table_name, state_sub_id,
 
                               is used for `link_performance`.
     """
-    # sync 2 days before last saved date, or DEFAULT_START_DATE
-    from_date = datetime.datetime.strptime(
-        state.get(table_name, {})
-             .get(state_sub_id, DEFAULT_START_DATE),
-        '%Y-%m-%d').date() - datetime.timedelta(days=2)
+    checkpoint = get_checkpoint(state, account_id, table_name)
+    planned, offset = plan_performance(state, account_id, table_name,
+                                       state_sub_id)
+    to_date = datetime.date.today()
+
+    with METRICS.stage(table_name):
+        while planned and not RUN_BUDGET.exhausted():
+            from_date, window_end = planned.pop(0)
+
+            row_count = sync_performance_window(
+                state, client, account_id, table_name, state_sub_id,
+                extra_params, extra_persist_fields, from_date, window_end,
+                offset)
+
+            planned = replan_windows(to_date, row_count, from_date,
+                                     window_end)
+            offset = 0
+
+            checkpoint_window(checkpoint, state_sub_id, planned)
+            writer.write_state(state)
+
 
+def plan_performance(state, account_id, table_name, state_sub_id):
+    """
+    Plan the windows to sync the performance of `state_sub_id` in, and
+    return them along with the offset to start the first one at. Nothing
+    is planned if the interrupted run already synced it.
+    """
+    checkpoint = get_checkpoint(state, account_id, table_name)
+    bookmarks = get_bookmarks(state, account_id, table_name)
     to_date = datetime.date.today()
 
-    interval_in_days = 100
+    if is_checkpoint_done(checkpoint, state_sub_id,
+                          bookmarks.get(state_sub_id), to_date):
+        return [], 0
 
-    date_ranges = get_date_ranges(from_date, to_date, interval_in_days)
+    from_date = get_sync_start_date(state, account_id, table_name,
+                                    state_sub_id)
 
-    last_request_start = None
+    return plan_resumable_windows(checkpoint, state_sub_id, from_date,
+                                  to_date)
 
-    for date_range in date_ranges:
-        logger.info(
-            'Pulling {} for {} from {} to {}'
-            .format(table_name,
-                    extra_persist_fields,
-                    date_range.get('from_date'),
-                    date_range.get('to_date')))
 
-        params = {
-            'from': date_range.get('from_date'),
-            'to': date_range.get('to_date'),
-            'breakdown': 'daily',
-            'limit': 100,
-            'sort': '+fromDate',
-            'includeArchivedCampaigns': True,
-        }
-        params.update(extra_params)
+def sync_performance_window(state, client, account_id, table_name,
+                            state_sub_id, extra_params, extra_persist_fields,
+                            from_date, window_end, offset=0):
+    """
+    Sync one window of `sync_performance`, starting at `offset`, and
+    checkpointing after every page. Returns the number of rows synced.
+    """
+    transformer = TRANSFORMERS[table_name]
+
+    bookmarks = get_bookmarks(state, account_id, table_name)
+    checkpoint = get_checkpoint(state, account_id, table_name)
+
+    logger.info(
+        'Pulling {} for {} from {} to {}'
+        .format(table_name,
+                extra_persist_fields,
+                from_date,
+                window_end))
+
+    params = {
+        'from': from_date,
+        'to': window_end,
+        'breakdown': 'daily',
+        'sort': '+fromDate',
+        'includeArchivedCampaigns': True,
+    }
+    params.update(extra_params)
 
-        last_request_start = time.time()
-        response = request(
-            '{}/reports/marketers/{}/periodic'.format(BASE_URL, account_id),
-            access_token,
-            params)
-        last_request_end = time.time()
+    row_count = 0
 
-        logger.info('Done in {} sec'.format(time.time() - last_request_start))
+    for results in get_report_pages(
+            client,
+            '{}/reports/marketers/{}/periodic'
+            .format(client.base_url, account_id),
+            params,
+            offset=offset):
+        for record in METRICS.timed(
+                transformer.transform_page(results, extra_persist_fields),
+                table_name):
+            row_count = row_count + 1
 
-        performance = [
-            parse_performance(result, extra_persist_fields)
-            for result in response.json().get('results')]
+            if not has_from_date(table_name, record):
+                continue
 
-        singer.write_records(table_name, performance)
+            writer.write_record(table_name, record)
+            advance_bookmark(bookmarks, state_sub_id, record['fromDate'])
 
-        last_record = performance[-1]
-        new_from_date = last_record.get('fromDate')
+        offset = offset + results.count
+        checkpoint_page(checkpoint, state_sub_id, from_date, window_end,
+                        offset)
+        writer.write_state(state)
 
-        state[table_name][state_sub_id] = new_from_date
-        singer.write_state(state)
+    cover_window(bookmarks, [state_sub_id], window_end)
 
-        from_date = new_from_date
+    return row_count
 
-        if last_request_start is not None and \
-           (time.time() - last_request_end) < 30:
-            to_sleep = 30 - (time.time() - last_request_end)
-            logger.info(
-                'Limiting to 2 requests per minute. Sleeping {} sec '
-                'before making the next reporting request.'
-                .format(to_sleep))
-            time.sleep(to_sleep)
 
+def sync_breakdown_performance(state, client, account_id, table_name,
+                               report, entities, extra_params={},
+                               checkpoint_id=ALL_ENTITIES):
+    """
+    Sync performance for many entities at once from a marketer-level
+    periodic report broken down by entity, so every entity is fetched for
+    a date window in one paginated request. Rows are fanned out into
+    `table_name` records and each entity keeps its own bookmark.
+
+    - `report`: one of `BREAKDOWN_REPORTS`, describing the report path and
+                how its response is keyed.
+    - `entities`: map of entity ID (as used in the state map) to the extra
+                  fields pushed into the destination data for it.
+    - `extra_params`: extra params sent to the Outbrain API
+    - `checkpoint_id`: identifies this set of entities in the checkpoint
+    """
+    if not entities:
+        return
 
-def parse_campaign(campaign):
-    if campaign.get('budget') is not None:
-        campaign['budget']['creationTime'] = parse_datetime(
-            campaign.get('budget').get('creationTime'))
-        campaign['budget']['lastModified'] = parse_datetime(
-            campaign.get('budget').get('lastModified'))
+    transformer = TRANSFORMERS[table_name]
 
-    return campaign
+    bookmarks = get_bookmarks(state, account_id, table_name)
+    checkpoint = get_checkpoint(state, account_id, table_name)
+    to_date = datetime.date.today()
 
+    if is_checkpoint_done(checkpoint, checkpoint_id,
+                          get_group_bookmark(bookmarks, entities), to_date):
+        return
 
-def sync_campaigns(state, access_token, account_id):
-    logger.info('Syncing campaigns.')
+    from_dates = {
+        entity_id: get_sync_start_date(state, account_id, table_name,
+                                       entity_id)
+        for entity_id in entities}
+
+    planned, offset = plan_resumable_windows(
+        checkpoint, checkpoint_id, min(from_dates.values()), to_date)
+
+    with METRICS.stage(table_name):
+        while planned and not RUN_BUDGET.exhausted():
+            from_date, window_end = planned.pop(0)
+
+            logger.info(
+                'Pulling {} for {} {} from {} to {}'
+                .format(table_name,
+                        len(entities),
+                        report['name'],
+                        from_date,
+                        window_end))
+
+            params = {
+                'from': from_date,
+                'to': window_end,
+                'breakdown': 'daily',
+                'includeArchivedCampaigns': True,
+            }
+            params.update(extra_params)
+
+            # the report is paginated by entity, so the window size is driven
+            # by the densest single entity rather than the total row count.
+            max_row_count = 0
+
+            for entity_results in get_report_pages(
+                    client,
+                    '{}/reports/marketers/{}/{}'
+                    .format(client.base_url, account_id, report['path']),
+                    params,
+                    results_key=report['results_key'],
+                    total_key=report['total_key'],
+                    limit=report['limit'],
+                    offset=offset):
+                for entity_result in entity_results:
+                    entity_id = entity_result.get(report['id_key'])
+
+                    if entity_id not in from_dates:
+                        continue
+
+                    entity_from_date = from_dates[entity_id].isoformat()
+                    results = entity_result.get('results', [])
+                    max_row_count = max(max_row_count, len(results))
+
+                    for record in METRICS.timed(
+                            transformer.transform_page(results,
+                                                       entities[entity_id]),
+                            table_name):
+                        if not has_from_date(table_name, record) or \
+                           record['fromDate'] < entity_from_date:
+                            continue
+
+                        writer.write_record(table_name, record)
+                        advance_bookmark(bookmarks, entity_id,
+                                         record['fromDate'])
+
+                offset = offset + entity_results.count
+                checkpoint_page(checkpoint, checkpoint_id, from_date,
+                                window_end, offset)
+                writer.write_state(state)
+
+            cover_window(bookmarks, entities, window_end)
+
+            planned = replan_windows(to_date, max_row_count, from_date,
+                                     window_end)
+            offset = 0
+
+            checkpoint_window(checkpoint, checkpoint_id, planned)
+            writer.write_state(state)
+
+
+def sync_dimension_performance(state, client, account_id, table_name):
+    """
+    Sync one of `DIMENSION_REPORTS` into `table_name`. Rows are fanned out
+    into records carrying the account's `marketerId` and the report's
+    dimension fields, and bookmarked under `ALL_ENTITIES`.
+    """
+    report = DIMENSION_REPORTS[table_name]
+    transformer = TRANSFORMERS[table_name]
+    dimensions = transformer.select(report['dimensions'])
+
+    bookmarks = get_bookmarks(state, account_id, table_name)
+    checkpoint = get_checkpoint(state, account_id, table_name)
+    to_date = datetime.date.today()
 
-    start = time.time()
-    response = request(
-        '{}/marketers/{}/campaigns'.format(BASE_URL, account_id),
-        access_token, {})
+    if is_checkpoint_done(checkpoint, ALL_ENTITIES,
+                          bookmarks.get(ALL_ENTITIES), to_date):
+        return
+
+    from_date = get_sync_start_date(state, account_id, table_name,
+                                    ALL_ENTITIES)
+
+    planned, offset = plan_resumable_windows(checkpoint, ALL_ENTITIES,
+                                             from_date, to_date)
+
+    with METRICS.stage(table_name):
+        while planned and not RUN_BUDGET.exhausted():
+            from_date, window_end = planned.pop(0)
+
+            logger.info('Pulling {} for all {} from {} to {}'
+                        .format(table_name, report['name'], from_date,
+                                window_end))
+
+            params = {
+                'from': from_date,
+                'to': window_end,
+                'breakdown': 'daily',
+                'includeArchivedCampaigns': True,
+            }
+
+            # as with campaigns and links, the report is paginated by
+            # dimension value, so the densest one drives the window size.
+            max_row_count = 0
+
+            for dimension_results in get_report_pages(
+                    client,
+                    '{}/reports/marketers/{}/{}'
+                    .format(client.base_url, account_id, report['path']),
+                    params,
+                    results_key=report['results_key'],
+                    total_key=report['total_key'],
+                    limit=report['limit'],
+                    offset=offset):
+                for dimension_result in dimension_results:
+                    results = dimension_result.get('results', [])
+                    max_row_count = max(max_row_count, len(results))
+
+                    extra_fields = {
+                        name: dimension_result.get(name)
+                        for name in dimensions}
+                    extra_fields['marketerId'] = account_id
+
+                    for record in METRICS.timed(
+                            transformer.transform_page(results,
+                                                       extra_fields),
+                            table_name):
+                        if not has_from_date(table_name, record):
+                            continue
+
+                        writer.write_record(table_name, record)
+                        advance_bookmark(bookmarks, ALL_ENTITIES,
+                                         record['fromDate'])
+
+                offset = offset + dimension_results.count
+                checkpoint_page(checkpoint, ALL_ENTITIES, from_date,
+                                window_end, offset)
+                writer.write_state(state)
+
+            cover_window(bookmarks, [ALL_ENTITIES], window_end)
+
+            planned = replan_windows(to_date, max_row_count, from_date,
+                                     window_end)
+            offset = 0
+
+            checkpoint_window(checkpoint, ALL_ENTITIES, planned)
+            writer.write_state(state)
+
+
+def sync_campaigns_performance(state, client, account_id,
+                               campaign_ids):
+    """
+    Batched alternative to `sync_campaigns_queue`: one paginated
+    reporting request per date window for all campaigns, rather than one
+    per campaign.
+    """
+    return sync_breakdown_performance(
+        state,
+        client,
+        account_id,
+        'campaign_performance',
+        BREAKDOWN_REPORTS['campaigns'],
+        {campaign_id: {'campaignId': campaign_id}
+         for campaign_id in campaign_ids})
+
+
+def sync_campaigns_queue(state, client, account_id, campaigns):
+    """
+    Sync the performance of `campaigns`, a list of `(campaign_id,
+    priority)`, one window at a time from a `scheduler.WorkQueue`, so the
+    most valuable windows are synced first, and a run that uses up its
+    budget has synced those. Returns the number of campaigns left for the
+    next run.
+    """
+    table_name = 'campaign_performance'
+    checkpoint = get_checkpoint(state, account_id, table_name)
+    to_date = datetime.date.today()
 
-    campaigns = [parse_campaign(campaign) for campaign
-                 in response.json().get('campaigns', [])]
+    queue = scheduler.WorkQueue()
 
-    singer.write_records('campaigns', campaigns)
+    for campaign_id, priority in campaigns:
+        planned, offset = plan_performance(state, account_id, table_name,
+                                           campaign_id)
+        if planned:
+            queue.push(campaign_id, planned[0], offset, priority)
 
-    logger.info('Done in {} sec.'.format(time.time() - start))
+    logger.info('Queued performance for {} campaigns.'.format(len(queue)))
 
     campaigns_done = 0
 
-    for campaign in campaigns:
-        # commenting this for now because it makes the integration take too
-        # long for users with many campaigns. outbrain rate limits requests
-        # to the reporting API at about 2 requests per minute. if we can
-        # get them to raise that, this can be uncommented and will work great.
-        #    - Connor (@cmcarthur on Github)
-        #
-        # sync_links(state, access_token, account_id, campaign.get('id'))
+    with METRICS.stage(table_name):
+        while queue and not RUN_BUDGET.exhausted():
+            campaign_id, (from_date, window_end), offset, priority = \
+                queue.pop()
 
-        sync_campaign_performance(state, access_token, account_id,
-                                  campaign.get('id'))
+            row_count = sync_performance_window(
+                state, client, account_id, table_name, campaign_id,
+                {'campaignId': campaign_id}, {'campaignId': campaign_id},
+                from_date, window_end, offset)
 
-        campaigns_done = campaigns_done + 1
+            planned = replan_windows(to_date, row_count, from_date,
+                                     window_end)
 
-        logger.info(
-            '{} of {} campaigns fully synced.'
-            .format(campaigns_done, len(campaigns)))
+            checkpoint_window(checkpoint, campaign_id, planned)
+            writer.write_state(state)
 
-    logger.info('Done!')
+            if planned:
+                queue.push(campaign_id, planned[0], 0, priority)
+                continue
+
+            campaigns_done = campaigns_done + 1
 
+            logger.info('{} campaigns fully synced.'.format(campaigns_done))
 
-def parse_link(link):
-    link['creationTime'] = parse_datetime(link.get('creationTime'))
-    link['lastModified'] = parse_datetime(link.get('lastModified'))
+    if queue:
+        logger.info('Left performance of {} campaigns for the next run.'
+                    .format(len(queue)))
 
-    return link
+    return len(queue)
 
 
-def sync_links(state, access_token, account_id, campaign_id):
+def sync_links_performance(state, client, account_id, links,
+                           mode=LINK_PERFORMANCE_MARKETER):
+    """
+    Sync `link_performance` for `links`, in the order given.
+
+    - `mode`: `marketer` pulls every link in one paginated request per date
+              window, `campaign` makes one such request per campaign, and
+              `link` makes one per link.
+    """
+    if mode == LINK_PERFORMANCE_LINK:
+        for link in links:
+            sync_link_performance(state, client, account_id,
+                                  link.get('campaignId'), link.get('id'))
+        return
+
+    for extra_params, group in group_links(links, mode):
+        sync_breakdown_performance(
+            state,
+            client,
+            account_id,
+            'link_performance',
+            BREAKDOWN_REPORTS['promoted_links'],
+            {link.get('id'): {'campaignId': link.get('campaignId'),
+                              'linkId': link.get('id')}
+             for link in group},
+            extra_params,
+            checkpoint_id=extra_params.get('campaignId', ALL_ENTITIES))
+
+
+def group_links(links, mode):
+    """
+    Group `links` into the `(extra_params, links)` pulled together by one
+    promoted link breakdown in `mode`, either `marketer` or `campaign`.
+    """
+    if mode == LINK_PERFORMANCE_MARKETER:
+        return [({}, links)]
+
+    if mode != LINK_PERFORMANCE_CAMPAIGN:
+        raise ValueError('Unknown link performance mode: {}'.format(mode))
+
+    links_by_campaign = collections.OrderedDict()
+
+    for link in links:
+        links_by_campaign.setdefault(link.get('campaignId'), []).append(link)
+
+    return [({'campaignId': campaign_id}, campaign_links)
+            for campaign_id, campaign_links in links_by_campaign.items()]
+
+
+def get_entity_pages(client, url, results_key, limit):
+    """
+    Generator over the pages of an entity listing, such as campaigns or
+    promoted links. Follows `offset` / `totalCount` pagination, yielding
+    a `ResponseItems` over the entities of each page. Each page must be
+    fully iterated before the next one is requested.
+    """
     processed_count = 0
-    total_count = -1
-    fully_synced_count = 0
-    limit = 100
 
-    while processed_count != total_count:
-        logger.info(
-            'Syncing {} links for campaign {} starting from offset {}'
-            .format(limit,
-                    campaign_id,
-                    processed_count))
+    while True:
+        logger.info('Syncing {} starting from offset {}'
+                    .format(results_key, processed_count))
 
-        start = time.time()
-        response = request(
-            '{}/campaigns/{}/promotedLinks'.format(BASE_URL, campaign_id),
-            access_token, {
-                'limit': 100,
-                'offset': processed_count
-            })
+        page_params = {
+            'limit': limit,
+            'offset': processed_count
+        }
 
-        links = [parse_link(link) for link
-                 in response.json().get('promotedLinks', [])]
+        response = client.request(url, page_params, stream=True)
+        entities = ResponseItems(
+            response, results_key,
+            reopen=functools.partial(client.request, url, page_params,
+                                     stream=True),
+            retry_policy=client.retry_policy)
 
-        singer.write_records('links', links)
+        yield entities
 
-        total_count = response.json().get('totalCount')
-        processed_count = processed_count + len(links)
+        total_count = entities.get('totalCount')
+        processed_count = processed_count + entities.count
 
-        for link in links:
-            logger.info(
-                'Syncing link performance for link {} of {}.'.format(
-                    fully_synced_count,
-                    total_count))
+        logger.info('Fetched {} of {} {}.'
+                    .format(processed_count,
+                            total_count,
+                            results_key))
 
-            sync_link_performance(state, access_token, account_id, campaign_id,
-                                  link.get('id'))
+        if entities.count == 0 or total_count is None or \
+           processed_count >= total_count:
+            break
 
-            fully_synced_count = fully_synced_count + 1
 
-        logger.info('Done in {} sec, processed {} of {} links.'
-                    .format(time.time() - start,
-                            processed_count,
-                            total_count))
+def get_campaign_pages(client, account_id):
+    return get_entity_pages(
+        client,
+        '{}/marketers/{}/campaigns'.format(client.base_url, account_id),
+        'campaigns',
+        CAMPAIGN_LIST_PAGE_LIMIT)
 
-    logger.info('Done syncing links for campaign {}.'.format(campaign_id))
 
+def is_selected(stream_name):
+    return stream_name in SELECTION
 
-def do_sync(args):
+
+def write_entity(stream_name, record, hashes, today):
+    """
+    Write the selected fields of an entity record and return True, unless
+    the stream is not selected, or incremental entities are on (`hashes`
+    holds the entity hashes of `stream_name`) and the record has not
+    changed since it was last emitted.
+    """
+    if not is_selected(stream_name):
+        return False
+
+    record = TRANSFORMERS[stream_name].prune(record)
+
+    if hashes is None:
+        writer.write_record(stream_name, record)
+        return True
+
+    digest = changes.detect_change(hashes, record.get('id'), record)
+
+    if digest is None:
+        return False
+
+    writer.write_record(stream_name, record)
+    changes.record_change(hashes, record.get('id'), digest, today)
+
+    return True
+
+
+def is_inactive(entity, changed_on, bookmark, cutoff):
+    # disabled before `cutoff`, with performance synced past that point.
+    # Entities whose changes are not tracked yet are taken as active.
+    return not entity.get('enabled', True) and \
+        changed_on is not None and changed_on < cutoff and \
+        bookmark is not None and bookmark > changed_on
+
+
+def select_campaigns_for_performance(state, account_id, campaigns,
+                                     inactive_days, hashes):
+    """
+    Pick the IDs of the campaigns whose performance should be pulled, in
+    the order given. Campaigns that are disabled, have not changed for
+    `inactive_days` and have already been synced past their last change
+    are skipped.
+    """
+    cutoff = (datetime.date.today() -
+              datetime.timedelta(days=inactive_days)).isoformat()
+    bookmarks = get_bookmarks(state, account_id, 'campaign_performance')
+
+    return [campaign.get('id') for campaign in campaigns
+            if not is_inactive(campaign,
+                               changes.get_changed_on(hashes,
+                                                      campaign.get('id')),
+                               bookmarks.get(campaign.get('id')),
+                               cutoff)]
+
+
+def sync_campaigns(state, client, account_id, config={}, fetcher=None):
+    """
+    Sync campaigns and everything synced by campaign, returning the number
+    of campaigns whose performance was left in the work queue for the next
+    run.
+    """
+    if not any(is_selected(stream_name) for stream_name in CAMPAIGN_STREAMS):
+        return 0
+
+    logger.info('Syncing campaigns.')
+
+    # campaigns are listed whatever is selected, since every other stream
+    # is synced by campaign.
+    pull_performance = is_selected('campaign_performance')
+    pull_links = config.get('sync_links', True) and \
+        (is_selected('links') or is_selected('link_performance'))
+
+    batch_reporting = config.get('batch_reporting', False)
+    incremental = config.get('incremental_entities', False)
+
+    campaign_hashes = None
+    link_hashes = None
+
+    if incremental:
+        campaign_hashes = get_entity_hashes(state, account_id, 'campaigns')
+        link_hashes = get_entity_hashes(state, account_id, 'links')
+
+    today = datetime.date.today().isoformat()
+
+    bookmarks = get_bookmarks(state, account_id, 'campaign_performance')
+
+    campaign_ids = []
+    performance_ids = []
+    queued = []
+    campaigns_written = 0
+    campaigns_left = 0
+
+    # campaigns are written page by page, and only their IDs, and what
+    # the work queue needs to prioritize their performance, are kept.
+    for page in get_campaign_pages(client, account_id):
+        page_campaigns = []
+
+        with METRICS.stage('campaigns'):
+            for campaign in METRICS.timed(
+                    TRANSFORMERS['campaigns'].transform_page(page),
+                    'campaigns'):
+                if write_entity('campaigns', campaign, campaign_hashes,
+                                today):
+                    campaigns_written = campaigns_written + 1
+
+                page_campaigns.append(campaign)
+
+        page_ids = [campaign.get('id') for campaign in page_campaigns]
+        campaign_ids.extend(page_ids)
+
+        if not pull_performance:
+            continue
+
+        if incremental:
+            page_ids = select_campaigns_for_performance(
+                state, account_id, page_campaigns,
+                config.get('campaign_inactive_days',
+                           DEFAULT_CAMPAIGN_INACTIVE_DAYS),
+                campaign_hashes)
+
+        if batch_reporting:
+            performance_ids.extend(page_ids)
+            continue
+
+        page_ids = set(page_ids)
+        queued.extend(
+            (campaign.get('id'),
+             scheduler.get_priority(campaign,
+                                    bookmarks.get(campaign.get('id'))))
+            for campaign in page_campaigns
+            if campaign.get('id') in page_ids)
+
+    if incremental:
+        changes.prune(campaign_hashes, campaign_ids)
+
+        logger.info('Wrote {} of {} campaigns, the rest are unchanged.'
+                    .format(campaigns_written, len(campaign_ids)))
+
+    if pull_performance and batch_reporting:
+        sync_campaigns_performance(state, client, account_id,
+                                   performance_ids)
+    elif pull_performance:
+        campaigns_left = sync_campaigns_queue(state, client, account_id,
+                                              queued)
+
+    # link performance used to be pulled one link at a time, which took far
+    # too long at about 2 reporting requests per minute. it is now pulled
+    # in bulk from the promoted link breakdown, for active links only.
+    if pull_links:
+        sync_campaigns_links(
+            state, client, account_id, campaign_ids, fetcher,
+            link_performance_mode=config.get('link_performance_mode',
+                                             LINK_PERFORMANCE_MARKETER),
+            link_inactive_days=config.get('link_inactive_days',
+                                          DEFAULT_LINK_INACTIVE_DAYS),
+            include_archived_links=config.get('include_archived_links',
+                                              False),
+            link_hashes=link_hashes)
+
+    logger.info('Done!')
+
+    return campaigns_left
+
+
+def sync_dimensions(state, client, account_id):
+    for table_name in DIMENSION_REPORTS:
+        if not is_selected(table_name) or RUN_BUDGET.exhausted():
+            continue
+
+        logger.info('Syncing {}.'.format(table_name))
+
+        sync_dimension_performance(state, client, account_id, table_name)
+
+
+def get_link_pages(client, campaign_id):
+    return get_entity_pages(
+        client,
+        '{}/campaigns/{}/promotedLinks'.format(client.base_url,
+                                               campaign_id),
+        'promotedLinks',
+        LINKS_PAGE_LIMIT)
+
+
+def sync_links(state, client, account_id, campaign_id, pages=None,
+               hashes=None):
+    """
+    Sync the promoted links of a campaign, returning them. `pages` holds
+    the already fetched pages of links when they were prefetched
+    concurrently; otherwise they are streamed one page at a time. With
+    incremental entities, `hashes` holds the link hashes, and only new or
+    changed links are written.
+    """
+    synced = []
+    written = 0
+    today = datetime.date.today().isoformat()
+
+    if pages is None:
+        pages = get_link_pages(client, campaign_id)
+
+    with METRICS.stage('links', campaign_id=campaign_id):
+        for page in pages:
+            for link in METRICS.timed(
+                    TRANSFORMERS['links'].transform_page(page), 'links'):
+                link.setdefault('campaignId', campaign_id)
+
+                if write_entity('links', link, hashes, today):
+                    written = written + 1
+
+                synced.append(link)
+
+    logger.info('Done syncing links for campaign {}, wrote {} of {}.'
+                .format(campaign_id, written, len(synced)))
+
+    return synced
+
+
+def select_links_for_performance(state, account_id, links, inactive_days,
+                                 include_archived=False, hashes=None):
+    """
+    Pick the links whose performance should be pulled, most recently
+    modified first. Archived links are skipped, as are links that were
+    disabled more than `inactive_days` ago and have already been synced
+    past that point. With incremental entities, a link also counts as
+    modified on the date its hash last changed.
+    """
+    cutoff = (datetime.date.today() -
+              datetime.timedelta(days=inactive_days)).isoformat()
+    bookmarks = get_bookmarks(state, account_id, 'link_performance')
+
+    selected = []
+
+    for link in links:
+        if link.get('archived') and not include_archived:
+            continue
+
+        # with neither a modification date nor a recorded hash, nothing
+        # says when the link changed, so it is taken as active.
+        changed_on = max((link.get('lastModified') or '')[:10],
+                         changes.get_changed_on(hashes, link.get('id'))
+                         or '') or None
+
+        if is_inactive(link, changed_on, bookmarks.get(link.get('id')),
+                       cutoff):
+            continue
+
+        selected.append(link)
+
+    logger.info('Selected {} of {} links for performance sync.'
+                .format(len(selected), len(links)))
+
+    return sorted(selected,
+                  key=lambda link: link.get('lastModified') or '',
+                  reverse=True)
+
+
+def sync_campaigns_links(state, client, account_id, campaign_ids,
+                         fetcher=None,
+                         link_performance_mode=LINK_PERFORMANCE_MARKETER,
+                         link_inactive_days=DEFAULT_LINK_INACTIVE_DAYS,
+                         include_archived_links=False, link_hashes=None):
+    """
+    Sync links for many campaigns, then the performance of the active
+    ones. With an `AsyncFetcher`, the promoted link pages of
+    `LINKS_CAMPAIGN_BATCH_SIZE` campaigns at a time are fetched
+    concurrently, and then written in campaign order.
+    """
+    links = []
+
+    if fetcher is None:
+        for campaign_id in campaign_ids:
+            links.extend(sync_links(state, client, account_id, campaign_id,
+                                    hashes=link_hashes))
+    else:
+        for i in range(0, len(campaign_ids), LINKS_CAMPAIGN_BATCH_SIZE):
+            batch = campaign_ids[i:i + LINKS_CAMPAIGN_BATCH_SIZE]
+
+            start = time.time()
+            pages_by_campaign = fetcher.get_all_pages(
+                ['{}/campaigns/{}/promotedLinks'.format(client.base_url,
+                                                        campaign_id)
+                 for campaign_id in batch],
+                'promotedLinks',
+                limit=LINKS_PAGE_LIMIT)
+
+            logger.info('Fetched links for {} campaigns in {} sec.'
+                        .format(len(batch), time.time() - start))
+
+            for campaign_id, pages in zip(batch, pages_by_campaign):
+                links.extend(sync_links(state, client, account_id,
+                                        campaign_id, pages, link_hashes))
+
+    if link_hashes is not None:
+        changes.prune(link_hashes, [link.get('id') for link in links])
+
+    if not is_selected('link_performance') or RUN_BUDGET.exhausted():
+        return
+
+    selected = select_links_for_performance(
+        state, account_id, links, link_inactive_days, include_archived_links,
+        link_hashes)
+
+    sync_links_performance(state, client, account_id, selected,
+                           link_performance_mode)
+
+
+def clear_finished_checkpoints(state, account_id, campaigns_left=0):
+    """
+    Clear the checkpoint of every table with no work left, so the next run
+    starts from the bookmarks. A run that used up its budget keeps the
+    windows it left part way, and the campaigns it left queued, for the
+    next run to resume.
+    """
+    for table_name in BOOKMARK_TABLES:
+        if table_name == 'campaign_performance' and campaigns_left:
+            continue
+
+        checkpoint = get_checkpoint(state, account_id, table_name)
+
+        if checkpoint.get('current') or checkpoint.get('pending'):
+            continue
+
+        clear_checkpoint(state, account_id, table_name)
+
+
+def sync_account(state, config, account_id, credentials):
+    """
+    Sync everything for one Outbrain marketer. Each account gets its own
+    client, and with it its own rate scheduler, so accounts synced in
+    parallel each respect their own reporting quota. Logins are limited
+    per user, so the clients share `credentials`, along with the access
+    token and the throttling of /login.
+    """
+    logger.info('Syncing account {}.'.format(account_id))
+
+    client = OutbrainClient.from_config(config, credentials)
+
+    fetcher = AsyncFetcher.from_config(client, config)
+
+    try:
+        campaigns_left = sync_campaigns(state, client, account_id, config,
+                                        fetcher)
+        sync_dimensions(state, client, account_id)
+
+        clear_finished_checkpoints(state, account_id, campaigns_left)
+        writer.write_state(state)
+    finally:
+        client.rate_scheduler.log_summary()
+        client.retry_policy.log_summary()
+
+        if fetcher is not None:
+            fetcher.close()
+
+        client.close()
+
+    logger.info('Done syncing account {}.'.format(account_id))
+
+
+def sync_accounts(state, config, account_ids, credentials):
+    max_parallel_accounts = min(
+        len(account_ids),
+        config.get('max_parallel_accounts', DEFAULT_MAX_PARALLEL_ACCOUNTS))
+
+    if max_parallel_accounts <= 1:
+        for account_id in account_ids:
+            sync_account(state, config, account_id, credentials)
+        return
+
+    logger.info('Syncing {} accounts, {} at a time.'
+                .format(len(account_ids), max_parallel_accounts))
+
+    failed = []
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_parallel_accounts) as executor:
+        futures = {
+            executor.submit(sync_account, state, config, account_id,
+                            credentials): account_id
+            for account_id in account_ids}
+
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                logger.exception(
+                    'Failed to sync account {}.'.format(futures[future]))
+                failed.append(futures[future])
+
+    if failed:
+        logger.fatal('Failed to sync accounts: {}.'
+                     .format(', '.join(failed)))
+        raise RuntimeError
+
+
+def do_discover():
+    json.dump(catalog.discover(), sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+def load_config(args):
+    """
+    Load the config, state and catalog, and configure the tap from them.
+    Returns the config, the account IDs to sync and the state.
+    """
     global DEFAULT_START_DATE
-    state = DEFAULT_STATE
+    global LOOKBACK_DAYS
+    global RUN_BUDGET
+    global SELECTION
+    global TRANSFORMERS
 
     with open(args.config) as config_file:
         config = json.load(config_file)
@@ -361,10 +1258,12 @@ def do_sync(args):
     else:
         password = config['password']
 
-    if 'account_id' not in config:
-        missing_keys.append('account_id')
+    if 'account_ids' in config:
+        account_ids = config['account_ids']
+    elif 'account_id' in config:
+        account_ids = [config['account_id']]
     else:
-        account_id = config['account_id']
+        missing_keys.append('account_id')
 
     if 'start_date' not in config:
         missing_keys.append('start_date')
@@ -372,34 +1271,201 @@ def do_sync(args):
         # only want the date
         DEFAULT_START_DATE = config['start_date'][:10]
 
+    LOOKBACK_DAYS = config.get('lookback_days', windows.DEFAULT_LOOKBACK_DAYS)
+    RUN_BUDGET = scheduler.RunBudget.from_config(config)
+
     if len(missing_keys) > 0:
         logger.fatal("Missing {}.".format(", ".join(missing_keys)))
         raise RuntimeError
 
-    access_token = config.get('access_token')
+    state = load_state(args.state, account_ids)
+
+    if args.catalog is not None:
+        SELECTION = catalog.get_selection(catalog.load_catalog(args.catalog))
+        TRANSFORMERS = build_transformers(SELECTION)
+
+    return config, account_ids, state
+
+
+def do_sync(args):
+    config, account_ids, state = load_config(args)
+
+    if not SELECTION:
+        logger.info('No streams selected, nothing to sync.')
+        return
+
+    writer.configure(config)
+
+    client = OutbrainClient.from_config(config)
+
+    if client.authenticate() is None:
+        logger.fatal("Failed to generate a new access token.")
+        raise RuntimeError
+
+    client.close()
 
-    if access_token is None:
-        access_token = generate_token(username, password)
+    for stream_name, fields in SELECTION.items():
+        stream = catalog.STREAMS[stream_name]
+        writer.write_schema(stream_name,
+                            catalog.prune_schema(stream['schema'], fields),
+                            key_properties=stream['key_properties'])
 
-    if access_token is None:
+    try:
+        sync_accounts(state, config, account_ids, client.credentials)
+    finally:
+        # records written so far, and the state covering them, are still
+        # worth emitting if the sync fails part way through.
+        writer.flush()
+        client.credentials.login_scheduler.log_summary()
+        METRICS.log_summary(config.get('metrics_summary_path'))
+
+
+def plan_breakdown(state, account_id, table_name, report, entity_ids,
+                   checkpoint_id=ALL_ENTITIES):
+    """
+    Plan the windows `sync_breakdown_performance` would sync `entity_ids`
+    in, and return them along with the number of pages each one takes.
+    """
+    checkpoint = get_checkpoint(state, account_id, table_name)
+    bookmarks = get_bookmarks(state, account_id, table_name)
+    to_date = datetime.date.today()
+
+    if not entity_ids or is_checkpoint_done(
+            checkpoint, checkpoint_id,
+            get_group_bookmark(bookmarks, entity_ids), to_date):
+        return [], 0
+
+    from_date = min(get_sync_start_date(state, account_id, table_name,
+                                        entity_id)
+                    for entity_id in entity_ids)
+
+    planned, offset = plan_resumable_windows(checkpoint, checkpoint_id,
+                                             from_date, to_date)
+
+    return planned, int(math.ceil(float(len(entity_ids)) / report['limit']))
+
+
+def plan_entity(plan, state, account_id, table_name, entity_id):
+    planned, offset = plan_performance(state, account_id, table_name,
+                                       entity_id)
+
+    plan.add(account_id, table_name, entity_id, planned,
+             sum(planner.get_page_count(window, windows.DAILY_ROWS_PER_DAY,
+                                        PERIODIC_PAGE_LIMIT)
+                 for window in planned))
+
+
+def plan_group(plan, state, account_id, table_name, report, entity_ids,
+               checkpoint_id=ALL_ENTITIES):
+    planned, pages = plan_breakdown(state, account_id, table_name, report,
+                                    entity_ids, checkpoint_id)
+
+    plan.add(account_id, table_name,
+             '{} {}'.format(len(entity_ids), report['name'])
+             if checkpoint_id == ALL_ENTITIES else checkpoint_id,
+             planned, len(planned) * pages, len(entity_ids))
+
+
+def plan_account(plan, state, client, account_id, config):
+    """
+    Add the reporting requests a sync of `account_id` would make to `plan`,
+    without making any. Campaigns are listed, and so are their promoted
+    links if link performance is selected, since what is pulled depends
+    on them.
+    """
+    campaigns = []
+
+    if any(is_selected(stream_name) for stream_name in CAMPAIGN_STREAMS):
+        for page in get_campaign_pages(client, account_id):
+            campaigns.extend(page)
+
+    campaign_ids = [campaign.get('id') for campaign in campaigns]
+
+    if is_selected('campaign_performance'):
+        performance_ids = campaign_ids
+
+        if config.get('incremental_entities', False):
+            performance_ids = select_campaigns_for_performance(
+                state, account_id, campaigns,
+                config.get('campaign_inactive_days',
+                           DEFAULT_CAMPAIGN_INACTIVE_DAYS),
+                get_entity_hashes(state, account_id, 'campaigns'))
+
+        if config.get('batch_reporting', False):
+            plan_group(plan, state, account_id, 'campaign_performance',
+                       BREAKDOWN_REPORTS['campaigns'], performance_ids)
+        else:
+            for campaign_id in performance_ids:
+                plan_entity(plan, state, account_id, 'campaign_performance',
+                            campaign_id)
+
+    if is_selected('link_performance') and config.get('sync_links', True):
+        links = []
+
+        for campaign_id in campaign_ids:
+            for page in get_link_pages(client, campaign_id):
+                for link in page:
+                    link.setdefault('campaignId', campaign_id)
+                    links.append(link)
+
+        hashes = None
+        if config.get('incremental_entities', False):
+            hashes = get_entity_hashes(state, account_id, 'links')
+
+        selected = select_links_for_performance(
+            state, account_id, links,
+            config.get('link_inactive_days', DEFAULT_LINK_INACTIVE_DAYS),
+            config.get('include_archived_links', False), hashes)
+
+        mode = config.get('link_performance_mode', LINK_PERFORMANCE_MARKETER)
+
+        if mode == LINK_PERFORMANCE_LINK:
+            for link in selected:
+                plan_entity(plan, state, account_id, 'link_performance',
+                            link.get('id'))
+        else:
+            for extra_params, group in group_links(selected, mode):
+                plan_group(plan, state, account_id, 'link_performance',
+                           BREAKDOWN_REPORTS['promoted_links'],
+                           [link.get('id') for link in group],
+                           extra_params.get('campaignId', ALL_ENTITIES))
+
+    # breakdown reports are planned at one page per window, the least they
+    # can take, since how many dimension values they have is unknown.
+    for table_name in DIMENSION_REPORTS:
+        if is_selected(table_name):
+            plan_entity(plan, state, account_id, table_name, ALL_ENTITIES)
+
+
+def do_plan(args):
+    """
+    Print how many reporting requests a sync would make, per stream, and
+    how long the reporting rate limit would make it take, without
+    requesting any report.
+    """
+    config, account_ids, state = load_config(args)
+
+    client = OutbrainClient.from_config(config)
+
+    if client.authenticate() is None:
         logger.fatal("Failed to generate a new access token.")
         raise RuntimeError
 
+    plan = planner.Plan()
+
+    try:
+        for account_id in account_ids:
+            plan_account(plan, state, client, account_id, config)
+    finally:
+        client.close()
 
-    singer.write_schema('campaigns',
-                        schemas.campaign,
-                        key_properties=["id"])
-    singer.write_schema('campaign_performance',
-                        schemas.campaign_performance,
-                        key_properties=["campaignId", "fromDate"])
-    singer.write_schema('links',
-                        schemas.link,
-                        key_properties=["id"])
-    singer.write_schema('link_performance',
-                        schemas.link_performance,
-                        key_properties=["campaignId", "linkId", "fromDate"])
+    plan.entity_requests = METRICS.request_count(rate_limit.ENTITY)
 
-    sync_campaigns(state, access_token, account_id)
+    sys.stdout.write(plan.report(
+        config,
+        min(len(account_ids),
+            config.get('max_parallel_accounts',
+                       DEFAULT_MAX_PARALLEL_ACCOUNTS))))
 
 
 def main():
@@ -409,10 +1475,24 @@ def main():
         '-c', '--config', help='Config file', required=True)
     parser.add_argument(
         '-s', '--state', help='State file')
+    parser.add_argument(
+        '-d', '--discover', action='store_true',
+        help='Print the catalog of available streams and exit')
+    parser.add_argument(
+        '--catalog', '-p', '--properties', dest='catalog',
+        help='Catalog file selecting the streams and fields to sync')
+    parser.add_argument(
+        '--plan', action='store_true',
+        help='Print the reporting requests a sync would make and exit')
 
     args = parser.parse_args()
 
-    do_sync(args)
+    if args.discover:
+        do_discover()
+    elif args.plan:
+        do_plan(args)
+    else:
+        do_sync(args)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,147 @@
+import collections
+import collections.abc
+import datetime
+import functools
+import sys
+import threading
+
+
+@functools.lru_cache(maxsize=4096)
+def to_ordinal(value):
+    return datetime.date(int(value[0:4]), int(value[5:7]),
+                         int(value[8:10])).toordinal()
+
+
+@functools.lru_cache(maxsize=4096)
+def to_date(ordinal):
+    return datetime.date.fromordinal(ordinal).isoformat()
+
+
+def is_compact(value):
+    return isinstance(value, dict) and set(value) == {'ids', 'runs'}
+
+
+class BookmarkMap(collections.abc.MutableMapping):
+    """
+    The bookmarks of one table, mapping entity IDs to `YYYY-MM-DD` dates.
+    Rather than a date string per entity, dates are kept as day ordinals,
+    and entities bookmarked on the same date share one ordinal object, so
+    hundreds of thousands of link bookmarks take less memory. IDs are
+    interned.
+
+    Bookmarks are exported either as a plain dict, or in the compact
+    format, where IDs are grouped by date and each date is written once
+    along with the number of IDs that share it:
+
+        {'ids': ['00f4b0...', '00f4b1...', '00f4b2...'],
+         'runs': [['2017-03-16', 2], ['2017-03-14', 1]]}
+
+    Exports are cached until the bookmarks change. Accounts sync in
+    parallel, so writes and exports hold a lock, otherwise an export built
+    while another thread writes could be cached after that write.
+    """
+
+    def __init__(self, bookmarks=None):
+        self.ordinals = {}
+        self.exports = {}
+        self.lock = threading.RLock()
+
+        for entity_id, value in (bookmarks or {}).items():
+            self[entity_id] = value
+
+    @classmethod
+    def from_compact(cls, value):
+        """
+        Load bookmarks from the compact format, raising `ValueError` if
+        they are malformed.
+        """
+        bookmarks = cls()
+        ids = value['ids']
+        start = 0
+
+        for date, count in value['runs']:
+            ordinal = to_ordinal(date)
+
+            for entity_id in ids[start:start + count]:
+                bookmarks.set_ordinal(entity_id, ordinal)
+
+            start = start + count
+
+        if start != len(ids):
+            raise ValueError('Compact bookmarks have {} IDs but runs of {}.'
+                             .format(len(ids), start))
+
+        return bookmarks
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def __iter__(self):
+        return iter(self.ordinals)
+
+    def __contains__(self, entity_id):
+        return entity_id in self.ordinals
+
+    def __getitem__(self, entity_id):
+        return to_date(self.ordinals[entity_id])
+
+    def __setitem__(self, entity_id, value):
+        if value is None:
+            self.pop(entity_id, None)
+            return
+
+        self.set_ordinal(entity_id, to_ordinal(value))
+
+    def __delitem__(self, entity_id):
+        with self.lock:
+            del self.ordinals[entity_id]
+            self.exports = {}
+
+    def set_ordinal(self, entity_id, ordinal):
+        with self.lock:
+            previous = self.ordinals.get(entity_id)
+
+            if previous == ordinal:
+                return
+
+            if previous is None:
+                entity_id = sys.intern(entity_id)
+
+            self.ordinals[entity_id] = ordinal
+            self.exports = {}
+
+    def to_dict(self):
+        with self.lock:
+            exported = self.exports.get('dict')
+
+            if exported is None:
+                exported = self.exports['dict'] = {
+                    entity_id: to_date(ordinal)
+                    for entity_id, ordinal in self.ordinals.items()}
+
+            return exported
+
+    def to_compact(self):
+        with self.lock:
+            exported = self.exports.get('compact')
+
+            if exported is None:
+                exported = self.exports['compact'] = self._build_compact()
+
+            return exported
+
+    def _build_compact(self):
+        groups = collections.defaultdict(list)
+
+        for entity_id, ordinal in self.ordinals.items():
+            groups[ordinal].append(entity_id)
+
+        ids = []
+        runs = []
+
+        # most recent first, since that is where most entities are
+        for ordinal in sorted(groups, reverse=True):
+            ids.extend(groups[ordinal])
+            runs.append([to_date(ordinal), len(groups[ordinal])])
+
+        return {'ids': ids, 'runs': runs}
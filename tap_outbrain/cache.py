@@ -0,0 +1,188 @@
+import datetime
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import singer
+
+logger = singer.get_logger()
+
+# Reporting data keeps changing while conversions are still being
+# attributed to it. Windows that ended at least this many days ago are
+# considered settled, and their responses are cached for good.
+DEFAULT_SETTLE_DAYS = 30
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CachedResponse(object):
+    """
+    Stand-in for a `requests.Response` holding an already read body, so
+    it can be consumed like any other response.
+    """
+
+    status_code = 200
+    from_cache = True
+
+    def __init__(self, content):
+        self.content = content
+        self.raw = io.BytesIO(content)
+        self.raw.decode_content = True
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+    def close(self):
+        self.raw.close()
+
+
+def _normalize(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def cache_key(url, params):
+    normalized = sorted((name, _normalize(value))
+                        for name, value in params.items())
+    payload = json.dumps([url, normalized], separators=(',', ':'))
+
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache(object):
+    """
+    SQLite cache of reporting API response bodies, keyed by URL and
+    normalized params. Only responses for settled date windows are stored,
+    so entries never need to be invalidated; once the cache grows past
+    `max_bytes` the least recently used entries are evicted. With `bypass`
+    the cache is not read from, but is still refreshed.
+    """
+
+    def __init__(self, path, settle_days=DEFAULT_SETTLE_DAYS,
+                 max_bytes=DEFAULT_MAX_BYTES, bypass=False):
+        self.path = os.path.expanduser(path)
+        self.settle_days = settle_days
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.connection = sqlite3.connect(self.path,
+                                          timeout=30,
+                                          check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            '  key TEXT PRIMARY KEY,'
+            '  url TEXT NOT NULL,'
+            '  body BLOB NOT NULL,'
+            '  size INTEGER NOT NULL,'
+            '  created_at REAL NOT NULL,'
+            '  used_at REAL NOT NULL)')
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS responses_used_at '
+            'ON responses (used_at)')
+        self.connection.commit()
+
+    @classmethod
+    def from_config(cls, config):
+        if config.get('response_cache_path') is None:
+            return None
+
+        return cls(
+            config['response_cache_path'],
+            settle_days=config.get('response_cache_settle_days',
+                                   DEFAULT_SETTLE_DAYS),
+            max_bytes=config.get('response_cache_max_bytes',
+                                 DEFAULT_MAX_BYTES),
+            bypass=config.get('response_cache_bypass', False))
+
+    def is_settled(self, to_date):
+        if to_date is None:
+            return False
+
+        if not isinstance(to_date, datetime.date):
+            to_date = datetime.datetime.strptime(str(to_date)[:10],
+                                                 '%Y-%m-%d').date()
+
+        settled_before = datetime.date.today() - datetime.timedelta(
+            days=self.settle_days)
+
+        return to_date < settled_before
+
+    def get(self, url, params):
+        if self.bypass:
+            return None
+
+        key = cache_key(url, params)
+
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT body FROM responses WHERE key = ?',
+                (key,)).fetchone()
+
+            if row is None:
+                self.misses = self.misses + 1
+                return None
+
+            self.hits = self.hits + 1
+            self.connection.execute(
+                'UPDATE responses SET used_at = ? WHERE key = ?',
+                (time.time(), key))
+            self.connection.commit()
+
+        return zlib.decompress(row[0])
+
+    def set(self, url, params, content):
+        body = zlib.compress(content)
+        now = time.time()
+
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(key, url, body, size, created_at, used_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (cache_key(url, params), url, body, len(body), now, now))
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self):
+        total = self.connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+
+        for key, size in self.connection.execute(
+                'SELECT key, size FROM responses ORDER BY used_at').fetchall():
+            if total <= self.max_bytes:
+                break
+
+            self.connection.execute('DELETE FROM responses WHERE key = ?',
+                                    (key,))
+            total = total - size
+            evicted = evicted + 1
+
+        logger.info('Evicted {} cached responses.'.format(evicted))
+
+    def close(self):
+        if self.hits or self.misses:
+            logger.info('Response cache: {} hits, {} misses.'
+                        .format(self.hits, self.misses))
+
+        with self.lock:
+            self.connection.close()
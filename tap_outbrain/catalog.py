@@ -0,0 +1,178 @@
+import collections
+import copy
+import json
+
+import singer
+
+import tap_outbrain.schemas as schemas
+
+logger = singer.get_logger()
+
+STREAMS = collections.OrderedDict([
+    ('campaigns', {
+        'schema': schemas.campaign,
+        'key_properties': ['id'],
+    }),
+    ('campaign_performance', {
+        'schema': schemas.campaign_performance,
+        'key_properties': ['campaignId', 'fromDate'],
+    }),
+    ('links', {
+        'schema': schemas.link,
+        'key_properties': ['id'],
+    }),
+    ('link_performance', {
+        'schema': schemas.link_performance,
+        'key_properties': ['campaignId', 'linkId', 'fromDate'],
+    }),
+    # breakdown reports are only synced when selected in a catalog
+    ('publisher_performance', {
+        'schema': schemas.publisher_performance,
+        'key_properties': ['marketerId', 'publisherId', 'fromDate'],
+        'selected_by_default': False,
+    }),
+    ('section_performance', {
+        'schema': schemas.section_performance,
+        'key_properties': ['marketerId', 'sectionId', 'fromDate'],
+        'selected_by_default': False,
+    }),
+    ('geo_performance', {
+        'schema': schemas.geo_performance,
+        'key_properties': ['marketerId', 'countryCode', 'fromDate'],
+        'selected_by_default': False,
+    }),
+    ('platform_performance', {
+        'schema': schemas.platform_performance,
+        'key_properties': ['marketerId', 'platform', 'fromDate'],
+        'selected_by_default': False,
+    }),
+])
+
+
+def get_metadata(stream_name):
+    stream = STREAMS[stream_name]
+    metadata = [{
+        'breadcrumb': [],
+        'metadata': {
+            'table-key-properties': stream['key_properties'],
+            'selected-by-default': stream.get('selected_by_default', True),
+        },
+    }]
+
+    for name in stream['schema']['properties']:
+        metadata.append({
+            'breadcrumb': ['properties', name],
+            'metadata': {
+                'inclusion': ('automatic'
+                              if name in stream['key_properties']
+                              else 'available'),
+                'selected-by-default': True,
+            },
+        })
+
+    return metadata
+
+
+def discover():
+    """
+    The catalog of every stream this tap can sync, in Singer's format.
+    """
+    return {
+        'streams': [{
+            'stream': stream_name,
+            'tap_stream_id': stream_name,
+            'key_properties': stream['key_properties'],
+            'schema': copy.deepcopy(stream['schema']),
+            'metadata': get_metadata(stream_name),
+        } for stream_name, stream in STREAMS.items()]
+    }
+
+
+def load_catalog(path):
+    with open(path) as catalog_file:
+        catalog = json.load(catalog_file)
+
+    logger.info('Loaded catalog from {}.'.format(path))
+
+    return catalog
+
+
+def _metadata_by_breadcrumb(catalog_stream):
+    return {tuple(entry.get('breadcrumb', [])): entry.get('metadata', {})
+            for entry in catalog_stream.get('metadata', [])}
+
+
+def _is_selected(metadata, schema, default):
+    if 'selected' in metadata:
+        return bool(metadata['selected'])
+
+    # catalogs from before metadata marked selection on the schema
+    if 'selected' in schema:
+        return bool(schema['selected'])
+
+    return metadata.get('selected-by-default', default)
+
+
+def get_selection(catalog=None):
+    """
+    Map every selected stream to the set of its selected fields. Without a
+    catalog, every stream selected by default is, with all of its fields,
+    and fields are mapped to None. Key properties are always selected.
+    """
+    if catalog is None:
+        return collections.OrderedDict(
+            (stream_name, None) for stream_name, stream in STREAMS.items()
+            if stream.get('selected_by_default', True))
+
+    catalog_streams = {
+        catalog_stream.get('tap_stream_id', catalog_stream.get('stream')):
+        catalog_stream
+        for catalog_stream in catalog.get('streams', [])}
+
+    selection = collections.OrderedDict()
+
+    for stream_name, stream in STREAMS.items():
+        catalog_stream = catalog_streams.get(stream_name)
+
+        if catalog_stream is None:
+            continue
+
+        metadata = _metadata_by_breadcrumb(catalog_stream)
+        schema = catalog_stream.get('schema', {})
+
+        if not _is_selected(metadata.get((), {}), schema, False):
+            continue
+
+        fields = set(stream['key_properties'])
+        properties = schema.get('properties', {})
+
+        for name in stream['schema']['properties']:
+            field_metadata = metadata.get(('properties', name), {})
+
+            if field_metadata.get('inclusion') == 'unsupported':
+                continue
+
+            if _is_selected(field_metadata, properties.get(name, {}), True):
+                fields.add(name)
+
+        selection[stream_name] = fields
+
+    logger.info('Selected streams: {}.'.format(', '.join(selection)))
+
+    return selection
+
+
+def prune_schema(schema, fields):
+    """
+    Copy of `schema` with only the top-level properties in `fields`, or all
+    of them if `fields` is None.
+    """
+    if fields is None:
+        return schema
+
+    pruned = dict(schema)
+    pruned['properties'] = collections.OrderedDict(
+        (name, field) for name, field in schema['properties'].items()
+        if name in fields)
+
+    return pruned
@@ -0,0 +1,59 @@
+import hashlib
+import json
+
+# Number of hex digits of the SHA-1 of a record kept in state. 64 bits
+# are plenty to tell two versions of the same entity apart.
+HASH_LENGTH = 16
+
+
+def record_hash(record):
+    payload = json.dumps(record, sort_keys=True, separators=(',', ':'),
+                         default=str)
+
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+
+
+def detect_change(hashes, entity_id, record):
+    """
+    Compare `record` with the hash last seen for `entity_id`. Return its
+    new hash if it is new or changed, or None if it is unchanged.
+    """
+    digest = record_hash(record)
+    previous = hashes.get(entity_id)
+
+    if previous is not None and previous[0] == digest:
+        return None
+
+    return digest
+
+
+def record_change(hashes, entity_id, digest, today):
+    """
+    Remember the hash of a changed record, and the `YYYY-MM-DD` date it
+    changed on. Call this only once the record has been written.
+    """
+    hashes[entity_id] = [digest, today]
+
+
+def get_changed_on(hashes, entity_id):
+    """
+    Date `entity_id` last changed on as a `YYYY-MM-DD` string, or None if
+    it is not tracked.
+    """
+    previous = (hashes or {}).get(entity_id)
+
+    if previous is None:
+        return None
+
+    return previous[1]
+
+
+def prune(hashes, entity_ids):
+    """
+    Forget the hashes of entities that are no longer listed.
+    """
+    entity_ids = set(entity_ids)
+
+    for entity_id in list(hashes):
+        if entity_id not in entity_ids:
+            del hashes[entity_id]
@@ -0,0 +1,337 @@
+import base64
+import threading
+import time
+
+import requests
+import requests.adapters
+import singer
+
+from tap_outbrain.cache import CachedResponse, ResponseCache
+from tap_outbrain.metrics import METRICS
+import tap_outbrain.rate_limit as rate_limit
+from tap_outbrain.retry import RATE_LIMITED, RetryPolicy
+from tap_outbrain.token_cache import TokenCache
+
+logger = singer.get_logger()
+
+BASE_URL = 'https://api.outbrain.com/amplify/v0.1'
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 300
+
+
+def get_token_cache_mode(config):
+    """
+    The file mode of `token_cache_mode`, given as octal digits either in a
+    string or in a JSON number, i.e. "600" or 600.
+    """
+    value = config.get('token_cache_mode', '600')
+
+    try:
+        mode = int(str(value), 8)
+    except ValueError:
+        mode = None
+
+    if mode is None or not 0 <= mode <= 0o777:
+        raise ValueError('token_cache_mode must be octal permission digits, '
+                         'i.e. "600", not {!r}.'.format(value))
+
+    return mode
+
+
+class Credentials(object):
+    """
+    The credentials and access token of a run, shared by the clients of
+    every account it syncs, along with the rate scheduler throttling
+    /login. The login limit applies to the user rather than to an account,
+    so clients must not each log in, and a token one of them refreshes is
+    used by all of them.
+    """
+
+    def __init__(self, access_token=None, username=None, password=None,
+                 token_cache=None, rate_limits=None):
+        self.access_token = access_token
+        self.username = username
+        self.password = password
+        self.token_cache = token_cache
+        self.login_scheduler = rate_limit.RateScheduler(rate_limits)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        token_cache = None
+
+        if config.get('token_cache_path') is not None:
+            token_cache = TokenCache(
+                config['token_cache_path'],
+                mode=get_token_cache_mode(config))
+
+        return cls(
+            access_token=config.get('access_token'),
+            username=config.get('username'),
+            password=config.get('password'),
+            token_cache=token_cache,
+            rate_limits=config.get('rate_limits'))
+
+    def can_generate_token(self):
+        return self.username is not None and self.password is not None
+
+
+class OutbrainClient(object):
+    """
+    Owns everything needed to talk to the Outbrain Amplify API: a pooled
+    keep-alive HTTP session, the rate scheduler and retry policy that every
+    request goes through, and the `Credentials` it shares with the clients
+    of other accounts.
+    """
+
+    def __init__(self, access_token=None, username=None, password=None,
+                 token_cache=None, response_cache=None, rate_limits=None,
+                 retry_policy=None, pool_size=DEFAULT_POOL_SIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT,
+                 base_url=BASE_URL, credentials=None):
+        self.base_url = base_url.rstrip('/')
+        self.credentials = credentials or Credentials(
+            access_token, username, password, token_cache, rate_limits)
+        self.response_cache = response_cache
+        self.rate_scheduler = rate_limit.RateScheduler(rate_limits)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.timeout = (connect_timeout, read_timeout)
+
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+
+    @classmethod
+    def from_config(cls, config, credentials=None):
+        """
+        Build a client from `config`, sharing `credentials` with other
+        clients if given.
+        """
+        return cls(
+            credentials=credentials or Credentials.from_config(config),
+            response_cache=ResponseCache.from_config(config),
+            rate_limits=config.get('rate_limits'),
+            retry_policy=RetryPolicy.from_config(config),
+            pool_size=config.get('http_pool_size', DEFAULT_POOL_SIZE),
+            connect_timeout=config.get('connect_timeout',
+                                       DEFAULT_CONNECT_TIMEOUT),
+            read_timeout=config.get('request_timeout',
+                                    DEFAULT_READ_TIMEOUT),
+            base_url=config.get('base_url', BASE_URL))
+
+    @property
+    def access_token(self):
+        return self.credentials.access_token
+
+    def get_scheduler(self, endpoint_class):
+        if endpoint_class == rate_limit.LOGIN:
+            return self.credentials.login_scheduler
+
+        return self.rate_scheduler
+
+    def _get(self, url, params, endpoint_class, headers, stream=False):
+        retry_state = self.retry_policy.start()
+        rate_scheduler = self.get_scheduler(endpoint_class)
+
+        while True:
+            rate_scheduler.acquire(endpoint_class)
+
+            logger.info("Making request: GET {} {}".format(url, params))
+
+            start = time.time()
+
+            try:
+                response = self.session.get(
+                    url,
+                    headers=headers,
+                    params=params,
+                    timeout=self.timeout,
+                    stream=stream)
+            except requests.exceptions.RequestException as e:
+                METRICS.record_request(endpoint_class, url, None,
+                                       time.time() - start, 0)
+
+                reason, wait = retry_state.next_wait(error=e)
+                if wait is None:
+                    METRICS.record_give_up(endpoint_class, reason)
+                    raise
+
+                logger.warning('Request failed ({}), retrying in {:.1f} sec.'
+                               .format(e, wait))
+            else:
+                logger.info("Got response code: {}"
+                            .format(response.status_code))
+
+                # a streamed body is counted by ResponseItems as it is
+                # read, since a Content-Length is not always sent and the
+                # bytes actually received can differ from it.
+                if stream and response.status_code < 400:
+                    received_bytes = 0
+                else:
+                    received_bytes = len(response.content)
+
+                METRICS.record_request(endpoint_class, url,
+                                       response.status_code,
+                                       time.time() - start, received_bytes)
+
+                rate_scheduler.update_from_headers(endpoint_class,
+                                                   response.headers)
+
+                if response.status_code < 400:
+                    return response
+
+                reason, wait = retry_state.next_wait(response=response)
+                if wait is None:
+                    if reason is not None:
+                        METRICS.record_give_up(endpoint_class, reason)
+
+                    logger.error(response.text)
+                    response.raise_for_status()
+
+                if reason == RATE_LIMITED:
+                    # hold back every other request of this class as well
+                    rate_scheduler.block_for(endpoint_class, wait)
+
+                response.close()
+
+                logger.warning('Got response code {}, retrying in {:.1f} sec.'
+                               .format(response.status_code, wait))
+
+            METRICS.record_retry(endpoint_class, wait, reason)
+            time.sleep(wait)
+
+    def _request(self, url, params, endpoint_class, access_token,
+                 stream=False):
+        return self._get(url, params, endpoint_class,
+                         {'OB-TOKEN-V1': access_token}, stream)
+
+    def request(self, url, params={}, endpoint_class=rate_limit.ENTITY,
+                stream=False):
+        access_token = self.access_token
+
+        try:
+            return self._request(url, params, endpoint_class, access_token,
+                                 stream)
+        except requests.exceptions.HTTPError as e:
+            # the token may have expired or been revoked since it was
+            # cached. get a new one and retry once.
+            if e.response is None or e.response.status_code != 401 or \
+               not self.can_generate_token():
+                raise
+
+            logger.info('Got 401, refreshing the access token and retrying.')
+
+            return self._request(url, params, endpoint_class,
+                                 self.refresh_token(access_token), stream)
+
+    def request_report(self, url, params):
+        """
+        GET a page of a reporting API endpoint. Pages for date windows that
+        have settled are served from, and stored in, the response cache
+        when one is configured; everything else is streamed.
+        """
+        cache = self.response_cache
+
+        if cache is None or not cache.is_settled(params.get('to')):
+            return self.request(url, params,
+                                endpoint_class=rate_limit.REPORTING,
+                                stream=True)
+
+        content = cache.get(url, params)
+
+        if content is not None:
+            logger.info("Using cached response: GET {} {}"
+                        .format(url, params))
+            return CachedResponse(content)
+
+        response = self.request(url, params,
+                                endpoint_class=rate_limit.REPORTING)
+        cache.set(url, params, response.content)
+
+        return CachedResponse(response.content)
+
+    def can_generate_token(self):
+        return self.credentials.can_generate_token()
+
+    def authenticate(self):
+        """
+        Make sure the client has an access token: the one from the config,
+        a cached one that is not about to expire, or a fresh one from
+        /login.
+        """
+        credentials = self.credentials
+
+        with credentials.lock:
+            if credentials.access_token is not None:
+                return credentials.access_token
+
+            if credentials.token_cache is not None and \
+               credentials.username is not None:
+                credentials.access_token = credentials.token_cache.get(
+                    credentials.username)
+
+            if credentials.access_token is None:
+                self.generate_token()
+
+            return credentials.access_token
+
+    def refresh_token(self, rejected_token=None):
+        """
+        Replace `rejected_token` with a new access token and return it. If
+        another client already has replaced it, its token is used instead
+        of logging in again.
+        """
+        credentials = self.credentials
+
+        with credentials.lock:
+            if credentials.access_token is not None and \
+               credentials.access_token != rejected_token:
+                return credentials.access_token
+
+            if credentials.token_cache is not None:
+                credentials.token_cache.invalidate(credentials.username)
+
+            credentials.access_token = None
+
+            return self.generate_token()
+
+    def generate_token(self):
+        credentials = self.credentials
+
+        logger.info("Generating new token using basic auth.")
+
+        encoded = base64.b64encode(bytes('{}:{}'.format(credentials.username,
+                                                        credentials.password),
+                                         'utf-8')) \
+                        .decode('utf-8')
+
+        response = self._get('{}/login'.format(self.base_url),
+                             None,
+                             rate_limit.LOGIN,
+                             {'Authorization': 'Basic {}'.format(encoded)})
+
+        credentials.access_token = response.json().get('OB-TOKEN-V1')
+
+        if credentials.token_cache is not None and \
+           credentials.access_token is not None:
+            credentials.token_cache.set(credentials.username,
+                                        credentials.access_token)
+
+        return credentials.access_token
+
+    def close(self):
+        if self.response_cache is not None:
+            self.response_cache.close()
+
+        self.session.close()
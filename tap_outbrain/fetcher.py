@@ -0,0 +1,116 @@
+import asyncio
+import concurrent.futures
+
+import singer
+
+import tap_outbrain.rate_limit as rate_limit
+
+logger = singer.get_logger()
+
+# Entity endpoints are not rate limited like reporting, so they can be
+# fetched in parallel. Reporting and login stay serialized, and still go
+# through the client's rate scheduler.
+DEFAULT_CONCURRENCY = {
+    rate_limit.ENTITY: 8,
+    rate_limit.REPORTING: 1,
+    rate_limit.LOGIN: 1,
+}
+
+
+class AsyncFetcher(object):
+    """
+    asyncio engine that issues many GETs through an `OutbrainClient` at
+    once, with a bounded number of requests in flight per endpoint class.
+    Requests run on the client's pooled session in worker threads, and
+    results are always returned in the order they were asked for, so the
+    Singer messages written from them are deterministic.
+    """
+
+    def __init__(self, client, concurrency=None):
+        self.client = client
+        self.concurrency = dict(DEFAULT_CONCURRENCY)
+        self.concurrency.update(concurrency or {})
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(self.concurrency.values()))
+
+    @classmethod
+    def from_config(cls, client, config):
+        if not config.get('async_fetching', False):
+            return None
+
+        return cls(client, config.get('max_concurrency'))
+
+    def _run(self, coroutine):
+        loop = asyncio.new_event_loop()
+
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    async def _get(self, loop, semaphores, url, params, endpoint_class):
+        semaphore = semaphores.setdefault(
+            endpoint_class,
+            asyncio.Semaphore(self.concurrency.get(endpoint_class, 1)))
+
+        async with semaphore:
+            return await loop.run_in_executor(
+                self.executor,
+                self.client.request, url, params, endpoint_class)
+
+    async def _get_all(self, requests):
+        loop = asyncio.get_event_loop()
+        semaphores = {}
+
+        return await asyncio.gather(*[
+            self._get(loop, semaphores, url, params, endpoint_class)
+            for url, params, endpoint_class in requests])
+
+    def get_all(self, requests):
+        """
+        Fetch every `(url, params, endpoint_class)` in `requests`
+        concurrently and return the responses in the same order.
+        """
+        return self._run(self._get_all(requests))
+
+    def get_all_pages(self, urls, results_key, limit=100, params=None,
+                      endpoint_class=rate_limit.ENTITY):
+        """
+        Fetch every page of each offset-paginated endpoint in `urls`. The
+        first page of every URL is fetched concurrently, then all of the
+        remaining pages (known from `totalCount`) are. Returns, for each
+        URL in order, the list of results of each of its pages in order.
+        """
+        def page_request(url, offset):
+            page_params = dict(params or {})
+            page_params.update({'limit': limit, 'offset': offset})
+            return (url, page_params, endpoint_class)
+
+        first_pages = self.get_all([page_request(url, 0) for url in urls])
+
+        pages = []
+        remaining = []
+
+        for index, (url, response) in enumerate(zip(urls, first_pages)):
+            body = response.json()
+            results = body.get(results_key) or []
+            pages.append([results])
+
+            total_count = body.get('totalCount') or 0
+
+            for offset in range(len(results), total_count, limit):
+                remaining.append((index, page_request(url, offset)))
+
+        if remaining:
+            logger.info('Fetching {} more pages for {} endpoints.'
+                        .format(len(remaining), len(urls)))
+
+            responses = self.get_all([request for _, request in remaining])
+
+            for (index, _), response in zip(remaining, responses):
+                pages[index].append(response.json().get(results_key) or [])
+
+        return pages
+
+    def close(self):
+        self.executor.shutdown()
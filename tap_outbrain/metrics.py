@@ -0,0 +1,225 @@
+import collections
+import contextlib
+import json
+import threading
+import time
+
+import singer
+
+logger = singer.get_logger()
+
+# Upper bounds, in seconds, of the HTTP latency histogram buckets. The last
+# bucket holds everything slower.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def log_metric(metric_type, metric, value, tags=None):
+    """
+    Log a metric the way singer-python's `singer.metrics` does, as a
+    `METRIC: {...}` line on stderr.
+    """
+    logger.info('METRIC: {}'.format(json.dumps({
+        'type': metric_type,
+        'metric': metric,
+        'value': value,
+        'tags': tags or {},
+    })))
+
+
+def _request_stats():
+    return {
+        'requests': 0,
+        'errors': 0,
+        'seconds': 0.0,
+        'max_seconds': 0.0,
+        'bytes': 0,
+        'status_codes': collections.Counter(),
+        'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+        'retries': 0,
+        'retry_reasons': collections.Counter(),
+        'retry_wait_seconds': 0.0,
+        'give_ups': collections.Counter(),
+        'throttled': 0,
+        'throttle_seconds': 0.0,
+    }
+
+
+def _stream_stats():
+    return {
+        'records': 0,
+        'seconds': 0.0,
+        'parse_seconds': 0.0,
+        'write_seconds': 0.0,
+    }
+
+
+class Metrics(object):
+    """
+    Run-wide instrumentation: HTTP latency histograms, bytes received,
+    retries and rate-limit sleeps per endpoint class, and record counts,
+    wall-clock, parse and write time per stream. Individual requests and
+    sync stages are logged as Singer METRIC lines as they happen; `summary`
+    rolls everything up for the end of the run.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.requests = collections.defaultdict(_request_stats)
+        self.streams = collections.defaultdict(_stream_stats)
+        self.bytes_received = 0
+
+    def record_request(self, endpoint_class, url, status_code, seconds,
+                       received_bytes):
+        bucket = len(LATENCY_BUCKETS)
+        for i, upper_bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= upper_bound:
+                bucket = i
+                break
+
+        with self.lock:
+            stats = self.requests[endpoint_class]
+            stats['requests'] += 1
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['bytes'] += received_bytes
+            stats['status_codes'][str(status_code)] += 1
+            stats['latency_buckets'][bucket] += 1
+
+            if status_code is None or status_code >= 400:
+                stats['errors'] += 1
+
+            self.bytes_received += received_bytes
+
+        log_metric('timer', 'http_request_duration', seconds, {
+            'endpoint': url,
+            'endpoint_class': endpoint_class,
+            'http_status_code': status_code,
+            'status': 'failed' if status_code is None or
+                      status_code >= 400 else 'succeeded',
+        })
+
+    def add_bytes(self, endpoint_class, received_bytes):
+        with self.lock:
+            self.requests[endpoint_class]['bytes'] += received_bytes
+            self.bytes_received += received_bytes
+
+    def record_retry(self, endpoint_class, wait, reason):
+        with self.lock:
+            stats = self.requests[endpoint_class]
+            stats['retries'] += 1
+            stats['retry_reasons'][reason] += 1
+            stats['retry_wait_seconds'] += wait
+
+    def record_give_up(self, endpoint_class, reason):
+        with self.lock:
+            self.requests[endpoint_class]['give_ups'][reason] += 1
+
+    def record_throttle(self, endpoint_class, seconds):
+        with self.lock:
+            stats = self.requests[endpoint_class]
+            stats['throttled'] += 1
+            stats['throttle_seconds'] += seconds
+
+    def request_count(self, endpoint_class):
+        with self.lock:
+            stats = self.requests.get(endpoint_class)
+            return stats['requests'] if stats else 0
+
+    def add_parse_time(self, stream_name, seconds):
+        with self.lock:
+            self.streams[stream_name]['parse_seconds'] += seconds
+
+    def add_writes(self, stream_name, records, seconds):
+        with self.lock:
+            stats = self.streams[stream_name]
+            stats['records'] += records
+            stats['write_seconds'] += seconds
+
+    @contextlib.contextmanager
+    def stage(self, stream_name, **tags):
+        """
+        Time a sync stage of `stream_name`, adding to its wall-clock.
+        """
+        start = time.time()
+
+        try:
+            yield
+        finally:
+            seconds = time.time() - start
+
+            with self.lock:
+                self.streams[stream_name]['seconds'] += seconds
+
+            tags['stream'] = stream_name
+            log_metric('timer', 'sync_stage_duration', seconds, tags)
+
+    def timed(self, iterable, stream_name):
+        """
+        Wrap an iterator of parsed records, adding the time spent producing
+        them (parsing, including reading a streamed body) to
+        `stream_name`'s parse time.
+        """
+        seconds = 0.0
+        iterator = iter(iterable)
+
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    seconds += time.perf_counter() - start
+
+                yield item
+        finally:
+            self.add_parse_time(stream_name, seconds)
+
+    def summary(self):
+        with self.lock:
+            elapsed = time.time() - self.started_at
+
+            requests = {}
+            for endpoint_class, stats in self.requests.items():
+                stats = dict(stats)
+                for name in ('status_codes', 'retry_reasons', 'give_ups'):
+                    stats[name] = dict(stats[name])
+                labels = ['<={}s'.format(upper_bound)
+                          for upper_bound in LATENCY_BUCKETS]
+                labels.append('>{}s'.format(LATENCY_BUCKETS[-1]))
+                stats['latency_buckets'] = collections.OrderedDict(
+                    zip(labels, stats['latency_buckets']))
+                requests[endpoint_class] = stats
+
+            streams = {}
+            for stream_name, stats in self.streams.items():
+                stats = dict(stats)
+                stats['records_per_second'] = (
+                    stats['records'] / stats['seconds']
+                    if stats['seconds'] > 0 else None)
+                streams[stream_name] = stats
+
+            return {
+                'elapsed_seconds': elapsed,
+                'bytes_received': self.bytes_received,
+                'requests': requests,
+                'streams': streams,
+            }
+
+    def log_summary(self, path=None):
+        summary = self.summary()
+
+        for stream_name, stats in sorted(summary['streams'].items()):
+            log_metric('counter', 'record_count', stats['records'],
+                       {'stream': stream_name})
+
+        logger.info('Run summary: {}'.format(json.dumps(summary)))
+
+        if path is not None:
+            with open(path, 'w') as summary_file:
+                json.dump(summary, summary_file, indent=2)
+
+
+METRICS = Metrics()
@@ -0,0 +1,175 @@
+import collections
+import math
+
+import tap_outbrain.rate_limit as rate_limit
+
+DEFAULT_TOP = 10
+
+
+def get_page_count(window, rows_per_day, page_limit):
+    """
+    Pages a report of one entity takes for `window` at `rows_per_day`.
+    """
+    days = (window[1] - window[0]).days + 1
+    return max(1, int(math.ceil(days * rows_per_day / page_limit)))
+
+
+def get_reporting_limit(config):
+    limits = dict(rate_limit.DEFAULT_RATE_LIMITS)
+    limits.update(config.get('rate_limits') or {})
+    return limits.get(rate_limit.REPORTING)
+
+
+def estimate_seconds(requests, limit):
+    """
+    Seconds the token bucket of `limit` takes to let `requests` through,
+    not counting the time the requests themselves take.
+    """
+    if limit is None or requests <= 0:
+        return 0.0
+
+    burst = limit.get('burst', 1)
+
+    return max(0, requests - burst) * float(limit['period']) / \
+        limit['calls']
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+
+    if days:
+        return '{}d {}h {}m'.format(days, hours, minutes)
+    if hours:
+        return '{}h {}m'.format(hours, minutes)
+    if minutes:
+        return '{}m {}s'.format(minutes, seconds)
+    return '{}s'.format(seconds)
+
+
+class Plan(object):
+    """
+    The reporting requests a sync would make, counted per stream, per
+    account and per entity (or group of entities pulled together), along
+    with the entity requests made to plan them.
+    """
+
+    def __init__(self):
+        self.requests = collections.Counter()
+        self.windows = collections.Counter()
+        self.entities = collections.Counter()
+        self.accounts = collections.Counter()
+        self.costs = collections.Counter()
+        self.spans = {}
+        self.entity_requests = 0
+
+    def add(self, account_id, stream_name, entity_id, planned, requests,
+            entity_count=1):
+        """
+        Count the `requests` it takes to sync `entity_id`'s `planned`
+        windows of `stream_name`. `entity_id` may stand for a group of
+        `entity_count` entities pulled together.
+        """
+        if not planned:
+            return
+
+        self.requests[stream_name] += requests
+        self.windows[stream_name] += len(planned)
+        self.entities[stream_name] += entity_count
+        self.accounts[account_id] += requests
+
+        key = (account_id, stream_name, entity_id)
+        self.costs[key] += requests
+        self.spans[key] = (planned[0][0], planned[-1][1])
+
+    def estimate_seconds(self, limit, max_parallel_accounts=1):
+        """
+        Wall-clock under the reporting rate `limit`. Every account has its
+        own quota, and up to `max_parallel_accounts` are synced at once.
+        """
+        workers = [0.0] * max(1, max_parallel_accounts)
+
+        # longest accounts first, each to the least busy worker
+        for requests in sorted(self.accounts.values(), reverse=True):
+            workers[workers.index(min(workers))] += \
+                estimate_seconds(requests, limit)
+
+        return max(workers)
+
+    def report(self, config, max_parallel_accounts=1, top=DEFAULT_TOP):
+        limit = get_reporting_limit(config)
+        lines = []
+
+        lines.append('{:<24}{:>12}{:>12}{:>12}'.format(
+            'stream', 'requests', 'windows', 'entities'))
+
+        for stream_name, requests in sorted(self.requests.items()):
+            lines.append('{:<24}{:>12}{:>12}{:>12}'.format(
+                stream_name, requests, self.windows[stream_name],
+                self.entities[stream_name]))
+
+        total = sum(self.requests.values())
+        lines.append('{:<24}{:>12}'.format('total', total))
+        lines.append('')
+
+        if limit is None:
+            lines.append('Reporting requests are not rate limited.')
+        else:
+            lines.append(
+                'Estimated duration: {} at {} reporting requests per {} '
+                'sec, {} account(s) at a time.'.format(
+                    format_duration(self.estimate_seconds(
+                        limit, max_parallel_accounts)),
+                    limit['calls'], limit['period'],
+                    max_parallel_accounts))
+
+        request_budget = config.get('run_request_budget')
+        time_budget = config.get('run_time_budget')
+        budgets = []
+
+        if request_budget:
+            budgets.append('{} reporting requests'.format(request_budget))
+        if time_budget:
+            budgets.append(format_duration(time_budget))
+
+        if budgets:
+            lines.append('Runs are budgeted to {}, so about {} run(s) are '
+                         'needed.'.format(' or '.join(budgets),
+                                          self.estimate_runs(
+                                              limit, request_budget,
+                                              time_budget)))
+
+        lines.append('Made {} entity requests to plan this.'
+                     .format(self.entity_requests))
+
+        if self.costs:
+            lines.append('')
+            lines.append('Top cost drivers:')
+
+            for (account_id, stream_name, entity_id), requests in \
+                    self.costs.most_common(top):
+                from_date, to_date = self.spans[
+                    (account_id, stream_name, entity_id)]
+                lines.append('  {:<12} {:<22} {:<34} {:>6} requests, '
+                             '{} to {}'.format(
+                                 account_id, stream_name, entity_id,
+                                 requests, from_date, to_date))
+
+        return '\n'.join(lines) + '\n'
+
+    def estimate_runs(self, limit, request_budget=None, time_budget=None):
+        per_run = []
+
+        if request_budget:
+            per_run.append(request_budget)
+
+        if time_budget and limit is not None:
+            per_run.append(max(1, int(time_budget * limit['calls'] /
+                                      float(limit['period']))))
+
+        if not per_run:
+            return 1
+
+        total = sum(self.requests.values())
+        return max(1, int(math.ceil(float(total) / min(per_run))))
@@ -0,0 +1,193 @@
+import threading
+import time
+
+import singer
+
+from tap_outbrain.metrics import METRICS
+
+logger = singer.get_logger()
+
+REPORTING = 'reporting'
+ENTITY = 'entity'
+LOGIN = 'login'
+
+# Outbrain documents the reporting API at about 2 requests per minute and
+# the /login endpoint at 2 requests per hour. Entity endpoints are not
+# limited in the same way, so they are not throttled unless configured.
+DEFAULT_RATE_LIMITS = {
+    REPORTING: {'calls': 2, 'period': 60},
+    LOGIN: {'calls': 2, 'period': 3600},
+    ENTITY: None,
+}
+
+# Header names Outbrain (and the load balancers in front of it) use to
+# advertise the remaining quota.
+CALLS_LEFT_HEADERS = ('rate-limit-calls-left', 'x-ratelimit-remaining')
+MSEC_LEFT_HEADERS = ('rate-limit-msec-left',)
+RESET_HEADERS = ('x-ratelimit-reset',)
+
+
+class TokenBucket(object):
+    """
+    A token bucket allowing `calls` requests per `period` seconds, with
+    bursts of at most `burst` requests.
+    """
+
+    def __init__(self, calls, period, burst=1):
+        self.rate = float(calls) / period
+        self.capacity = float(burst)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        # time before which no request may be made, as advertised by the API
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def reserve(self):
+        """
+        Take a token and return the number of seconds to wait before using
+        it. Reserving ahead of time keeps concurrent callers in order.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+
+        wait = 0.0
+        if self.tokens < 0:
+            wait = -self.tokens / self.rate
+
+        return max(wait, self.blocked_until - now)
+
+    def block_for(self, seconds):
+        self.blocked_until = max(self.blocked_until,
+                                 time.monotonic() + seconds)
+
+    def drain(self):
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 0.0)
+
+
+class RateScheduler(object):
+    """
+    Shared throttle for every call made to the Outbrain API. Requests are
+    grouped by endpoint class (reporting, entity, login) and each class has
+    its own token bucket. Wait-time statistics are kept per class so a run
+    can report how much of its wall-clock was spent throttled.
+    """
+
+    def __init__(self, rate_limits=None):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.stats = {}
+
+        limits = dict(DEFAULT_RATE_LIMITS)
+        limits.update(rate_limits or {})
+
+        for endpoint_class, limit in limits.items():
+            if limit is not None:
+                self.buckets[endpoint_class] = TokenBucket(
+                    limit['calls'],
+                    limit['period'],
+                    limit.get('burst', 1))
+
+    def _stats_for(self, endpoint_class):
+        return self.stats.setdefault(endpoint_class, {
+            'requests': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+        })
+
+    def acquire(self, endpoint_class):
+        with self.lock:
+            stats = self._stats_for(endpoint_class)
+            stats['requests'] += 1
+
+            bucket = self.buckets.get(endpoint_class)
+            if bucket is None:
+                return 0.0
+
+            wait = bucket.reserve()
+            if wait > 0:
+                stats['waits'] += 1
+                stats['wait_seconds'] += wait
+                stats['max_wait_seconds'] = max(stats['max_wait_seconds'],
+                                                wait)
+
+        if wait > 0:
+            METRICS.record_throttle(endpoint_class, wait)
+            logger.info(
+                'Rate limiting {} requests. Sleeping {:.1f} sec before '
+                'making the next request.'.format(endpoint_class, wait))
+            time.sleep(wait)
+
+        return wait
+
+    def block_for(self, endpoint_class, seconds):
+        """
+        Hold back every request of `endpoint_class` for `seconds`, i.e. as
+        asked to by a 429.
+        """
+        bucket = self.buckets.get(endpoint_class)
+        if bucket is None:
+            return
+
+        with self.lock:
+            bucket.drain()
+            bucket.block_for(seconds)
+
+    def update_from_headers(self, endpoint_class, headers):
+        """
+        Tighten the bucket for `endpoint_class` using the rate-limit headers
+        returned by the API, if any.
+        """
+        bucket = self.buckets.get(endpoint_class)
+        if bucket is None or headers is None:
+            return
+
+        calls_left = _header_number(headers, CALLS_LEFT_HEADERS)
+        msec_left = _header_number(headers, MSEC_LEFT_HEADERS)
+        reset = _header_number(headers, RESET_HEADERS)
+
+        with self.lock:
+            if calls_left is not None and calls_left <= 0:
+                bucket.drain()
+
+                if msec_left is not None:
+                    bucket.block_for(msec_left / 1000.0)
+                elif reset is not None:
+                    # either an epoch timestamp or a delay in seconds
+                    if reset > time.time():
+                        reset = reset - time.time()
+                    bucket.block_for(reset)
+
+    def summary(self):
+        with self.lock:
+            return {endpoint_class: dict(stats)
+                    for endpoint_class, stats in self.stats.items()}
+
+    def log_summary(self):
+        for endpoint_class, stats in sorted(self.summary().items()):
+            logger.info(
+                'Made {} {} requests, throttled {} times for {:.1f} sec '
+                '(longest wait {:.1f} sec).'
+                .format(stats['requests'],
+                        endpoint_class,
+                        stats['waits'],
+                        stats['wait_seconds'],
+                        stats['max_wait_seconds']))
+
+
+def _header_number(headers, names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+
+    return None
@@ -0,0 +1,200 @@
+import collections
+import datetime
+import email.utils
+import random
+import threading
+import time
+
+import requests
+import singer
+import urllib3
+
+logger = singer.get_logger()
+
+DEFAULT_MAX_TRIES = 5
+# Give up retrying a request once this many seconds have passed since its
+# first attempt.
+DEFAULT_TIME_BUDGET = 900
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 120.0
+
+RATE_LIMITED = 'rate_limited'
+SERVER_ERROR = 'server_error'
+CONNECTION_RESET = 'connection_reset'
+TIMEOUT = 'timeout'
+
+
+def parse_retry_after(headers):
+    """
+    Seconds to wait according to a `Retry-After` header, given either as a
+    number of seconds or as an HTTP date, or None.
+    """
+    value = (headers or {}).get('Retry-After')
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at is None:
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+def classify(response=None, error=None):
+    """
+    Reason a failed GET is worth retrying, or None if it is not.
+    """
+    if error is not None:
+        # a connect timeout is both a timeout and a connection error.
+        # urllib3 errors are raised as such when a body is read raw.
+        if isinstance(error, (requests.exceptions.Timeout,
+                              urllib3.exceptions.TimeoutError)):
+            return TIMEOUT
+        if isinstance(error, (requests.exceptions.ConnectionError,
+                              requests.exceptions.ChunkedEncodingError,
+                              urllib3.exceptions.ProtocolError)):
+            return CONNECTION_RESET
+        return None
+
+    if response.status_code == 429:
+        return RATE_LIMITED
+    if response.status_code >= 500:
+        return SERVER_ERROR
+
+    return None
+
+
+class RetryPolicy(object):
+    """
+    Decides whether, and after how long, a failed GET is retried:
+
+    - 429s wait as long as `Retry-After` says, falling back to backoff.
+    - 5xx responses and timeouts back off exponentially from `base_delay`
+      up to `max_delay`, with jitter so concurrent requests spread out.
+    - Connection resets are retried immediately once, then back off.
+
+    Anything else is not retried. A request gives up after `max_tries`
+    attempts, or once waiting again would take it past `time_budget`
+    seconds since its first attempt. Retries and give-ups are counted by
+    reason.
+    """
+
+    def __init__(self, max_tries=DEFAULT_MAX_TRIES,
+                 time_budget=DEFAULT_TIME_BUDGET,
+                 base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                 rng=None):
+        self.max_tries = max_tries
+        self.time_budget = time_budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+        self.lock = threading.Lock()
+        self.retries = collections.Counter()
+        self.retry_seconds = collections.Counter()
+        self.give_ups = collections.Counter()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_tries=config.get('retry_max_tries', DEFAULT_MAX_TRIES),
+            time_budget=config.get('retry_time_budget', DEFAULT_TIME_BUDGET),
+            base_delay=config.get('retry_base_delay', DEFAULT_BASE_DELAY),
+            max_delay=config.get('retry_max_delay', DEFAULT_MAX_DELAY))
+
+    def backoff(self, tries):
+        """
+        Exponential backoff for the `tries`th failed attempt, jittered
+        between half and all of the delay.
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** (tries - 1))
+
+        with self.lock:
+            return delay / 2 + self.rng.uniform(0, delay / 2)
+
+    def get_wait(self, reason, tries, response=None):
+        if reason == RATE_LIMITED:
+            retry_after = parse_retry_after(response.headers)
+            if retry_after is not None:
+                return retry_after
+
+        if reason == CONNECTION_RESET and tries == 1:
+            return 0.0
+
+        return self.backoff(tries)
+
+    def start(self):
+        return RetryState(self)
+
+    def summary(self):
+        with self.lock:
+            return {
+                'retries': dict(self.retries),
+                'retry_seconds': dict(self.retry_seconds),
+                'give_ups': dict(self.give_ups),
+            }
+
+    def log_summary(self):
+        summary = self.summary()
+
+        for reason, count in sorted(summary['retries'].items()):
+            logger.info('Retried {} requests {} times, waiting {:.1f} sec.'
+                        .format(reason, count,
+                                summary['retry_seconds'][reason]))
+
+        for reason, count in sorted(summary['give_ups'].items()):
+            logger.info('Gave up on {} {} requests.'.format(count, reason))
+
+
+class RetryState(object):
+    """
+    Tracks the attempts made for one request under a `RetryPolicy`.
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.tries = 0
+        self.started_at = time.monotonic()
+
+    def next_wait(self, response=None, error=None):
+        """
+        Record a failed attempt, and return `(reason, seconds)` to wait
+        before the next one, or `(reason, None)` to give up.
+        """
+        policy = self.policy
+        reason = classify(response, error)
+        self.tries = self.tries + 1
+
+        if reason is None:
+            return None, None
+
+        if self.tries >= policy.max_tries:
+            wait = None
+        else:
+            wait = policy.get_wait(reason, self.tries, response)
+            elapsed = time.monotonic() - self.started_at
+
+            if elapsed + wait > policy.time_budget:
+                wait = None
+
+        with policy.lock:
+            if wait is None:
+                policy.give_ups[reason] += 1
+            else:
+                policy.retries[reason] += 1
+                policy.retry_seconds[reason] += wait
+
+        return reason, wait
@@ -0,0 +1,110 @@
+import heapq
+import itertools
+import threading
+import time
+
+import singer
+
+import tap_outbrain.rate_limit as rate_limit
+from tap_outbrain.metrics import METRICS
+
+logger = singer.get_logger()
+
+# Campaign tiers, most valuable first.
+ON_AIR = 0
+ENABLED = 1
+INACTIVE = 2
+
+
+def get_tier(campaign):
+    if campaign.get('campaignOnAir'):
+        return ON_AIR
+
+    if campaign.get('enabled'):
+        return ENABLED
+
+    return INACTIVE
+
+
+def get_spend(campaign):
+    return float((campaign.get('budget') or {}).get('amountSpent') or 0)
+
+
+def get_priority(campaign, bookmark):
+    """
+    What a campaign's performance is worth syncing, as far as it does not
+    depend on the window: its tier, its budget spend, and its bookmark,
+    where an older (or no) bookmark is staler.
+    """
+    return get_tier(campaign), get_spend(campaign), bookmark or ''
+
+
+class WorkQueue(object):
+    """
+    Queue of `(entity, window)` tasks, ordered by the entity's tier, then
+    by the window's recency, the entity's spend, and the staleness of its
+    bookmark. An entity's windows must be synced in order, since its
+    bookmark only moves forward, so only its next window is queued at a
+    time: an entity that is caught up but for its latest window goes
+    ahead of one backfilling months ago.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, entity_id, window, offset, priority):
+        tier, spend, bookmark = priority
+        key = (tier, -window[1].toordinal(), -spend, bookmark)
+
+        heapq.heappush(self.heap, (key, next(self.counter), entity_id,
+                                   window, offset, priority))
+
+    def pop(self):
+        """
+        Return the most valuable task, as `(entity_id, window, offset,
+        priority)`.
+        """
+        return heapq.heappop(self.heap)[2:]
+
+
+class RunBudget(object):
+    """
+    Limits how many seconds a run may take and how many reporting requests
+    it may make. Once either is used up, no new window is started, and
+    whatever was not synced is left for the next run.
+    """
+
+    def __init__(self, seconds=None, requests=None):
+        self.seconds = seconds
+        self.requests = requests
+        self.lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.start_requests = METRICS.request_count(rate_limit.REPORTING)
+        self.reported = False
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(seconds=config.get('run_time_budget'),
+                   requests=config.get('run_request_budget'))
+
+    def exhausted(self):
+        elapsed = time.monotonic() - self.started_at
+        requests = METRICS.request_count(rate_limit.REPORTING) - \
+            self.start_requests
+
+        if (self.seconds is None or elapsed < self.seconds) and \
+           (self.requests is None or requests < self.requests):
+            return False
+
+        with self.lock:
+            if not self.reported:
+                logger.info('Run budget used up after {:.1f} sec and {} '
+                            'reporting requests, leaving the rest for the '
+                            'next run.'.format(elapsed, requests))
+                self.reported = True
+
+        return True
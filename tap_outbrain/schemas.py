@@ -336,3 +336,79 @@ link_performance = {
         }
     }
 }
+
+
+def breakdown_performance(dimensions):
+    """
+    Schema of a marketer-level performance breakdown: the marketer and the
+    `dimensions` properties identifying a row, plus the date and metrics of
+    `campaign_performance`.
+    """
+    properties = {
+        'marketerId': {
+            'type': 'string',
+            'description': 'The ID of the marketer (account) of the report.'
+        }
+    }
+    properties.update(dimensions)
+    properties.update(
+        (name, field)
+        for name, field in campaign_performance['properties'].items()
+        if name != 'campaignId')
+
+    return {
+        'type': 'object',
+        'properties': properties
+    }
+
+
+publisher_performance = breakdown_performance({
+    'publisherId': {
+        'type': 'string',
+        'description': 'The ID of the publisher the ads were shown on.'
+    },
+    'publisherName': {
+        'type': 'string',
+        'description': 'The name of the publisher, i.e. "cnn.com"'
+    }
+})
+
+section_performance = breakdown_performance({
+    'sectionId': {
+        'type': 'string',
+        'description': ('The ID of the publisher section the ads were '
+                        'shown on.')
+    },
+    'sectionName': {
+        'type': 'string',
+        'description': 'The name of the section, i.e. "Sports"'
+    },
+    'publisherId': {
+        'type': 'string',
+        'description': 'The ID of the publisher the section belongs to.'
+    },
+    'publisherName': {
+        'type': 'string',
+        'description': 'The name of the publisher, i.e. "cnn.com"'
+    }
+})
+
+geo_performance = breakdown_performance({
+    'countryCode': {
+        'type': 'string',
+        'description': ('The 2-letter code of the country the ads were '
+                        'shown in, i.e. "US"')
+    },
+    'countryName': {
+        'type': 'string',
+        'description': 'The name of the country, i.e. "United States"'
+    }
+})
+
+platform_performance = breakdown_performance({
+    'platform': {
+        'type': 'string',
+        'description': ('The platform the ads were shown on, i.e. '
+                        '"DESKTOP", "MOBILE" or "TABLET"')
+    }
+})
@@ -0,0 +1,433 @@
+import copy
+import datetime
+import json
+import uuid
+
+import singer
+
+from tap_outbrain.bookmarks import BookmarkMap, is_compact
+
+logger = singer.get_logger()
+
+# Version of the state layout written by this tap. Bump it, and add an
+# upgrade step to UPGRADES, whenever the layout changes.
+STATE_VERSION = 5
+
+# Latest version whose bookmark maps are all plain dicts. State exported in
+# the legacy format is written as this version, so older versions of this
+# tap can still read it.
+LEGACY_STATE_VERSION = 4
+
+# Identifies this run in the checkpoints it starts, so that a later run can
+# tell it is resuming one.
+RUN_ID = uuid.uuid4().hex
+
+# the tables bookmarked before breakdown reports were added
+LEGACY_BOOKMARK_TABLES = ('campaign_performance', 'link_performance')
+
+BOOKMARK_TABLES = LEGACY_BOOKMARK_TABLES + (
+    'publisher_performance', 'section_performance', 'geo_performance',
+    'platform_performance')
+
+# Bookmarks are namespaced by Outbrain marketer ID, i.e.
+#
+#   state['accounts'][account_id]['campaign_performance'][campaign_id]
+#
+# Breakdown reports cover every campaign at once, so their tables hold a
+# single bookmark under '*':
+#
+#   state['accounts'][account_id]['geo_performance']['*']
+#
+# In memory, each table's bookmarks are a `BookmarkMap`. From version 5,
+# they may be exported in its compact format rather than as a plain dict.
+#
+# Each account also keeps a checkpoint per bookmarked table, so a run that
+# dies part way through can be resumed where it left off:
+#
+#   state['accounts'][account_id]['checkpoints']['campaign_performance'] = {
+#       # the run that started the checkpoint
+#       'run': '9f2c41d07e6b4a4e8d0b5c3e1a7f6d2b',
+#       # the window being synced when the run died, and the offset of
+#       # the first page not yet emitted
+#       'current': {'id': '00f4b1...', 'from': '2016-08-01',
+#                   'to': '2016-11-08', 'offset': 200},
+#       # the first window not yet synced of entities synced part way,
+#       # since campaigns are synced a window at a time in priority order
+#       'pending': {'00f4b2...': '2016-11-09', ...},
+#   }
+#
+# The entities the interrupted run finished are not listed: a run resuming
+# a checkpoint started by another run skips every entity whose bookmark
+# has reached today and that has no window left part way. Those of an
+# earlier day's run, i.e. one that used up its budget, have a new day to
+# sync. A table's checkpoint is cleared once every entity has been synced.
+#
+# With incremental entities, each account also keeps a short hash of every
+# campaign and link last emitted, and the date it last changed on:
+#
+#   state['accounts'][account_id]['entities']['campaigns'][campaign_id] = \
+#       ['3f2a9c0d1b7e4a55', '2017-03-16']
+DEFAULT_STATE = {
+    'version': STATE_VERSION,
+    'accounts': {}
+}
+
+
+def upgrade_v0(state, account_id):
+    # Unversioned state files only ever held the two bookmark maps, but
+    # some runners wrap them in the Singer `bookmarks` key.
+    upgraded = copy.deepcopy(state.get('bookmarks', state))
+    upgraded['version'] = 1
+    return upgraded
+
+
+def upgrade_v1(state, account_id):
+    # Version 1 held the bookmark maps of a single account at the top
+    # level. They belong to the account the tap is configured with.
+    if account_id is None:
+        raise ValueError('Cannot upgrade state from version 1 without '
+                         'knowing which account it belongs to.')
+
+    upgraded = {key: copy.deepcopy(value) for key, value in state.items()
+                if key not in LEGACY_BOOKMARK_TABLES}
+    upgraded['version'] = 2
+    upgraded['accounts'] = {
+        account_id: {table_name: copy.deepcopy(state.get(table_name) or {})
+                     for table_name in LEGACY_BOOKMARK_TABLES}
+    }
+    return upgraded
+
+
+def upgrade_v2(state, account_id):
+    # Version 3 added the checkpoints of each account.
+    upgraded = copy.deepcopy(state)
+    upgraded['version'] = 3
+
+    for bookmarks in upgraded.get('accounts', {}).values():
+        if isinstance(bookmarks, dict):
+            bookmarks.setdefault('checkpoints', {})
+
+    return upgraded
+
+
+def upgrade_v3(state, account_id):
+    # Version 4 added the entity hashes of each account.
+    upgraded = copy.deepcopy(state)
+    upgraded['version'] = 4
+
+    for bookmarks in upgraded.get('accounts', {}).values():
+        if isinstance(bookmarks, dict):
+            bookmarks.setdefault('entities', {})
+
+    return upgraded
+
+
+def upgrade_v4(state, account_id):
+    # Version 5 allows bookmarks in the compact format, so version 4 state
+    # is already valid version 5 state.
+    upgraded = copy.deepcopy(state)
+    upgraded['version'] = 5
+    return upgraded
+
+
+UPGRADES = {
+    0: upgrade_v0,
+    1: upgrade_v1,
+    2: upgrade_v2,
+    3: upgrade_v3,
+    4: upgrade_v4,
+}
+
+
+def is_valid_date(value):
+    try:
+        datetime.datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return False
+
+    return True
+
+
+def upgrade_state(state, account_id=None):
+    """
+    Upgrade `state` to `STATE_VERSION`. `account_id` is the account that
+    unnamespaced bookmarks, from before multi-account support, belong to.
+    """
+    version = state.get('version', 0)
+
+    if version > STATE_VERSION:
+        raise ValueError(
+            'State version {} is newer than the latest supported '
+            'version {}.'.format(version, STATE_VERSION))
+
+    while version < STATE_VERSION:
+        logger.info('Upgrading state from version {} to {}.'
+                    .format(version, version + 1))
+        state = UPGRADES[version](state, account_id)
+        version = state['version']
+
+    return state
+
+
+def validate_bookmarks(account_id, bookmarks):
+    """
+    Drop any bookmark that is not a `YYYY-MM-DD` date string, so a
+    corrupt entry costs a re-sync of one entity rather than the run, and
+    load every table into a `BookmarkMap`.
+    """
+    for table_name in BOOKMARK_TABLES:
+        table = bookmarks.get(table_name)
+
+        if isinstance(table, BookmarkMap):
+            continue
+
+        if is_compact(table):
+            try:
+                bookmarks[table_name] = BookmarkMap.from_compact(table)
+            except (KeyError, TypeError, ValueError):
+                logger.warning('Ignoring invalid {} bookmarks for account '
+                               '{} in state.'.format(table_name, account_id))
+                bookmarks[table_name] = BookmarkMap()
+            continue
+
+        if not isinstance(table, dict):
+            if table is not None:
+                logger.warning('Ignoring invalid {} bookmarks for account '
+                               '{} in state.'.format(table_name, account_id))
+            bookmarks[table_name] = BookmarkMap()
+            continue
+
+        for entity_id, value in list(table.items()):
+            if not is_valid_date(value):
+                logger.warning(
+                    'Ignoring invalid {} bookmark for {}: {}'
+                    .format(table_name, entity_id, value))
+                del table[entity_id]
+
+        bookmarks[table_name] = BookmarkMap(table)
+
+    return bookmarks
+
+
+def is_valid_checkpoint(checkpoint):
+    if not isinstance(checkpoint, dict) or \
+       not isinstance(checkpoint.get('done', []), list):
+        return False
+
+    if not isinstance(checkpoint.get('run', ''), str):
+        return False
+
+    pending = checkpoint.get('pending', {})
+    if not isinstance(pending, dict) or \
+       not all(is_valid_date(value) for value in pending.values()):
+        return False
+
+    current = checkpoint.get('current')
+    if current is None:
+        return True
+
+    return isinstance(current, dict) and \
+        is_valid_date(current.get('from')) and \
+        is_valid_date(current.get('to')) and \
+        isinstance(current.get('offset'), int)
+
+
+def validate_checkpoints(account_id, bookmarks):
+    """
+    Drop any checkpoint that is not shaped as documented above; the
+    interrupted work is then redone from the bookmarks.
+    """
+    checkpoints = bookmarks.get('checkpoints')
+
+    if not isinstance(checkpoints, dict):
+        if checkpoints is not None:
+            logger.warning('Ignoring invalid checkpoints for account {} '
+                           'in state.'.format(account_id))
+        bookmarks['checkpoints'] = {}
+        return bookmarks
+
+    for table_name, checkpoint in list(checkpoints.items()):
+        if not is_valid_checkpoint(checkpoint):
+            logger.warning('Ignoring invalid {} checkpoint for account {}.'
+                           .format(table_name, account_id))
+            del checkpoints[table_name]
+
+    return bookmarks
+
+
+def is_valid_entity_hash(value):
+    return isinstance(value, list) and len(value) == 2 and \
+        isinstance(value[0], str) and is_valid_date(value[1])
+
+
+def validate_entities(account_id, bookmarks):
+    """
+    Drop any entity hash that is not a `[hash, YYYY-MM-DD]` pair; the
+    entity is then emitted again on the next run.
+    """
+    entities = bookmarks.get('entities')
+
+    if not isinstance(entities, dict):
+        if entities is not None:
+            logger.warning('Ignoring invalid entity hashes for account {} '
+                           'in state.'.format(account_id))
+        bookmarks['entities'] = {}
+        return bookmarks
+
+    for stream_name, hashes in list(entities.items()):
+        if not isinstance(hashes, dict):
+            logger.warning('Ignoring invalid {} hashes for account {}.'
+                           .format(stream_name, account_id))
+            del entities[stream_name]
+            continue
+
+        for entity_id, value in list(hashes.items()):
+            if not is_valid_entity_hash(value):
+                logger.warning('Ignoring invalid {} hash for {}: {}'
+                               .format(stream_name, entity_id, value))
+                del hashes[entity_id]
+
+    return bookmarks
+
+
+def validate_state(state):
+    accounts = state.get('accounts')
+
+    if not isinstance(accounts, dict):
+        if accounts is not None:
+            logger.warning('Ignoring invalid accounts in state.')
+        state['accounts'] = {}
+        return state
+
+    for account_id, bookmarks in list(accounts.items()):
+        if not isinstance(bookmarks, dict):
+            logger.warning('Ignoring invalid bookmarks for account {}.'
+                           .format(account_id))
+            bookmarks = {}
+
+        accounts[account_id] = validate_entities(
+            account_id,
+            validate_checkpoints(
+                account_id, validate_bookmarks(account_id, bookmarks)))
+
+    return state
+
+
+def get_bookmarks(state, account_id, table_name):
+    """
+    Return the `BookmarkMap` of `table_name` for `account_id`, creating it
+    if needed.
+    """
+    account = state['accounts'].setdefault(account_id, {})
+    bookmarks = account.get(table_name)
+
+    if not isinstance(bookmarks, BookmarkMap):
+        bookmarks = account[table_name] = BookmarkMap(bookmarks)
+
+    return bookmarks
+
+
+def get_checkpoint(state, account_id, table_name):
+    """
+    Return the checkpoint of `table_name` for `account_id`, creating it
+    if needed.
+    """
+    account = state['accounts'].setdefault(account_id, {})
+    checkpoints = account.setdefault('checkpoints', {})
+    checkpoint = checkpoints.setdefault(table_name, {})
+    checkpoint.setdefault('run', RUN_ID)
+
+    # entities done used to be listed, and are now told by their bookmarks
+    checkpoint.pop('done', None)
+    checkpoint.pop('date', None)
+
+    return checkpoint
+
+
+def is_resumed(checkpoint):
+    """
+    Whether `checkpoint` was started by an earlier run.
+    """
+    return checkpoint.get('run') != RUN_ID
+
+
+def get_entity_hashes(state, account_id, stream_name):
+    """
+    Return the entity hashes of `stream_name` for `account_id`, creating
+    them if needed.
+    """
+    account = state['accounts'].setdefault(account_id, {})
+    return account.setdefault('entities', {}).setdefault(stream_name, {})
+
+
+def clear_checkpoint(state, account_id, table_name):
+    account = state['accounts'].setdefault(account_id, {})
+    account.setdefault('checkpoints', {}).pop(table_name, None)
+
+
+def merge_state(state, account_ids=()):
+    """
+    Merge a loaded state map into a fresh copy of `DEFAULT_STATE`, making
+    sure every account in `account_ids` has its bookmark maps.
+    """
+    merged = copy.deepcopy(DEFAULT_STATE)
+
+    if state is not None:
+        # bookmarks from before multi-account support belong to the first
+        # configured account.
+        state = validate_state(upgrade_state(
+            state, account_ids[0] if account_ids else None))
+
+        for key, value in state.items():
+            if key == 'accounts':
+                merged[key].update(value)
+            else:
+                merged[key] = value
+
+    for account_id in account_ids:
+        for table_name in BOOKMARK_TABLES:
+            get_bookmarks(merged, account_id, table_name)
+
+        merged['accounts'][account_id].setdefault('checkpoints', {})
+        merged['accounts'][account_id].setdefault('entities', {})
+
+    return merged
+
+
+def export_state(state, compact=False):
+    """
+    Copy of `state` that can be serialized to JSON, with bookmark maps
+    exported in the compact format, or as plain dicts readable by older
+    versions of this tap.
+    """
+    exported = dict(state)
+    exported['version'] = STATE_VERSION if compact else LEGACY_STATE_VERSION
+    exported['accounts'] = {}
+
+    for account_id, account in list(state.get('accounts', {}).items()):
+        exported_account = dict(account)
+
+        for key, value in list(exported_account.items()):
+            if isinstance(value, BookmarkMap):
+                exported_account[key] = value.to_compact() if compact \
+                    else value.to_dict()
+
+        exported['accounts'][account_id] = exported_account
+
+    return exported
+
+
+def load_state(path, account_ids=()):
+    if path is None:
+        return merge_state(None, account_ids)
+
+    with open(path) as state_file:
+        state = json.load(state_file)
+
+    if not isinstance(state, dict):
+        raise ValueError('State file {} must contain a JSON object.'
+                         .format(path))
+
+    logger.info('Loaded state from {}.'.format(path))
+
+    return merge_state(state, account_ids)
@@ -0,0 +1,154 @@
+import time
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+import requests
+import singer
+import urllib3
+
+import tap_outbrain.rate_limit as rate_limit
+from tap_outbrain.metrics import METRICS
+
+logger = singer.get_logger()
+
+SCALAR_EVENTS = ('null', 'boolean', 'integer', 'double', 'number', 'string')
+
+# Errors raised while a body is read: by requests when it reads the whole
+# body, and by urllib3 when ijson reads the raw stream.
+READ_ERRORS = (requests.exceptions.RequestException,
+               urllib3.exceptions.HTTPError)
+
+
+class ResponseItems(object):
+    """
+    Iterator over the items of the top-level array `key` of a JSON
+    response, i.e. `results` or `promotedLinks`. When ijson is installed
+    the body is parsed incrementally as it is read off the socket, so a
+    page is never held in memory as a whole; otherwise it falls back to
+    `response.json()`.
+
+    Top-level scalar fields, such as `totalCount`, are available through
+    `get` once the items have been iterated, and `count` holds the number
+    of items seen so far.
+
+    The body is read after the request itself has returned, so a
+    connection reset or read timeout part way through it is retried here,
+    under `retry_policy`: `reopen` requests the same page again, and the
+    items that were already seen are skipped.
+    """
+
+    def __init__(self, response, key, reopen=None, retry_policy=None,
+                 endpoint_class=rate_limit.ENTITY):
+        self.response = response
+        self.key = key
+        self.reopen = reopen
+        self.retry_policy = retry_policy
+        self.endpoint_class = endpoint_class
+        self.fields = {}
+        self.count = 0
+
+    def __iter__(self):
+        retry_state = None
+
+        while True:
+            seen = self.count
+
+            try:
+                for item in self._iter_items():
+                    if seen > 0:
+                        seen = seen - 1
+                        continue
+
+                    self.count = self.count + 1
+                    yield item
+
+                return
+            except READ_ERRORS as e:
+                if self.reopen is None or self.retry_policy is None:
+                    raise
+
+                if retry_state is None:
+                    retry_state = self.retry_policy.start()
+
+                reason, wait = retry_state.next_wait(error=e)
+                if wait is None:
+                    if reason is not None:
+                        METRICS.record_give_up(self.endpoint_class, reason)
+                    raise
+
+                logger.warning('Reading response failed after {} items '
+                               '({}), retrying in {:.1f} sec.'
+                               .format(self.count, e, wait))
+
+                METRICS.record_retry(self.endpoint_class, wait, reason)
+                time.sleep(wait)
+
+            self.fields = {}
+            self.response = self.reopen()
+
+    def _iter_items(self):
+        if ijson is None:
+            return self._iter_parsed()
+
+        return self._iter_streamed()
+
+    def _count_bytes(self, received_bytes):
+        # cached bodies were either not received at all, or counted when
+        # they were requested.
+        if getattr(self.response, 'from_cache', False):
+            return
+
+        METRICS.add_bytes(self.endpoint_class, received_bytes)
+
+    def _iter_parsed(self):
+        body = self.response.json()
+        self._count_bytes(len(self.response.content))
+
+        for name, value in body.items():
+            if not isinstance(value, (dict, list)):
+                self.fields[name] = value
+
+        return body.get(self.key) or []
+
+    def _iter_streamed(self):
+        raw = self.response.raw
+        raw.decode_content = True
+
+        item_prefix = '{}.item'.format(self.key)
+        builder = None
+        depth = 0
+
+        try:
+            for prefix, event, value in ijson.parse(raw, use_float=True):
+                if builder is not None:
+                    builder.event(event, value)
+
+                    if event in ('start_map', 'start_array'):
+                        depth = depth + 1
+                    elif event in ('end_map', 'end_array'):
+                        depth = depth - 1
+
+                    if depth == 0:
+                        yield builder.value
+                        builder = None
+
+                elif prefix == item_prefix:
+                    if event in ('start_map', 'start_array'):
+                        builder = ijson.ObjectBuilder()
+                        builder.event(event, value)
+                        depth = 1
+                    elif event in SCALAR_EVENTS:
+                        yield value
+
+                elif '.' not in prefix and prefix and \
+                        event in SCALAR_EVENTS:
+                    self.fields[prefix] = value
+        finally:
+            self._count_bytes(raw.tell())
+            self.response.close()
+
+    def get(self, name, default=None):
+        return self.fields.get(name, default)
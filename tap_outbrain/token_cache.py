@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import time
+
+import singer
+
+logger = singer.get_logger()
+
+# Outbrain access tokens are valid for 30 days. Tokens are refreshed a day
+# early so a long run does not outlive its token.
+DEFAULT_TOKEN_TTL = 30 * 24 * 60 * 60
+DEFAULT_REFRESH_MARGIN = 24 * 60 * 60
+DEFAULT_FILE_MODE = 0o600
+
+
+class TokenCache(object):
+    """
+    File-based cache for `OB-TOKEN-V1` access tokens, so runs can skip the
+    /login call (limited to 2 calls per hour). Entries are keyed by a hash
+    of the username and store the time the token was issued.
+    """
+
+    def __init__(self, path, mode=DEFAULT_FILE_MODE, ttl=DEFAULT_TOKEN_TTL,
+                 refresh_margin=DEFAULT_REFRESH_MARGIN):
+        self.path = os.path.expanduser(path)
+        self.mode = mode
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+
+    @staticmethod
+    def key(username):
+        return hashlib.sha256(username.encode('utf-8')).hexdigest()
+
+    def _read(self):
+        try:
+            with open(self.path) as cache_file:
+                entries = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return {}
+
+        if not isinstance(entries, dict):
+            return {}
+
+        return entries
+
+    def get(self, username):
+        entry = self._read().get(self.key(username))
+
+        if not isinstance(entry, dict) or entry.get('token') is None:
+            return None
+
+        age = time.time() - entry.get('issued_at', 0)
+
+        if age > self.ttl - self.refresh_margin:
+            logger.info('Cached access token is about to expire.')
+            return None
+
+        logger.info('Using cached access token issued {:.1f} hours ago.'
+                    .format(age / 3600))
+
+        return entry.get('token')
+
+    def set(self, username, token, issued_at=None):
+        entries = self._read()
+        entries[self.key(username)] = {
+            'token': token,
+            'issued_at': issued_at or time.time(),
+        }
+
+        self._write(entries)
+
+    def invalidate(self, username):
+        entries = self._read()
+
+        if entries.pop(self.key(username), None) is not None:
+            self._write(entries)
+
+    def _write(self, entries):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # write to a temporary file created with the cache permissions and
+        # swap it in, so the token is never readable by others, even briefly
+        tmp_path = '{}.tmp'.format(self.path)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                     self.mode)
+
+        with os.fdopen(fd, 'w') as cache_file:
+            json.dump(entries, cache_file)
+
+        os.chmod(tmp_path, self.mode)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,188 @@
+import datetime
+import functools
+
+import dateutil.parser
+
+from tap_outbrain.catalog import prune_schema
+import tap_outbrain.schemas as schemas
+
+# Outbrain reports these metrics as counts. They are typed as `number` in
+# the schemas, but have always been emitted as integers.
+INTEGER_METRICS = ('impressions', 'clicks', 'conversions')
+
+# Performance fields read from a report row's `metadata` rather than its
+# `metrics`.
+METADATA_FIELDS = ('fromDate',)
+
+CASTS = {
+    'integer': int,
+    'number': float,
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_datetime_generic(value):
+    dt = dateutil.parser.parse(value)
+
+    # TODO the assumption is that timestamps without an offset come in in
+    #      UTC, but that may not be true. verify w/ outbrain.
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+    return dt.isoformat('T') + 'Z'
+
+
+def parse_datetime(value):
+    """
+    Convert an Outbrain timestamp to an ISO 8601 UTC timestamp. The fixed
+    formats the API uses, "2013-01-14 07:19:16" and "2013-03-16T10:32:31Z",
+    are converted by slicing; anything else goes through dateutil, with
+    the results cached.
+    """
+    if (len(value) == 19 or (len(value) == 20 and value[19] == 'Z')) and \
+       value[4] == '-' and value[7] == '-' and value[10] in ' T' and \
+       value[13] == ':' and value[16] == ':' and \
+       (value[0:4] + value[5:7] + value[8:10] +
+            value[11:13] + value[14:16] + value[17:19]).isdigit():
+        return value[:10] + 'T' + value[11:19] + 'Z'
+
+    return _parse_datetime_generic(value)
+
+
+def _datetime_paths(schema, path=()):
+    paths = []
+
+    for name, field in schema.get('properties', {}).items():
+        if field.get('format') == 'date-time':
+            paths.append(path + (name,))
+        elif field.get('type') == 'object':
+            paths.extend(_datetime_paths(field, path + (name,)))
+
+    return paths
+
+
+class EntityTransformer(object):
+    """
+    Transformer for entity records (campaigns, links). The paths of every
+    `date-time` field in the schema, including nested ones, are found once
+    up front, and only those are converted for each record, in place.
+
+    Records keep every field, since some are needed to decide what else to
+    sync; `prune` drops those not in `fields` right before a record is
+    written.
+    """
+
+    def __init__(self, schema, fields=None):
+        self.datetime_paths = _datetime_paths(schema)
+        self.fields = None if fields is None else frozenset(fields)
+
+    def transform(self, record):
+        for path in self.datetime_paths:
+            parent = record
+
+            for name in path[:-1]:
+                parent = parent.get(name)
+                if not isinstance(parent, dict):
+                    break
+            else:
+                value = parent.get(path[-1])
+                if value is not None:
+                    parent[path[-1]] = parse_datetime(value)
+
+        return record
+
+    def transform_page(self, records):
+        transform = self.transform
+        return (transform(record) for record in records)
+
+    def prune(self, record):
+        if self.fields is None:
+            return record
+
+        fields = self.fields
+        return {name: value for name, value in record.items()
+                if name in fields}
+
+
+class PerformanceTransformer(object):
+    """
+    Transformer flattening periodic report rows into performance records.
+    The conversion plan, i.e. which fields come from `metadata`, which
+    from `metrics` and how each metric is cast, is built once from the
+    stream's schema. Fields that are neither, such as `campaignId`, are
+    supplied by the caller as `extra_fields`, and should be left out with
+    `select` unless they are among the schema's `fields`.
+    """
+
+    def __init__(self, schema):
+        self.fields = frozenset(schema.get('properties', {}))
+        self.metadata_fields = []
+        self.metric_plan = []
+
+        for name, field in schema.get('properties', {}).items():
+            if name in METADATA_FIELDS:
+                self.metadata_fields.append(name)
+            elif field.get('type') in CASTS:
+                cast = CASTS[field['type']]
+
+                if name in INTEGER_METRICS:
+                    cast = int
+
+                self.metric_plan.append((name, cast, cast(0)))
+
+    def select(self, names):
+        return [name for name in names if name in self.fields]
+
+    def transform(self, result, extra_fields):
+        metrics = result.get('metrics') or {}
+        metadata = result.get('metadata') or {}
+
+        record = {name: metadata.get(name) for name in self.metadata_fields}
+
+        for name, cast, default in self.metric_plan:
+            value = metrics.get(name)
+            record[name] = default if value is None else cast(value)
+
+        record.update(extra_fields)
+
+        return record
+
+    def transform_page(self, results, extra_fields):
+        transform = self.transform
+        return (transform(result, extra_fields) for result in results)
+
+
+def build_transformers(selection=None):
+    """
+    Build the transformer of every stream, keeping only the fields selected
+    in `selection` (see `catalog.get_selection`); performance transformers
+    don't even convert the metrics left out.
+    """
+    selection = selection or {}
+
+    return {
+        'campaigns': EntityTransformer(schemas.campaign,
+                                       selection.get('campaigns')),
+        'links': EntityTransformer(schemas.link, selection.get('links')),
+        'campaign_performance': PerformanceTransformer(
+            prune_schema(schemas.campaign_performance,
+                         selection.get('campaign_performance'))),
+        'link_performance': PerformanceTransformer(
+            prune_schema(schemas.link_performance,
+                         selection.get('link_performance'))),
+        'publisher_performance': PerformanceTransformer(
+            prune_schema(schemas.publisher_performance,
+                         selection.get('publisher_performance'))),
+        'section_performance': PerformanceTransformer(
+            prune_schema(schemas.section_performance,
+                         selection.get('section_performance'))),
+        'geo_performance': PerformanceTransformer(
+            prune_schema(schemas.geo_performance,
+                         selection.get('geo_performance'))),
+        'platform_performance': PerformanceTransformer(
+            prune_schema(schemas.platform_performance,
+                         selection.get('platform_performance'))),
+    }
+
+
+TRANSFORMERS = build_transformers()
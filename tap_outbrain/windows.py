@@ -0,0 +1,117 @@
+import datetime
+import math
+
+DEFAULT_PAGE_LIMIT = 100
+
+MIN_WINDOW_DAYS = 1
+MAX_WINDOW_DAYS = 365
+
+# With the daily breakdown, a report returns at most one row per day per
+# entity, so this is the densest a window can be.
+DAILY_ROWS_PER_DAY = 1.0
+
+# Performance is re-pulled from this many days before the bookmark, since
+# Outbrain keeps attributing conversions to recent days.
+DEFAULT_LOOKBACK_DAYS = 2
+
+
+def get_lookback_days(lookback_days, table_name):
+    """
+    `lookback_days` is either a number of days for every stream, or a map
+    of stream name to number of days.
+    """
+    if isinstance(lookback_days, dict):
+        return lookback_days.get(table_name, DEFAULT_LOOKBACK_DAYS)
+
+    if lookback_days is None:
+        return DEFAULT_LOOKBACK_DAYS
+
+    return lookback_days
+
+
+def get_start_date(bookmark, default_start_date, lookback_days):
+    """
+    Date to sync from: `lookback_days` before the `YYYY-MM-DD` bookmark,
+    or before `default_start_date` if there is no bookmark yet.
+    """
+    return datetime.datetime.strptime(
+        bookmark or default_start_date,
+        '%Y-%m-%d').date() - datetime.timedelta(days=lookback_days)
+
+
+def get_window_days(rows_per_day, page_limit=DEFAULT_PAGE_LIMIT,
+                    min_days=MIN_WINDOW_DAYS, max_days=MAX_WINDOW_DAYS):
+    """
+    Number of days that fill about one page of `page_limit` results at
+    `rows_per_day`.
+    """
+    if rows_per_day <= 0:
+        return max_days
+
+    return max(min_days, min(max_days, int(page_limit / rows_per_day)))
+
+
+def plan_windows(start, end, rows_per_day=DAILY_ROWS_PER_DAY,
+                 page_limit=DEFAULT_PAGE_LIMIT, min_days=MIN_WINDOW_DAYS,
+                 max_days=MAX_WINDOW_DAYS):
+    """
+    Split the inclusive date range `start`..`end` into as few windows as
+    possible that each fill at most one page of results, and return them
+    as `(from_date, to_date)` tuples.
+
+    Rather than fixed-size windows followed by a short tail, which costs a
+    full rate-limited request for a few days of data, the range is spread
+    evenly over the minimum number of windows. The plan only depends on its
+    arguments, so the same inputs always give the same requests.
+    """
+    if start > end:
+        return []
+
+    total_days = (end - start).days + 1
+    window_days = get_window_days(rows_per_day, page_limit,
+                                  min_days, max_days)
+
+    window_count = int(math.ceil(float(total_days) / window_days))
+    base_days, longer_windows = divmod(total_days, window_count)
+
+    windows = []
+    window_start = start
+
+    for i in range(window_count):
+        days = base_days + (1 if i < longer_windows else 0)
+        window_end = window_start + datetime.timedelta(days=days - 1)
+        windows.append((window_start, window_end))
+        window_start = window_end + datetime.timedelta(days=1)
+
+    return windows
+
+
+def count_planned_requests(bookmarks, entity_ids, default_start_date,
+                           end_date, lookback_days=DEFAULT_LOOKBACK_DAYS,
+                           rows_per_day=DAILY_ROWS_PER_DAY,
+                           page_limit=DEFAULT_PAGE_LIMIT,
+                           entities_per_page=None):
+    """
+    Count the reporting requests needed to sync `entity_ids` up to
+    `end_date` given a bookmark map. By default every entity is synced on
+    its own; with `entities_per_page`, entities are synced together from a
+    report broken down by entity, paginated `entities_per_page` at a time.
+    """
+    start_dates = [
+        get_start_date(bookmarks.get(entity_id), default_start_date,
+                       lookback_days)
+        for entity_id in entity_ids]
+
+    if not start_dates:
+        return 0
+
+    if entities_per_page is None:
+        return sum(
+            len(plan_windows(start_date, end_date, rows_per_day, page_limit))
+            for start_date in start_dates)
+
+    pages = int(math.ceil(float(len(start_dates)) / entities_per_page))
+    windows = plan_windows(min(start_dates), end_date, rows_per_day,
+                           page_limit)
+
+    return len(windows) * pages
@@ -0,0 +1,177 @@
+import datetime
+import decimal
+import json
+import sys
+import threading
+import time
+
+from tap_outbrain.metrics import METRICS
+from tap_outbrain.state import export_state
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_STATE_INTERVAL = 10
+
+
+def _default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+if orjson is not None:
+    def serialize(message):
+        return orjson.dumps(message, default=_default)
+else:
+    def serialize(message):
+        return json.dumps(message, default=_default).encode('utf-8')
+
+
+class MessageWriter(object):
+    """
+    Writes Singer messages to stdout. Messages are serialized with orjson
+    when it is installed and buffered until `buffer_size` bytes are
+    pending. STATE messages are coalesced: only the latest state is kept,
+    and it is written at most every `state_interval` seconds (and always
+    on `flush`). Since bookmarks are only advanced after their records are
+    written, a state is never ahead of the records before it. States are
+    exported as they are written, with compact bookmarks if `compact_state`
+    is set.
+
+    Record counts and the time spent serializing and writing them are kept
+    per stream, and reported to `METRICS` on `flush`.
+    """
+
+    def __init__(self, output=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                 state_interval=DEFAULT_STATE_INTERVAL, compact_state=False):
+        self.output = output
+        self.buffer_size = buffer_size
+        self.state_interval = state_interval
+        self.compact_state = compact_state
+        self.lock = threading.RLock()
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.pending_state = None
+        self.last_state_at = None
+        self.write_stats = {}
+
+    def _output(self):
+        if self.output is not None:
+            return self.output
+        return getattr(sys.stdout, 'buffer', sys.stdout)
+
+    def _write(self, message):
+        line = serialize(message) + b'\n'
+
+        with self.lock:
+            self.buffer.append(line)
+            self.buffered_bytes = self.buffered_bytes + len(line)
+
+            if self.buffered_bytes >= self.buffer_size:
+                self._flush_buffer()
+
+    def _flush_buffer(self):
+        if not self.buffer:
+            return
+
+        output = self._output()
+        output.write(b''.join(self.buffer))
+        output.flush()
+
+        self.buffer = []
+        self.buffered_bytes = 0
+
+    def _write_pending_state(self):
+        if self.pending_state is None:
+            return
+
+        self.last_state_at = time.monotonic()
+        state = self.pending_state
+        self.pending_state = None
+
+        self._write({'type': 'STATE',
+                     'value': export_state(state, self.compact_state)})
+
+    def write_record(self, stream_name, record):
+        start = time.perf_counter()
+
+        self._write({'type': 'RECORD',
+                     'stream': stream_name,
+                     'record': record})
+
+        with self.lock:
+            stats = self.write_stats.setdefault(stream_name, [0, 0.0])
+            stats[0] += 1
+            stats[1] += time.perf_counter() - start
+
+    def write_records(self, stream_name, records):
+        for record in records:
+            self.write_record(stream_name, record)
+
+    def write_schema(self, stream_name, schema, key_properties):
+        if isinstance(key_properties, (str, bytes)):
+            key_properties = [key_properties]
+
+        self._write({'type': 'SCHEMA',
+                     'stream': stream_name,
+                     'schema': schema,
+                     'key_properties': key_properties})
+
+    def write_state(self, state):
+        with self.lock:
+            self.pending_state = state
+
+            if self.last_state_at is None or \
+               time.monotonic() - self.last_state_at >= self.state_interval:
+                self._write_pending_state()
+
+    def _report_writes(self):
+        for stream_name, (records, seconds) in self.write_stats.items():
+            METRICS.add_writes(stream_name, records, seconds)
+
+        self.write_stats = {}
+
+    def flush(self):
+        with self.lock:
+            self._write_pending_state()
+            self._flush_buffer()
+            self._report_writes()
+
+
+WRITER = MessageWriter()
+
+
+def configure(config):
+    global WRITER
+
+    WRITER.flush()
+    WRITER = MessageWriter(
+        buffer_size=config.get('output_buffer_size', DEFAULT_BUFFER_SIZE),
+        state_interval=config.get('state_interval', DEFAULT_STATE_INTERVAL),
+        compact_state=config.get('compact_state', False))
+
+
+def write_record(stream_name, record):
+    WRITER.write_record(stream_name, record)
+
+
+def write_records(stream_name, records):
+    WRITER.write_records(stream_name, records)
+
+
+def write_schema(stream_name, schema, key_properties):
+    WRITER.write_schema(stream_name, schema, key_properties)
+
+
+def write_state(state):
+    WRITER.write_state(state)
+
+
+def flush():
+    WRITER.flush()
@@ -0,0 +1,110 @@
+import contextlib
+import datetime
+import io
+import json
+from unittest import mock
+
+from tap_outbrain.cache import CachedResponse
+from tap_outbrain.metrics import METRICS
+import tap_outbrain.rate_limit as rate_limit
+from tap_outbrain.retry import RetryPolicy
+from tap_outbrain.state import merge_state
+import tap_outbrain.writer as writer
+
+ACCOUNT_ID = 'marketer'
+
+
+def rows(from_date, to_date):
+    """
+    Daily report rows from `from_date` to `to_date`, as the API sends them.
+    """
+    result = []
+    day = from_date
+
+    while day <= to_date:
+        result.append({
+            'metadata': {'fromDate': day.isoformat()},
+            'metrics': {'impressions': 10.0, 'clicks': 1.0},
+        })
+        day = day + datetime.timedelta(days=1)
+
+    return result
+
+
+def parse_date(value):
+    return datetime.datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+class FakeClient(object):
+    """
+    Stand-in for `OutbrainClient` answering report and entity requests
+    with `handler(url, params)`, and recording them.
+    """
+
+    base_url = 'https://fake'
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self.retry_policy = RetryPolicy()
+
+    def _respond(self, url, params):
+        self.requests.append((url, dict(params or {})))
+        body = self.handler(url, params or {})
+        return CachedResponse(json.dumps(body).encode('utf-8'))
+
+    def request_report(self, url, params):
+        # counted like real reporting requests, for the run budget
+        METRICS.record_request(rate_limit.REPORTING, url, 200, 0.0, 0)
+        return self._respond(url, params)
+
+    def request(self, url, params=None, endpoint_class=None, stream=False):
+        return self._respond(url, params)
+
+    def report_requests(self):
+        return [request for request in self.requests
+                if '/reports/' in request[0]]
+
+
+class Output(object):
+    """
+    Captures the Singer messages written while it is installed.
+    """
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.previous = writer.WRITER
+        writer.WRITER = writer.MessageWriter(output=self.buffer,
+                                             state_interval=0)
+
+    def close(self):
+        writer.WRITER.flush()
+        writer.WRITER = self.previous
+
+    def messages(self):
+        writer.WRITER.flush()
+        return [json.loads(line) for line
+                in self.buffer.getvalue().decode('utf-8').splitlines()]
+
+    def records(self, stream_name):
+        return [message['record'] for message in self.messages()
+                if message['type'] == 'RECORD' and
+                message['stream'] == stream_name]
+
+
+@contextlib.contextmanager
+def today_is(day):
+    """
+    Make `datetime.date.today()` return `day` while the context is open.
+    """
+    class FrozenDate(datetime.date):
+        @classmethod
+        def today(cls):
+            return cls(day.year, day.month, day.day)
+
+    with mock.patch('datetime.date', FrozenDate):
+        yield
+
+
+def empty_state():
+    return merge_state(None, [ACCOUNT_ID])
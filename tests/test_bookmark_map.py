@@ -0,0 +1,72 @@
+import sys
+import threading
+import unittest
+
+from tap_outbrain.bookmarks import BookmarkMap
+
+
+class TestBookmarkMap(unittest.TestCase):
+    def test_round_trip(self):
+        bookmarks = BookmarkMap({'a': '2017-03-16', 'b': '2017-03-14'})
+        bookmarks['c'] = '2017-03-16'
+        bookmarks['b'] = None
+
+        self.assertEqual(bookmarks.to_dict(),
+                         {'a': '2017-03-16', 'c': '2017-03-16'})
+        self.assertEqual(bookmarks['a'], '2017-03-16')
+        self.assertNotIn('b', bookmarks)
+
+    def test_compact_round_trip(self):
+        bookmarks = BookmarkMap({'a': '2017-03-16', 'b': '2017-03-14',
+                                 'c': '2017-03-16'})
+        compact = bookmarks.to_compact()
+
+        self.assertEqual(compact['runs'], [['2017-03-16', 2],
+                                           ['2017-03-14', 1]])
+        self.assertEqual(compact['ids'][2], 'b')
+        self.assertEqual(BookmarkMap.from_compact(compact).to_dict(),
+                         bookmarks.to_dict())
+
+    def test_malformed_compact(self):
+        with self.assertRaises(ValueError):
+            BookmarkMap.from_compact({'ids': ['a', 'b'],
+                                      'runs': [['2017-03-16', 1]]})
+
+    def test_exports_follow_changes(self):
+        bookmarks = BookmarkMap({'a': '2017-03-14'})
+        self.assertIs(bookmarks.to_dict(), bookmarks.to_dict())
+
+        bookmarks['a'] = '2017-03-16'
+        self.assertEqual(bookmarks.to_dict(), {'a': '2017-03-16'})
+
+        del bookmarks['a']
+        self.assertEqual(bookmarks.to_compact(), {'ids': [], 'runs': []})
+
+    def test_export_while_other_threads_write(self):
+        # switch threads often, so exports overlap with writes
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+        bookmarks = BookmarkMap()
+        ids = ['{:06d}'.format(i) for i in range(20000)]
+
+        def write(start):
+            for entity_id in ids[start::4]:
+                bookmarks[entity_id] = '2017-03-16'
+
+        writers = [threading.Thread(target=write, args=(start,))
+                   for start in range(4)]
+
+        for writer in writers:
+            writer.start()
+
+        while any(writer.is_alive() for writer in writers):
+            bookmarks.to_dict()
+            bookmarks.to_compact()
+
+        for writer in writers:
+            writer.join()
+
+        self.assertEqual(len(bookmarks.to_dict()), len(ids))
+        self.assertEqual(sorted(bookmarks.to_compact()['ids']), ids)
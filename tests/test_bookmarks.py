@@ -0,0 +1,141 @@
+import datetime
+import unittest
+
+import tap_outbrain
+from tap_outbrain.state import get_bookmarks
+
+from tests.helpers import ACCOUNT_ID, FakeClient, Output, empty_state, \
+    parse_date, rows
+
+
+class TestEmptyEntityBookmarks(unittest.TestCase):
+    """
+    Entities without rows are still covered by the windows synced for
+    them, so they do not hold back later runs.
+    """
+
+    def setUp(self):
+        self.today = datetime.date.today()
+        self.start_date = tap_outbrain.DEFAULT_START_DATE
+        tap_outbrain.DEFAULT_START_DATE = \
+            (self.today - datetime.timedelta(days=300)).isoformat()
+        self.output = Output()
+
+    def tearDown(self):
+        tap_outbrain.DEFAULT_START_DATE = self.start_date
+        self.output.close()
+
+    def handle_breakdown(self, url, params):
+        from_date = parse_date(params['from'])
+        to_date = parse_date(params['to'])
+
+        return {
+            'totalCampaigns': 2,
+            'campaignResults': [
+                {'campaignId': 'active', 'results': rows(from_date, to_date)},
+                {'campaignId': 'empty', 'results': []},
+            ],
+        }
+
+    def handle_periodic(self, url, params):
+        return {'totalResults': 0, 'results': []}
+
+    def test_batch_bookmarks_cover_empty_campaigns(self):
+        state = empty_state()
+        client = FakeClient(self.handle_breakdown)
+
+        tap_outbrain.sync_campaigns_performance(
+            state, client, ACCOUNT_ID, ['active', 'empty'])
+
+        bookmarks = get_bookmarks(state, ACCOUNT_ID, 'campaign_performance')
+        self.assertEqual(bookmarks['empty'], self.today.isoformat())
+
+        client = FakeClient(self.handle_breakdown)
+        tap_outbrain.clear_checkpoint(state, ACCOUNT_ID,
+                                      'campaign_performance')
+        tap_outbrain.sync_campaigns_performance(
+            state, client, ACCOUNT_ID, ['active', 'empty'])
+
+        self.assertEqual(len(client.report_requests()), 1)
+
+    def test_campaign_bookmark_covers_empty_windows(self):
+        state = empty_state()
+        client = FakeClient(self.handle_periodic)
+
+        tap_outbrain.sync_performance(
+            state, client, ACCOUNT_ID, 'campaign_performance', 'empty',
+            {'campaignId': 'empty'}, {'campaignId': 'empty'})
+
+        bookmarks = get_bookmarks(state, ACCOUNT_ID, 'campaign_performance')
+        self.assertEqual(bookmarks['empty'], self.today.isoformat())
+
+        client = FakeClient(self.handle_periodic)
+        tap_outbrain.clear_checkpoint(state, ACCOUNT_ID,
+                                      'campaign_performance')
+        tap_outbrain.sync_performance(
+            state, client, ACCOUNT_ID, 'campaign_performance', 'empty',
+            {'campaignId': 'empty'}, {'campaignId': 'empty'})
+
+        self.assertEqual(len(client.report_requests()), 1)
+
+
+class TestBookmarksOnlyMoveForward(unittest.TestCase):
+
+    def setUp(self):
+        self.today = datetime.date.today()
+        self.output = Output()
+
+    def tearDown(self):
+        self.output.close()
+
+    def handle(self, url, params):
+        # newest first, with a row the API sent without its date
+        results = rows(parse_date(params['from']), parse_date(params['to']))
+        results.reverse()
+        results.append({'metadata': {}, 'metrics': {'clicks': 1.0}})
+
+        if 'campaigns/periodic' in url:
+            return {
+                'totalCampaigns': 1,
+                'campaignResults': [
+                    {'campaignId': 'campaign', 'results': results}],
+            }
+
+        return {'totalResults': len(results), 'results': results}
+
+    def test_campaign_rows(self):
+        state = empty_state()
+        bookmarks = get_bookmarks(state, ACCOUNT_ID, 'campaign_performance')
+        bookmarks['campaign'] = self.today.isoformat()
+
+        tap_outbrain.sync_performance_window(
+            state, FakeClient(self.handle), ACCOUNT_ID,
+            'campaign_performance', 'campaign', {'campaignId': 'campaign'},
+            {'campaignId': 'campaign'},
+            self.today - datetime.timedelta(days=10),
+            self.today - datetime.timedelta(days=5))
+
+        self.assertEqual(bookmarks['campaign'], self.today.isoformat())
+        self.assertEqual(
+            len(self.output.records('campaign_performance')), 6)
+
+    def test_breakdown_rows(self):
+        state = empty_state()
+        start_date = tap_outbrain.DEFAULT_START_DATE
+        tap_outbrain.DEFAULT_START_DATE = \
+            (self.today - datetime.timedelta(days=5)).isoformat()
+
+        try:
+            tap_outbrain.sync_campaigns_performance(
+                state, FakeClient(self.handle), ACCOUNT_ID, ['campaign'])
+        finally:
+            tap_outbrain.DEFAULT_START_DATE = start_date
+
+        bookmarks = get_bookmarks(state, ACCOUNT_ID, 'campaign_performance')
+        self.assertEqual(bookmarks['campaign'], self.today.isoformat())
+        self.assertTrue(all(record['fromDate'] for record
+                            in self.output.records('campaign_performance')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import datetime
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from tap_outbrain.cache import CachedResponse, ResponseCache, cache_key
+
+URL = 'https://fake/reports/marketers/marketer/periodic'
+
+
+class TestCacheKey(unittest.TestCase):
+
+    def test_params_are_normalized(self):
+        self.assertEqual(
+            cache_key(URL, {'from': datetime.date(2020, 1, 1),
+                            'includeArchivedCampaigns': True,
+                            'offset': 0}),
+            cache_key(URL, {'offset': '0',
+                            'includeArchivedCampaigns': 'true',
+                            'from': '2020-01-01'}))
+
+    def test_params_tell_entries_apart(self):
+        self.assertNotEqual(cache_key(URL, {'offset': 0}),
+                            cache_key(URL, {'offset': 100}))
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache', 'responses.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_is_settled(self):
+        cache = ResponseCache(self.path, settle_days=30)
+        today = datetime.date.today()
+
+        self.assertTrue(cache.is_settled(today - datetime.timedelta(31)))
+        self.assertTrue(cache.is_settled(
+            (today - datetime.timedelta(31)).isoformat()))
+        self.assertFalse(cache.is_settled(today - datetime.timedelta(30)))
+        self.assertFalse(cache.is_settled(None))
+
+        cache.close()
+
+    def test_round_trip(self):
+        cache = ResponseCache(self.path)
+        cache.set(URL, {'offset': 0}, b'{"results": []}')
+
+        self.assertEqual(cache.get(URL, {'offset': 0}), b'{"results": []}')
+        self.assertIsNone(cache.get(URL, {'offset': 100}))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        cache.close()
+
+        # entries outlive the run
+        cache = ResponseCache(self.path)
+        self.assertEqual(cache.get(URL, {'offset': 0}), b'{"results": []}')
+        cache.close()
+
+    def test_bypass_refreshes_without_reading(self):
+        cache = ResponseCache(self.path)
+        cache.set(URL, {'offset': 0}, b'old')
+        cache.close()
+
+        cache = ResponseCache(self.path, bypass=True)
+        self.assertIsNone(cache.get(URL, {'offset': 0}))
+        cache.set(URL, {'offset': 0}, b'new')
+        cache.close()
+
+        cache = ResponseCache(self.path)
+        self.assertEqual(cache.get(URL, {'offset': 0}), b'new')
+        cache.close()
+
+    @mock.patch('tap_outbrain.cache.time.time',
+                side_effect=itertools.count())
+    def test_evicts_least_recently_used(self, time):
+        body = os.urandom(1000)
+        cache = ResponseCache(self.path, max_bytes=2500)
+
+        cache.set(URL, {'offset': 0}, body)
+        cache.set(URL, {'offset': 100}, body)
+        cache.get(URL, {'offset': 0})
+        cache.set(URL, {'offset': 200}, body)
+
+        self.assertIsNotNone(cache.get(URL, {'offset': 0}))
+        self.assertIsNone(cache.get(URL, {'offset': 100}))
+        self.assertIsNotNone(cache.get(URL, {'offset': 200}))
+
+        cache.close()
+
+
+class TestCachedResponse(unittest.TestCase):
+
+    def test_reads_like_a_response(self):
+        response = CachedResponse(b'{"totalResults": 0}')
+
+        self.assertEqual(response.json(), {'totalResults': 0})
+        self.assertEqual(response.raw.read(), b'{"totalResults": 0}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import datetime
+import unittest
+from unittest import mock
+
+import tap_outbrain
+import tap_outbrain.scheduler as scheduler
+from tap_outbrain.state import get_checkpoint
+
+from tests.helpers import ACCOUNT_ID, FakeClient, Output, empty_state, \
+    parse_date, rows
+
+CAMPAIGNS = [
+    (campaign_id, (scheduler.ON_AIR, 0.0, ''))
+    for campaign_id in ('first', 'second', 'third')]
+
+
+class TestResumedCheckpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.start_date = tap_outbrain.DEFAULT_START_DATE
+        self.run_budget = tap_outbrain.RUN_BUDGET
+        tap_outbrain.DEFAULT_START_DATE = \
+            (datetime.date.today() - datetime.timedelta(days=5)).isoformat()
+        self.output = Output()
+
+    def tearDown(self):
+        tap_outbrain.DEFAULT_START_DATE = self.start_date
+        tap_outbrain.RUN_BUDGET = self.run_budget
+        self.output.close()
+
+    def handle(self, url, params):
+        results = rows(parse_date(params['from']), parse_date(params['to']))
+        return {'totalResults': len(results), 'results': results}
+
+    def sync(self, state, run_id, requests=None):
+        with mock.patch('tap_outbrain.state.RUN_ID', run_id):
+            tap_outbrain.RUN_BUDGET = scheduler.RunBudget(requests=requests)
+            client = FakeClient(self.handle)
+
+            left = tap_outbrain.sync_campaigns_queue(
+                state, client, ACCOUNT_ID, CAMPAIGNS)
+            tap_outbrain.clear_finished_checkpoints(state, ACCOUNT_ID, left)
+
+        return [params['campaignId']
+                for _, params in client.report_requests()]
+
+    def test_resumed_run_skips_finished_campaigns(self):
+        state = empty_state()
+
+        self.assertEqual(self.sync(state, 'interrupted', 2),
+                         ['first', 'second'])
+
+        checkpoint = get_checkpoint(state, ACCOUNT_ID,
+                                    'campaign_performance')
+        self.assertNotIn('done', checkpoint)
+
+        self.assertEqual(self.sync(state, 'resumed'), ['third'])
+
+    def test_new_run_syncs_every_campaign_again(self):
+        state = empty_state()
+
+        self.sync(state, 'first run')
+
+        self.assertEqual(self.sync(state, 'second run'),
+                         ['first', 'second', 'third'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import json
+import unittest
+
+import requests
+
+from tap_outbrain.client import Credentials, OutbrainClient
+import tap_outbrain.rate_limit as rate_limit
+
+
+class FakeSession(object):
+    """
+    Answers /login with a new token, and rejects every other request made
+    with a token other than the newest.
+    """
+
+    def __init__(self):
+        self.logins = 0
+        self.token = None
+
+    def get(self, url, headers=None, params=None, timeout=None,
+            stream=False):
+        response = requests.Response()
+        response.url = url
+        response.headers = requests.structures.CaseInsensitiveDict()
+
+        if url.endswith('/login'):
+            self.logins = self.logins + 1
+            self.token = 'new-{}'.format(self.logins)
+            body = {'OB-TOKEN-V1': self.token}
+        elif headers.get('OB-TOKEN-V1') != self.token:
+            response.status_code = 401
+            response._content = b'{}'
+            return response
+        else:
+            body = {'campaigns': []}
+
+        response.status_code = 200
+        response._content = json.dumps(body).encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+
+class TestSharedCredentials(unittest.TestCase):
+
+    def setUp(self):
+        self.session = FakeSession()
+        self.credentials = Credentials(access_token='old', username='user',
+                                       password='secret')
+        self.clients = [OutbrainClient(credentials=self.credentials)
+                        for _ in range(2)]
+
+        for client in self.clients:
+            client.session = self.session
+
+    def test_clients_share_a_refreshed_token(self):
+        first, second = self.clients
+
+        first.request('https://fake/campaigns')
+        second.request('https://fake/campaigns')
+
+        self.assertEqual(self.session.logins, 1)
+        self.assertEqual(second.access_token, 'new-1')
+
+    def test_stale_rejections_do_not_log_in_again(self):
+        first, second = self.clients
+
+        first.request('https://fake/campaigns')
+
+        # `second` was rejected with the token `first` has since replaced
+        self.assertEqual(second.refresh_token('old'), 'new-1')
+        self.assertEqual(self.session.logins, 1)
+
+    def test_only_logins_are_throttled_together(self):
+        first, second = self.clients
+
+        self.assertIs(first.get_scheduler(rate_limit.LOGIN),
+                      second.get_scheduler(rate_limit.LOGIN))
+        self.assertIsNot(first.get_scheduler(rate_limit.REPORTING),
+                         second.get_scheduler(rate_limit.REPORTING))
+
+
+class TestCredentialsFromConfig(unittest.TestCase):
+
+    def test_token_cache_mode_as_string_or_integer(self):
+        for mode in ('640', 640):
+            credentials = Credentials.from_config({
+                'token_cache_path': '/tmp/tokens.json',
+                'token_cache_mode': mode,
+            })
+
+            self.assertEqual(credentials.token_cache.mode, 0o640)
+
+    def test_invalid_token_cache_mode(self):
+        # 384 is 0o600 written in decimal
+        for mode in (384, '0x180', -600, 'rw'):
+            with self.assertRaisesRegex(ValueError, 'token_cache_mode'):
+                Credentials.from_config({
+                    'token_cache_path': '/tmp/tokens.json',
+                    'token_cache_mode': mode,
+                })
+
+
+if __name__ == '__main__':
+    unittest.main()
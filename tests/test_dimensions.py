@@ -0,0 +1,89 @@
+import datetime
+import unittest
+
+import tap_outbrain
+import tap_outbrain.catalog as catalog
+from tap_outbrain.state import merge_state
+from tap_outbrain.transform import build_transformers
+
+from tests.helpers import ACCOUNT_ID, FakeClient, Output, empty_state, \
+    parse_date, rows
+
+
+class TestDimensionFieldSelection(unittest.TestCase):
+
+    def setUp(self):
+        today = datetime.date.today()
+        self.start_date = tap_outbrain.DEFAULT_START_DATE
+        self.transformers = tap_outbrain.TRANSFORMERS
+        tap_outbrain.DEFAULT_START_DATE = \
+            (today - datetime.timedelta(days=5)).isoformat()
+        self.output = Output()
+
+    def tearDown(self):
+        tap_outbrain.DEFAULT_START_DATE = self.start_date
+        tap_outbrain.TRANSFORMERS = self.transformers
+        self.output.close()
+
+    def handle(self, url, params):
+        return {
+            'totalPublishers': 1,
+            'publisherResults': [{
+                'publisherId': 'p1',
+                'publisherName': 'Publisher',
+                'results': rows(parse_date(params['from']),
+                                parse_date(params['to'])),
+            }],
+        }
+
+    def test_deselected_dimension_fields_are_left_out(self):
+        tap_outbrain.TRANSFORMERS = build_transformers({
+            'publisher_performance': {'marketerId', 'publisherId',
+                                      'fromDate', 'clicks'},
+        })
+
+        tap_outbrain.sync_dimension_performance(
+            empty_state(), FakeClient(self.handle), ACCOUNT_ID,
+            'publisher_performance')
+
+        records = self.output.records('publisher_performance')
+        self.assertTrue(records)
+
+        for record in records:
+            self.assertEqual(set(record), {'marketerId', 'publisherId',
+                                           'fromDate', 'clicks'})
+            self.assertEqual(record['publisherId'], 'p1')
+
+    def test_all_dimension_fields_by_default(self):
+        tap_outbrain.TRANSFORMERS = build_transformers()
+
+        tap_outbrain.sync_dimension_performance(
+            empty_state(), FakeClient(self.handle), ACCOUNT_ID,
+            'publisher_performance')
+
+        records = self.output.records('publisher_performance')
+        self.assertTrue(records)
+        self.assertEqual(records[0]['publisherName'], 'Publisher')
+
+    def test_accounts_do_not_share_keys(self):
+        tap_outbrain.TRANSFORMERS = build_transformers()
+        state = merge_state(None, ['first', 'second'])
+
+        for account_id in ('first', 'second'):
+            tap_outbrain.sync_dimension_performance(
+                state, FakeClient(self.handle), account_id,
+                'publisher_performance')
+
+        key_properties = catalog.STREAMS['publisher_performance'][
+            'key_properties']
+        records = self.output.records('publisher_performance')
+        keys = set(tuple(record[name] for name in key_properties)
+                   for record in records)
+
+        self.assertEqual(len(keys), len(records))
+        self.assertEqual(set(record['marketerId'] for record in records),
+                         {'first', 'second'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import datetime
+import unittest
+
+import tap_outbrain
+from tap_outbrain.state import get_bookmarks
+
+from tests.helpers import ACCOUNT_ID, empty_state, today_is
+
+
+class TestSelectLinksForPerformance(unittest.TestCase):
+
+    def select(self, link, hashes=None):
+        state = empty_state()
+        get_bookmarks(state, ACCOUNT_ID, 'link_performance')[link['id']] = \
+            '2017-03-01'
+
+        with today_is(datetime.date(2017, 6, 1)):
+            return tap_outbrain.select_links_for_performance(
+                state, ACCOUNT_ID, [link], 30, hashes=hashes)
+
+    def test_disabled_link_modified_long_ago_is_skipped(self):
+        link = {'id': 'a', 'enabled': False,
+                'lastModified': '2017-02-01 10:00:00'}
+
+        self.assertEqual(self.select(link), [])
+        self.assertEqual(self.select(link, {}), [])
+
+    def test_disabled_link_changed_recently_is_selected(self):
+        link = {'id': 'a', 'enabled': False,
+                'lastModified': '2017-02-01 10:00:00'}
+        hashes = {'a': ['0123456789abcdef', '2017-05-20']}
+
+        self.assertEqual(self.select(link, hashes), [link])
+
+    def test_disabled_link_without_change_date_is_selected(self):
+        for last_modified in ('', None):
+            link = {'id': 'a', 'enabled': False,
+                    'lastModified': last_modified}
+
+            self.assertEqual(self.select(link), [link])
+            self.assertEqual(self.select(link, {}), [link])
@@ -0,0 +1,45 @@
+import datetime
+import unittest
+
+import tap_outbrain
+from tap_outbrain.planner import Plan
+
+from tests.helpers import ACCOUNT_ID, FakeClient, empty_state
+
+
+class TestPlanAccount(unittest.TestCase):
+
+    def setUp(self):
+        self.start_date = tap_outbrain.DEFAULT_START_DATE
+        tap_outbrain.DEFAULT_START_DATE = \
+            (datetime.date.today() - datetime.timedelta(days=30)).isoformat()
+
+    def tearDown(self):
+        tap_outbrain.DEFAULT_START_DATE = self.start_date
+
+    def handle(self, url, params):
+        if url.endswith('/campaigns'):
+            return {
+                'totalCount': 2,
+                'campaigns': [
+                    {'id': 'disabled', 'enabled': False},
+                    {'id': 'enabled', 'enabled': True},
+                ],
+            }
+
+        return {'totalCount': 0, 'promotedLinks': []}
+
+    def test_first_run_with_incremental_entities(self):
+        plan = Plan()
+        client = FakeClient(self.handle)
+
+        tap_outbrain.plan_account(plan, empty_state(), client, ACCOUNT_ID,
+                                  {'incremental_entities': True})
+
+        # no change is tracked yet, so no campaign is taken as inactive
+        self.assertEqual(plan.entities['campaign_performance'], 2)
+        self.assertEqual(client.report_requests(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
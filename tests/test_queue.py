@@ -0,0 +1,133 @@
+import datetime
+import unittest
+
+import tap_outbrain
+import tap_outbrain.scheduler as scheduler
+
+from tap_outbrain.state import get_bookmarks
+
+from tests.helpers import ACCOUNT_ID, FakeClient, Output, empty_state, \
+    parse_date, rows, today_is
+
+CAMPAIGNS = [
+    ('first', (scheduler.ON_AIR, 10.0, '')),
+    ('second', (scheduler.ENABLED, 0.0, '')),
+]
+
+
+class TestCampaignsQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.start_date = tap_outbrain.DEFAULT_START_DATE
+        self.run_budget = tap_outbrain.RUN_BUDGET
+        tap_outbrain.DEFAULT_START_DATE = \
+            (datetime.date.today() - datetime.timedelta(days=5)).isoformat()
+        self.output = Output()
+
+    def tearDown(self):
+        tap_outbrain.DEFAULT_START_DATE = self.start_date
+        tap_outbrain.RUN_BUDGET = self.run_budget
+        self.output.close()
+
+    def handle(self, url, params):
+        results = rows(parse_date(params['from']), parse_date(params['to']))
+        return {'totalResults': len(results), 'results': results}
+
+    def test_returns_no_campaigns_left_once_synced(self):
+        tap_outbrain.RUN_BUDGET = scheduler.RunBudget()
+
+        left = tap_outbrain.sync_campaigns_queue(
+            empty_state(), FakeClient(self.handle), ACCOUNT_ID, CAMPAIGNS)
+
+        self.assertEqual(left, 0)
+
+    def test_returns_campaigns_left_by_a_used_up_budget(self):
+        tap_outbrain.RUN_BUDGET = scheduler.RunBudget(seconds=0)
+        client = FakeClient(self.handle)
+
+        left = tap_outbrain.sync_campaigns_queue(
+            empty_state(), client, ACCOUNT_ID, CAMPAIGNS)
+
+        self.assertEqual(left, 2)
+        self.assertEqual(client.report_requests(), [])
+
+
+class TestBudgetedRuns(unittest.TestCase):
+    """
+    Daily runs on a budget too small to finish a backfill still sync the
+    most valuable windows every day.
+    """
+
+    def setUp(self):
+        self.today = datetime.date.today()
+        self.start_date = tap_outbrain.DEFAULT_START_DATE
+        self.run_budget = tap_outbrain.RUN_BUDGET
+        tap_outbrain.DEFAULT_START_DATE = \
+            (self.today - datetime.timedelta(days=1000)).isoformat()
+        self.output = Output()
+
+    def tearDown(self):
+        tap_outbrain.DEFAULT_START_DATE = self.start_date
+        tap_outbrain.RUN_BUDGET = self.run_budget
+        self.output.close()
+
+    def handle(self, url, params):
+        results = rows(parse_date(params['from']), parse_date(params['to']))
+        return {'totalResults': len(results), 'results': results}
+
+    def run_day(self, state, day, campaigns, requests):
+        with today_is(day):
+            tap_outbrain.RUN_BUDGET = scheduler.RunBudget(requests=requests)
+            client = FakeClient(self.handle)
+
+            left = tap_outbrain.sync_campaigns_queue(
+                state, client, ACCOUNT_ID, campaigns)
+            tap_outbrain.clear_finished_checkpoints(state, ACCOUNT_ID, left)
+
+        return client, left
+
+    def test_done_campaigns_are_synced_again_the_next_day(self):
+        state = empty_state()
+        bookmarks = get_bookmarks(state, ACCOUNT_ID, 'campaign_performance')
+        bookmarks['hot'] = \
+            (self.today - datetime.timedelta(days=1)).isoformat()
+
+        campaigns = [
+            ('hot', (scheduler.ON_AIR, 100.0, bookmarks['hot'])),
+            ('archived', (scheduler.INACTIVE, 0.0, '')),
+        ]
+
+        tomorrow = self.today + datetime.timedelta(days=1)
+        requests = []
+
+        for day in (self.today, tomorrow):
+            client, left = self.run_day(state, day, campaigns, 3)
+            requests.append([params for _, params
+                             in client.report_requests()])
+
+            self.assertEqual(left, 1)
+            self.assertEqual([params['campaignId']
+                              for params in requests[-1]],
+                             ['hot', 'archived', 'archived'])
+            self.assertEqual(bookmarks['hot'], day.isoformat())
+
+        # the backfill went on where the first day left it
+        self.assertEqual(requests[1][1]['from'],
+                         requests[0][2]['to'] + datetime.timedelta(days=1))
+
+    def test_budget_used_up_by_the_last_window(self):
+        state = empty_state()
+        campaigns = [('hot', (scheduler.ON_AIR, 100.0, ''))]
+
+        tap_outbrain.DEFAULT_START_DATE = \
+            (self.today - datetime.timedelta(days=50)).isoformat()
+
+        client, left = self.run_day(state, self.today, campaigns, 1)
+
+        self.assertEqual(left, 0)
+        self.assertEqual(len(client.report_requests()), 1)
+        self.assertEqual(state['accounts'][ACCOUNT_ID]['checkpoints'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+
+import tap_outbrain.rate_limit as rate_limit
+
+REPORTING_LIMIT = {'calls': 2, 'period': 60}
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_waits_only_once_the_burst_is_used(self):
+        bucket = rate_limit.TokenBucket(2, 60, burst=2)
+
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 30.0, places=1)
+
+    def test_reservations_queue_up(self):
+        bucket = rate_limit.TokenBucket(2, 60)
+
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 30.0, places=1)
+        self.assertAlmostEqual(bucket.reserve(), 60.0, places=1)
+
+    def test_block_for(self):
+        bucket = rate_limit.TokenBucket(1000, 1)
+        bucket.block_for(5)
+
+        self.assertAlmostEqual(bucket.reserve(), 5.0, places=1)
+
+
+@mock.patch('tap_outbrain.rate_limit.time.sleep')
+class TestRateScheduler(unittest.TestCase):
+
+    def test_sleeps_only_as_long_as_needed(self, sleep):
+        scheduler = rate_limit.RateScheduler(
+            {rate_limit.REPORTING: REPORTING_LIMIT})
+
+        scheduler.acquire(rate_limit.REPORTING)
+        sleep.assert_not_called()
+
+        scheduler.acquire(rate_limit.REPORTING)
+        self.assertAlmostEqual(sleep.call_args[0][0], 30.0, places=1)
+
+        stats = scheduler.summary()[rate_limit.REPORTING]
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['waits'], 1)
+        self.assertAlmostEqual(stats['wait_seconds'], 30.0, places=1)
+
+    def test_endpoint_classes_are_throttled_apart(self, sleep):
+        scheduler = rate_limit.RateScheduler(
+            {rate_limit.REPORTING: REPORTING_LIMIT})
+
+        scheduler.acquire(rate_limit.REPORTING)
+        scheduler.acquire(rate_limit.LOGIN)
+
+        for _ in range(10):
+            scheduler.acquire(rate_limit.ENTITY)
+
+        sleep.assert_not_called()
+
+    def test_rate_limit_headers_hold_requests_back(self, sleep):
+        scheduler = rate_limit.RateScheduler(
+            {rate_limit.REPORTING: {'calls': 1000, 'period': 1}})
+
+        scheduler.update_from_headers(rate_limit.REPORTING, {
+            'rate-limit-calls-left': '0',
+            'rate-limit-msec-left': '12000',
+        })
+        scheduler.acquire(rate_limit.REPORTING)
+
+        self.assertAlmostEqual(sleep.call_args[0][0], 12.0, places=1)
+
+    def test_headers_with_calls_left_change_nothing(self, sleep):
+        scheduler = rate_limit.RateScheduler(
+            {rate_limit.REPORTING: {'calls': 1000, 'period': 1}})
+
+        scheduler.update_from_headers(rate_limit.REPORTING, {
+            'rate-limit-calls-left': '5',
+            'rate-limit-msec-left': '12000',
+        })
+        scheduler.acquire(rate_limit.REPORTING)
+
+        sleep.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
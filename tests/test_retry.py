@@ -0,0 +1,134 @@
+import email.utils
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from tap_outbrain.client import OutbrainClient
+import tap_outbrain.retry as retry
+
+
+def response(status_code, headers=None):
+    result = requests.Response()
+    result.status_code = status_code
+    result.headers = requests.structures.CaseInsensitiveDict(headers or {})
+    result.url = 'https://fake/campaigns'
+    result._content = b'{}'
+    return result
+
+
+class TestParseRetryAfter(unittest.TestCase):
+
+    def test_seconds(self):
+        self.assertEqual(retry.parse_retry_after({'Retry-After': '2'}), 2.0)
+
+    def test_http_date(self):
+        value = email.utils.formatdate(time.time() + 60, usegmt=True)
+        wait = retry.parse_retry_after({'Retry-After': value})
+
+        self.assertGreater(wait, 55)
+        self.assertLessEqual(wait, 60)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(retry.parse_retry_after({}))
+        self.assertIsNone(retry.parse_retry_after({'Retry-After': 'soon'}))
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_classify(self):
+        self.assertEqual(retry.classify(response(429)), retry.RATE_LIMITED)
+        self.assertEqual(retry.classify(response(503)), retry.SERVER_ERROR)
+        self.assertIsNone(retry.classify(response(404)))
+        self.assertEqual(
+            retry.classify(error=requests.exceptions.ConnectionError()),
+            retry.CONNECTION_RESET)
+        self.assertEqual(
+            retry.classify(error=requests.exceptions.ReadTimeout()),
+            retry.TIMEOUT)
+        self.assertIsNone(
+            retry.classify(error=requests.exceptions.InvalidURL()))
+
+    def test_honors_retry_after(self):
+        policy = retry.RetryPolicy()
+
+        self.assertEqual(policy.get_wait(
+            retry.RATE_LIMITED, 1, response(429, {'Retry-After': '2'})), 2.0)
+
+    def test_connection_reset_is_retried_at_once(self):
+        policy = retry.RetryPolicy()
+
+        self.assertEqual(policy.get_wait(retry.CONNECTION_RESET, 1), 0.0)
+        self.assertGreater(policy.get_wait(retry.CONNECTION_RESET, 2), 0.0)
+
+    def test_backoff_grows_with_jitter_up_to_max_delay(self):
+        policy = retry.RetryPolicy(base_delay=1.0, max_delay=10.0)
+
+        for tries, delay in ((1, 1.0), (3, 4.0), (10, 10.0)):
+            wait = policy.backoff(tries)
+            self.assertGreaterEqual(wait, delay / 2)
+            self.assertLessEqual(wait, delay)
+
+    def test_gives_up_after_max_tries(self):
+        retry_state = retry.RetryPolicy(max_tries=2).start()
+
+        self.assertIsNotNone(retry_state.next_wait(response(503))[1])
+        self.assertEqual(retry_state.next_wait(response(503)),
+                         (retry.SERVER_ERROR, None))
+
+    def test_gives_up_past_time_budget(self):
+        retry_state = retry.RetryPolicy(time_budget=10).start()
+
+        self.assertEqual(
+            retry_state.next_wait(response(429, {'Retry-After': '60'})),
+            (retry.RATE_LIMITED, None))
+
+    def test_counters(self):
+        policy = retry.RetryPolicy(max_tries=2)
+        retry_state = policy.start()
+        retry_state.next_wait(response(503))
+        retry_state.next_wait(response(503))
+
+        self.assertEqual(policy.summary()['retries'],
+                         {retry.SERVER_ERROR: 1})
+        self.assertEqual(policy.summary()['give_ups'],
+                         {retry.SERVER_ERROR: 1})
+
+
+@mock.patch('tap_outbrain.client.time.sleep')
+class TestClientRetries(unittest.TestCase):
+
+    def client(self, *responses):
+        client = OutbrainClient(access_token='token')
+        client.session = mock.Mock()
+        client.session.get.side_effect = list(responses)
+        return client
+
+    def test_retries_rate_limited_requests(self, sleep):
+        client = self.client(response(429, {'Retry-After': '2'}),
+                             response(200))
+
+        self.assertEqual(client.request('https://fake/campaigns')
+                         .status_code, 200)
+        sleep.assert_called_once_with(2.0)
+
+    def test_retries_connection_errors(self, sleep):
+        client = self.client(requests.exceptions.ConnectionError(),
+                             response(200))
+
+        self.assertEqual(client.request('https://fake/campaigns')
+                         .status_code, 200)
+        self.assertEqual(client.session.get.call_count, 2)
+
+    def test_client_errors_are_not_retried(self, sleep):
+        client = self.client(response(404), response(200))
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            client.request('https://fake/campaigns')
+
+        self.assertEqual(client.session.get.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
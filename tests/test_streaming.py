@@ -0,0 +1,140 @@
+import io
+import json
+import unittest
+from unittest import mock
+
+import requests
+import urllib3
+
+from tap_outbrain import rate_limit
+from tap_outbrain.metrics import Metrics
+from tap_outbrain.retry import RetryPolicy
+from tap_outbrain.streaming import ResponseItems
+
+
+class BrokenRaw(object):
+    """
+    Body stream whose connection drops after `fail_at` bytes.
+    """
+
+    def __init__(self, body, fail_at):
+        self.body = io.BytesIO(body)
+        self.fail_at = fail_at
+
+    def read(self, size=-1):
+        position = self.body.tell()
+
+        if self.fail_at is None:
+            return self.body.read(size)
+
+        if position >= self.fail_at:
+            raise urllib3.exceptions.ProtocolError('Connection broken')
+
+        if size is None or size < 0 or position + size > self.fail_at:
+            size = self.fail_at - position
+
+        return self.body.read(size)
+
+    def tell(self):
+        return self.body.tell()
+
+
+class FakeResponse(object):
+
+    def __init__(self, body, fail_at=None):
+        self.content = json.dumps(body).encode('utf-8')
+        self.fail_at = fail_at
+        self.raw = BrokenRaw(self.content, fail_at)
+        self.headers = {}
+
+    def json(self):
+        if self.fail_at is not None:
+            raise requests.exceptions.ChunkedEncodingError('Connection reset')
+
+        return json.loads(self.content.decode('utf-8'))
+
+    def close(self):
+        pass
+
+
+BODY = {
+    'totalCount': 3,
+    'results': [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}],
+}
+
+
+class TestResponseItemsRetries(unittest.TestCase):
+
+    def test_read_error_reopens_and_skips_seen_items(self):
+        reopened = []
+
+        def reopen():
+            reopened.append(True)
+            return FakeResponse(BODY)
+
+        # fail after the first item has been read off the stream
+        fail_at = len(json.dumps(BODY)) - 24
+        items = ResponseItems(FakeResponse(BODY, fail_at), 'results',
+                              reopen=reopen, retry_policy=RetryPolicy())
+
+        self.assertEqual([item['id'] for item in items], ['a', 'b', 'c'])
+        self.assertEqual(items.count, 3)
+        self.assertEqual(items.get('totalCount'), 3)
+        self.assertEqual(len(reopened), 1)
+
+    def test_read_error_gives_up_after_max_tries(self):
+        def reopen():
+            return FakeResponse(BODY, 0)
+
+        items = ResponseItems(FakeResponse(BODY, 0), 'results',
+                              reopen=reopen,
+                              retry_policy=RetryPolicy(max_tries=2,
+                                                       base_delay=0))
+
+        with self.assertRaises((requests.exceptions.RequestException,
+                                urllib3.exceptions.HTTPError)):
+            list(items)
+
+    def test_read_error_without_reopen_is_raised(self):
+        items = ResponseItems(FakeResponse(BODY, 0), 'results')
+
+        with self.assertRaises((requests.exceptions.RequestException,
+                                urllib3.exceptions.HTTPError)):
+            list(items)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestResponseItemsBytes(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('tap_outbrain.streaming.METRICS', Metrics())
+        self.metrics = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def received_bytes(self):
+        summary = self.metrics.summary()
+        return (summary['requests'][rate_limit.REPORTING]['bytes'],
+                summary['bytes_received'])
+
+    def test_chunked_body_counts_bytes_read(self):
+        response = FakeResponse(BODY)
+        items = ResponseItems(response, 'results',
+                              endpoint_class=rate_limit.REPORTING)
+        list(items)
+
+        size = len(response.content)
+        self.assertEqual(self.received_bytes(), (size, size))
+
+    def test_retried_body_counts_every_read(self):
+        fail_at = len(json.dumps(BODY)) - 24
+        items = ResponseItems(FakeResponse(BODY, fail_at), 'results',
+                              reopen=lambda: FakeResponse(BODY),
+                              retry_policy=RetryPolicy(base_delay=0),
+                              endpoint_class=rate_limit.REPORTING)
+        list(items)
+
+        size = fail_at + len(json.dumps(BODY))
+        self.assertEqual(self.received_bytes(), (size, size))
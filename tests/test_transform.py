@@ -0,0 +1,101 @@
+import unittest
+
+from tap_outbrain.transform import EntityTransformer, \
+    PerformanceTransformer, parse_datetime
+
+
+class TestParseDatetime(unittest.TestCase):
+
+    def test_api_formats(self):
+        self.assertEqual(parse_datetime('2013-01-14 07:19:16'),
+                         '2013-01-14T07:19:16Z')
+        self.assertEqual(parse_datetime('2013-03-16T10:32:31Z'),
+                         '2013-03-16T10:32:31Z')
+
+    def test_other_formats_are_normalized_to_utc(self):
+        self.assertEqual(parse_datetime('2013-03-16T10:32:31+00:00'),
+                         '2013-03-16T10:32:31Z')
+        self.assertEqual(parse_datetime('2013-03-16T12:32:31+02:00'),
+                         '2013-03-16T10:32:31Z')
+        self.assertEqual(parse_datetime('2013-03-16T10:32:31.250Z'),
+                         '2013-03-16T10:32:31.250000Z')
+        self.assertEqual(parse_datetime('2013-03-16'),
+                         '2013-03-16T00:00:00Z')
+
+
+class TestEntityTransformer(unittest.TestCase):
+
+    SCHEMA = {
+        'properties': {
+            'id': {'type': 'string'},
+            'lastModified': {'type': 'string', 'format': 'date-time'},
+            'budget': {
+                'type': 'object',
+                'properties': {
+                    'startDate': {'type': 'string', 'format': 'date-time'},
+                },
+            },
+        },
+    }
+
+    def test_converts_nested_datetimes(self):
+        record = EntityTransformer(self.SCHEMA).transform({
+            'id': 'a',
+            'lastModified': '2013-01-14 07:19:16',
+            'budget': {'startDate': '2013-01-15 00:00:00'},
+        })
+
+        self.assertEqual(record, {
+            'id': 'a',
+            'lastModified': '2013-01-14T07:19:16Z',
+            'budget': {'startDate': '2013-01-15T00:00:00Z'},
+        })
+
+    def test_missing_values_are_left_alone(self):
+        record = {'id': 'a', 'lastModified': None, 'budget': None}
+
+        self.assertEqual(EntityTransformer(self.SCHEMA).transform(record),
+                         {'id': 'a', 'lastModified': None, 'budget': None})
+
+    def test_prune_keeps_selected_fields(self):
+        transformer = EntityTransformer(self.SCHEMA, ['id'])
+
+        self.assertEqual(transformer.prune({'id': 'a', 'name': 'x'}),
+                         {'id': 'a'})
+        self.assertEqual(EntityTransformer(self.SCHEMA).prune({'id': 'a'}),
+                         {'id': 'a'})
+
+
+class TestPerformanceTransformer(unittest.TestCase):
+
+    SCHEMA = {
+        'properties': {
+            'campaignId': {'type': 'string'},
+            'fromDate': {'type': 'string', 'format': 'date'},
+            'clicks': {'type': 'number'},
+            'spend': {'type': 'number'},
+        },
+    }
+
+    def test_flattens_and_casts(self):
+        transformer = PerformanceTransformer(self.SCHEMA)
+        record = transformer.transform({
+            'metadata': {'fromDate': '2017-03-16', 'name': 'x'},
+            'metrics': {'clicks': 3.0, 'spend': '1.5', 'ctr': 0.1},
+        }, {'campaignId': 'a'})
+
+        self.assertEqual(record, {'campaignId': 'a', 'fromDate': '2017-03-16',
+                                  'clicks': 3, 'spend': 1.5})
+        self.assertIsInstance(record['clicks'], int)
+
+    def test_missing_metrics_default_to_zero(self):
+        record = PerformanceTransformer(self.SCHEMA).transform({}, {})
+
+        self.assertEqual(record, {'fromDate': None, 'clicks': 0,
+                                  'spend': 0.0})
+
+    def test_select(self):
+        transformer = PerformanceTransformer(self.SCHEMA)
+
+        self.assertEqual(transformer.select(['campaignId', 'marketerId']),
+                         ['campaignId'])
@@ -0,0 +1,99 @@
+import datetime
+import unittest
+
+import tap_outbrain.windows as windows
+
+JAN_1 = datetime.date(2020, 1, 1)
+
+
+def days(window):
+    return (window[1] - window[0]).days + 1
+
+
+class TestPlanWindows(unittest.TestCase):
+
+    def test_spreads_days_evenly(self):
+        # 111 days at one row a day take two pages, not 100 days and 11
+        planned = windows.plan_windows(JAN_1, datetime.date(2020, 4, 20))
+
+        self.assertEqual([days(window) for window in planned], [56, 55])
+
+    def test_windows_are_contiguous(self):
+        end = datetime.date(2021, 3, 9)
+        planned = windows.plan_windows(JAN_1, end, rows_per_day=3.0)
+
+        self.assertEqual(planned[0][0], JAN_1)
+        self.assertEqual(planned[-1][1], end)
+
+        for previous, window in zip(planned, planned[1:]):
+            self.assertEqual(window[0],
+                             previous[1] + datetime.timedelta(days=1))
+
+        self.assertLessEqual(max(days(window) for window in planned) -
+                             min(days(window) for window in planned), 1)
+
+    def test_sparse_data_is_capped_at_max_days(self):
+        planned = windows.plan_windows(JAN_1, datetime.date(2021, 12, 31),
+                                       rows_per_day=0)
+
+        self.assertEqual([days(window) for window in planned], [244, 244, 243])
+
+    def test_start_after_end(self):
+        self.assertEqual(
+            windows.plan_windows(JAN_1, JAN_1 - datetime.timedelta(days=1)),
+            [])
+
+    def test_one_day(self):
+        self.assertEqual(windows.plan_windows(JAN_1, JAN_1),
+                         [(JAN_1, JAN_1)])
+
+    def test_same_inputs_same_plan(self):
+        end = datetime.date(2020, 9, 30)
+
+        self.assertEqual(windows.plan_windows(JAN_1, end, 2.5),
+                         windows.plan_windows(JAN_1, end, 2.5))
+
+
+class TestLookback(unittest.TestCase):
+
+    def test_per_stream_lookback(self):
+        lookback_days = {'campaign_performance': 7}
+
+        self.assertEqual(
+            windows.get_lookback_days(lookback_days, 'campaign_performance'),
+            7)
+        self.assertEqual(
+            windows.get_lookback_days(lookback_days, 'link_performance'),
+            windows.DEFAULT_LOOKBACK_DAYS)
+        self.assertEqual(windows.get_lookback_days(3, 'link_performance'), 3)
+        self.assertEqual(windows.get_lookback_days(None, 'link_performance'),
+                         windows.DEFAULT_LOOKBACK_DAYS)
+
+    def test_start_date(self):
+        self.assertEqual(windows.get_start_date('2020-01-10', '2016-08-01', 7),
+                         datetime.date(2020, 1, 3))
+        self.assertEqual(windows.get_start_date(None, '2016-08-01', 0),
+                         datetime.date(2016, 8, 1))
+
+
+class TestCountPlannedRequests(unittest.TestCase):
+
+    def test_per_entity(self):
+        # `a` needs its last 22 days, `b` its 111 days from the start date
+        self.assertEqual(
+            windows.count_planned_requests(
+                {'a': '2020-04-01'}, ['a', 'b'], '2020-01-01',
+                datetime.date(2020, 4, 20)),
+            3)
+
+    def test_grouped(self):
+        self.assertEqual(
+            windows.count_planned_requests(
+                {}, ['a', 'b', 'c'], '2020-01-01',
+                datetime.date(2020, 4, 20), lookback_days=0,
+                entities_per_page=2),
+            4)
+
+
+if __name__ == '__main__':
+    unittest.main()